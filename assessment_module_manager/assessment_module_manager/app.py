@@ -2,7 +2,12 @@ from fastapi import FastAPI, Request
 from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
+from athena.metrics import MetricsMiddleware
+from athena.tracing import TracingMiddleware, set_service_name
+from athena.transport import CompressionMiddleware, FastJSONResponse, FastRoute
+
 from assessment_module_manager.logger import logger
+from assessment_module_manager.module import close_module_clients
 
 description = """
 This is the Athena API. You are interacting with the Assessment Module Manager, 
@@ -17,8 +22,23 @@ the [/modules](/modules) endpoint.
 app = FastAPI(
     title="Athena API",
     description=description,
-    version="0.1.0"
+    version="0.1.0",
+    # Parse requests and render responses with orjson, see athena.transport
+    default_response_class=FastJSONResponse,
 )
+app.router.route_class = FastRoute
+# Compress large responses and accept compressed requests, see athena.transport
+app.add_middleware(CompressionMiddleware)
+
+# Prometheus metrics, see athena.metrics and the metrics endpoint
+app.add_middleware(MetricsMiddleware)
+
+# Distributed tracing, the trace is passed on to the modules, see athena.tracing
+app.add_middleware(TracingMiddleware)
+set_service_name("assessment_module_manager")
+
+# Close the pooled connections to the modules, see assessment_module_manager.module.module_client
+app.add_event_handler("shutdown", close_module_clients)
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -1,6 +1,6 @@
 import inspect
 from functools import wraps
-from typing import Callable
+from typing import Callable, Optional
 
 from fastapi import HTTPException, Depends
 from fastapi.security import APIKeyHeader
@@ -24,6 +24,15 @@ def verify_lms_athena_key(lms_url: str, secret: str):
         logger.warning("DEBUG MODE: Ignoring invalid LMS Deployment secret.")
 
 
+def verify_metrics_secret(authorization: Optional[str]):
+    """Checks the Authorization header of Prometheus, e.g. "Bearer <secret>" (see METRICS_SECRET)."""
+    secret = authorization[len("Bearer "):] if authorization and authorization.startswith("Bearer ") else authorization
+    if env.METRICS_SECRET is None or secret != env.METRICS_SECRET:
+        if env.PRODUCTION:
+            raise HTTPException(status_code=401, detail="Invalid metrics secret.")
+        logger.warning("DEBUG MODE: Ignoring invalid metrics secret.")
+
+
 def authenticated(func: Callable) -> Callable:
     """
         Decorator for endpoints that require authentication.
@@ -4,9 +4,11 @@ All available endpoints for the assessment module manager.
 from .modules_proxy_endpoint import proxy_to_module
 from .health_endpoint import get_health
 from .modules_endpoint import get_modules
+from .metrics_endpoint import get_metrics
 
 __all__ = [
     "get_health",
+    "get_metrics",
     "get_modules",
     "proxy_to_module",
 ]
@@ -1,33 +1,101 @@
+import asyncio
+import json
+from typing import Dict, List, Optional
+
 import httpx
 from pydantic import BaseModel, Field
 
 from .modules_endpoint import get_modules
+from assessment_module_manager import env
 from assessment_module_manager.app import app
 from assessment_module_manager.logger import logger
-from assessment_module_manager.module import Module
+from assessment_module_manager.module import Module, get_health_check_client, get_replica_urls
 
 
-async def is_healthy(module: Module) -> bool:
+async def is_healthy(module: Module, url: Optional[str] = None) -> bool:
+    """Whether the module (or the replica of it with the given URL) is healthy."""
+    # Only logged at debug level, because modules are checked periodically. Changes are logged by check_modules_health.
     try:
-        async with httpx.AsyncClient(base_url=module.url) as client:
-            response = await client.get('/')
+        response = await get_health_check_client().get(f"{(url or str(module.url)).rstrip('/')}/")
         return response.status_code == 200 and response.json()["status"] == "ok"
-    except httpx.ConnectError:
-        logger.error("Server is not reachable: %s", module)
+    except (httpx.ConnectError, httpx.TimeoutException):
+        logger.debug("Server is not reachable: %s", module)
         return False
     except KeyError:
-        logger.error("Response does not contain a 'status' key: %s", module)
+        logger.debug("Response does not contain a 'status' key: %s", module)
         return False
-    except TypeError:
-        logger.error("Response is not JSON: %s", module)
+    except (TypeError, json.JSONDecodeError):
+        logger.debug("Response is not JSON: %s", module)
         return False
 
 
+# Latest health check result by module name, see check_modules_health
+_module_health: Dict[str, bool] = {}
+# Latest health check results by replica URL by module name, for modules with several replicas
+_replica_health: Dict[str, Dict[str, bool]] = {}
+_health_refresher: Optional[asyncio.Task] = None
+
+
+async def check_modules_health(modules: List[Module]):
+    """
+    Check the health of the given modules (all of their replicas) concurrently, each within HEALTH_CHECK_TIMEOUT,
+    and cache the results. A module is healthy if any of its replicas is healthy.
+    """
+    replica_urls = await asyncio.gather(*(get_replica_urls(module) for module in modules))
+    checks = [(module, url) for module, urls in zip(modules, replica_urls) for url in urls]
+    results = await asyncio.gather(
+        *(asyncio.wait_for(is_healthy(module, url), env.HEALTH_CHECK_TIMEOUT) for module, url in checks),
+        return_exceptions=True,
+    )
+    replica_health: Dict[str, Dict[str, bool]] = {module.name: {} for module in modules}
+    for (module, url), result in zip(checks, results):
+        if isinstance(result, BaseException) and not isinstance(result, asyncio.TimeoutError):
+            logger.debug("Health check of replica %s of module %s failed: %r", url, module.name, result)
+        replica_health[module.name][url] = result is True
+
+    for module in modules:
+        healthy = any(replica_health[module.name].values())
+        if _module_health.get(module.name) != healthy:
+            if healthy:
+                logger.info("Module %s is healthy", module.name)
+            else:
+                logger.warning("Module %s is not healthy (%s)", module.name, module.url)
+        _module_health[module.name] = healthy
+        if len(replica_health[module.name]) > 1:
+            _replica_health[module.name] = replica_health[module.name]
+        else:
+            _replica_health.pop(module.name, None)
+
+
+async def _refresh_modules_health():
+    while True:
+        try:
+            await check_modules_health(get_modules())
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Could not check the health of the modules")
+        await asyncio.sleep(env.HEALTH_CHECK_INTERVAL)
+
+
+async def start_health_refresher():
+    global _health_refresher  # pylint: disable=global-statement
+    _health_refresher = asyncio.create_task(_refresh_modules_health())
+
+
+async def stop_health_refresher():
+    if _health_refresher is not None:
+        _health_refresher.cancel()
+
+
+app.add_event_handler("startup", start_health_refresher)
+app.add_event_handler("shutdown", stop_health_refresher)
+
+
 class HealthResponse(BaseModel):
     """
     Response indicating whether the Assessment Module Manager is healthy,
     and whether all the modules are healthy (i.e. reachable).
-    Additional information about the modules is also provided.
+    Additional information about the modules is also provided, for modules with several replicas also the health of
+    each replica.
     """
     status: str = Field(const=True, default="ok", example="ok")
     modules: dict = Field(
@@ -52,18 +120,28 @@ async def get_health() -> HealthResponse:
     Health endpoint to find out whether the Assessment Module Manager is healthy,
     and whether all the modules are healthy (i.e. reachable).
 
+    The modules are checked in the background every HEALTH_CHECK_INTERVAL seconds, so the health of the modules is
+    at most that old.
+
     This endpoint is not authenticated.
     """
-    return HealthResponse(
-        modules={
-            module.name: {
-                "url": module.url,
-                "type": module.type,
-                "healthy": await is_healthy(module),
-                "supportsEvaluation": module.supports_evaluation,
-                "supportsNonGradedFeedbackRequests": module.supports_non_graded_feedback_requests,
-                "supportsGradedFeedbackRequests": module.supports_graded_feedback_requests
-            }
-            for module in get_modules()
+    modules = get_modules()
+    unchecked_modules = [module for module in modules if module.name not in _module_health]
+    if unchecked_modules:
+        # E.g. right after the start or after adding a module to modules.ini
+        await check_modules_health(unchecked_modules)
+    health = {
+        module.name: {
+            "url": module.url,
+            "type": module.type,
+            "healthy": _module_health.get(module.name, False),
+            "supportsEvaluation": module.supports_evaluation,
+            "supportsNonGradedFeedbackRequests": module.supports_non_graded_feedback_requests,
+            "supportsGradedFeedbackRequests": module.supports_graded_feedback_requests
         }
-    )
+        for module in modules
+    }
+    for module_name, replica_health in _replica_health.items():
+        if module_name in health:
+            health[module_name]["replicas"] = replica_health
+    return HealthResponse(modules=health)
@@ -0,0 +1,18 @@
+from fastapi import Depends, Response
+
+from athena.metrics import metrics_endpoint
+
+from assessment_module_manager.app import app
+from assessment_module_manager.authenticate import api_key_auth_header, verify_metrics_secret
+
+
+@app.get("/metrics", include_in_schema=False)
+def get_metrics(authorization: str = Depends(api_key_auth_header)) -> Response:
+    """
+    Prometheus metrics of the assessment module manager, see athena.metrics.
+
+    The assessment module manager is reachable from the internet (see the Caddyfile), so Prometheus has to send the
+    METRICS_SECRET, e.g. with `authorization: {credentials: <secret>}` in the scrape config.
+    """
+    verify_metrics_secret(authorization)
+    return metrics_endpoint()
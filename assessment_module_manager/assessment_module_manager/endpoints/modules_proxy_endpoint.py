@@ -1,11 +1,61 @@
-from typing import Dict, Any, Optional
-from fastapi import Body, HTTPException, Request
-from starlette.responses import JSONResponse
+from typing import Any, AsyncIterator, Optional, Union
+from fastapi import HTTPException, Request
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import Response, StreamingResponse
 
+from assessment_module_manager import env
 from assessment_module_manager.authenticate import authenticated
 from athena.schemas import ExerciseType
+from athena.transport import THREADPOOL_MINIMUM_SIZE, FastJSONResponse, json_loads
 from assessment_module_manager.app import app
-from assessment_module_manager.module import ModuleResponse, find_module_by_name, request_to_module
+from assessment_module_manager.module import ModuleResponse, find_module_by_name, request_to_module, stream_from_module, \
+    pass_through_to_module, get_exercise_affinity_key, STREAMING_MEDIA_TYPES
+
+
+def _get_requested_exercise_id(request: Request) -> Optional[str]:
+    """The exercise of the request from the `X-Exercise-ID` header or the `exerciseId` query parameter, if given."""
+    return request.headers.get('X-Exercise-ID') or request.query_params.get('exerciseId')
+
+
+def _reject_non_object_body():
+    raise HTTPException(status_code=422, detail="The request body must be a JSON object")
+
+
+async def _get_body_exercise_id(body: bytes) -> Optional[Any]:
+    """The ID of the exercise in a request body like {"exercise": {"id": ...}, ...}, None if it has none."""
+    try:
+        # Like the (de)compression in athena.transport, large bodies are parsed without blocking the event loop
+        data = await run_in_threadpool(json_loads, body) if len(body) >= THREADPOOL_MINIMUM_SIZE else json_loads(body)
+    except ValueError:
+        return None  # The module answers invalid bodies
+    if not isinstance(data, dict):
+        _reject_non_object_body()
+    exercise = data.get('exercise')
+    return exercise.get('id') if isinstance(exercise, dict) else None
+
+
+async def _check_object_body(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Read the start of an uncompressed JSON request body to reject bodies that are not JSON objects before forwarding
+    them, and return all chunks of the body again.
+    """
+    start = b""
+    async for chunk in chunks:
+        start += chunk
+        if start.lstrip():
+            break
+    if not start.lstrip().startswith(b"{"):
+        _reject_non_object_body()
+
+    async def body():
+        yield start
+        async for chunk in chunks:
+            yield chunk
+    return body()
+
+
+async def _stream_bytes(body: bytes) -> AsyncIterator[bytes]:
+    yield body
 
 
 @app.api_route(
@@ -27,17 +77,33 @@ from assessment_module_manager.module import ModuleResponse, find_module_by_name
         },
     },
     response_model=ModuleResponse[Any, Any],
+    # The body is read by the endpoint itself (see below), so that it does not have to be parsed
+    openapi_extra={"requestBody": {"content": {"application/json": {"schema": {"type": "object"}}}}},
 )
 @authenticated
 async def proxy_to_module(
-    module_type: ExerciseType, module_name: str, path: str, request: Request, data: Optional[Dict[Any, Any]] = Body(None),
-) -> JSONResponse:
+    module_type: ExerciseType, module_name: str, path: str, request: Request,
+) -> Union[FastJSONResponse, StreamingResponse, Response]:
     """
     This endpoint is called by the LMS to proxy requests to modules.
     See the module documentation for the possible choices for paths.
     Example module documentation on this: [http://localhost:5001/docs](http://localhost:5001/docs).
+
+    If the LMS accepts `application/x-ndjson` or `text/event-stream`, streaming responses of the module
+    (e.g. from `/feedback_suggestions`) are passed through as they arrive.
+
+    Unless PROXY_PASS_THROUGH is disabled, the request body is streamed to the module without parsing it and the
+    response of the module is streamed back, so large requests (e.g. thousands of submissions) are neither parsed
+    nor copied by the Assessment Module Manager. The response is compressed while it is streamed if the LMS accepts it
+    (`Accept-Encoding`).
+
+    Requests are balanced across the replicas of the module. For modules with exercise affinity, requests for the
+    same exercise go to the same replica. The exercise is taken from the `X-Exercise-ID` header or the `exerciseId`
+    query parameter if given, otherwise from the `exercise` of the request body. In pass-through mode, the body is
+    then read completely before it is forwarded, so LMSs should send the header to keep streaming large requests.
     """
-    if request.method == "GET" and data is not None:
+    has_body = request.headers.get('Content-Length', "0") != "0" or 'Transfer-Encoding' in request.headers
+    if request.method == "GET" and has_body:
         raise HTTPException(status_code=400, detail="GET request should not contain a body")
 
     module = await find_module_by_name(module_name)
@@ -68,6 +134,71 @@ async def proxy_to_module(
     if lms_server_url:
         headers['X-Server-URL'] = lms_server_url
 
+    accept = request.headers.get('Accept', '')
+    is_streaming = any(media_type in accept for media_type in STREAMING_MEDIA_TYPES)
+    if is_streaming:
+        headers['Accept'] = accept
+
+    exercise_id: Optional[Any] = _get_requested_exercise_id(request)
+
+    if env.PROXY_PASS_THROUGH:
+        for header in ('Content-Type', 'Content-Encoding', 'Content-Length'):
+            if has_body and header in request.headers:
+                headers[header] = request.headers[header]
+        body = request.stream() if has_body else None
+        if module.exercise_affinity and exercise_id is None and has_body:
+            # The exercise is only in the body: read it (decompressed, see athena.transport) to find the exercise,
+            # but forward the bytes without converting them to schemas and back
+            content = await request.body()
+            exercise_id = await _get_body_exercise_id(content)
+            headers.pop('Content-Encoding', None)
+            headers['Content-Length'] = str(len(content))
+            body = _stream_bytes(content)
+        elif (has_body and request.headers.get('Content-Type', "").split(";")[0].strip() == "application/json"
+              and request.headers.get('Content-Encoding', "identity") == "identity"):
+            # Compressed bodies are only checked by the module
+            body = await _check_object_body(request.stream())
+        return await pass_through_to_module(
+            module,
+            headers,
+            '/' + path,
+            lms_server_url,
+            body,
+            method=request.method,
+            affinity_key=get_exercise_affinity_key(module, exercise_id),
+            accept_encoding=request.headers.get('Accept-Encoding'),
+        )
+
+    data = None
+    if has_body:
+        try:
+            data = await request.json()
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail="The request body is not valid JSON") from exc
+        if not isinstance(data, dict):
+            raise HTTPException(status_code=422, detail="The request body must be a JSON object")
+    exercise = (data or {}).get('exercise')
+    if exercise_id is None and isinstance(exercise, dict):
+        exercise_id = exercise.get('id')
+    affinity_key = get_exercise_affinity_key(module, exercise_id)
+
+    if is_streaming:
+        stream_resp = await stream_from_module(
+            module,
+            headers,
+            '/' + path,
+            lms_server_url,
+            data,
+            method=request.method,
+            affinity_key=affinity_key,
+        )
+        if isinstance(stream_resp, StreamingResponse):
+            return stream_resp
+        return FastJSONResponse(
+            status_code=stream_resp.status,
+            content=stream_resp.dict(),
+        )
+
     resp = await request_to_module(
         module,
         headers,
@@ -75,8 +206,9 @@ async def proxy_to_module(
         lms_server_url,
         data,
         method=request.method,
+        affinity_key=affinity_key,
     )
-    return JSONResponse(
+    return FastJSONResponse(
         status_code=resp.status,
         content=resp.dict(),
     )
@@ -1,5 +1,6 @@
 """Common place for environment variables with sensible defaults for local development."""
 import os
+from typing import Optional
 
 from assessment_module_manager.deployment import list_deployments
 from assessment_module_manager.module.list_modules import list_modules
@@ -7,6 +8,36 @@ from assessment_module_manager.logger import logger
 
 PRODUCTION = os.environ.get("PRODUCTION", "0") == "1"
 
+# Forward the requests of the LMS to the modules without parsing them, see the modules proxy endpoint
+PROXY_PASS_THROUGH = os.environ.get("PROXY_PASS_THROUGH", "1") == "1"
+
+# Compress requests to and responses from the modules (see athena.transport), only worth it on slow networks
+COMPRESS_MODULE_REQUESTS = os.environ.get("COMPRESS_MODULE_REQUESTS", "0") == "1"
+
+# Pooled HTTP clients for the modules, see assessment_module_manager/module/module_client.py
+MODULE_CONNECT_TIMEOUT = float(os.environ.get("MODULE_CONNECT_TIMEOUT", "5"))
+# Modules can take several minutes, e.g. for LLM feedback suggestions
+MODULE_READ_TIMEOUT = float(os.environ.get("MODULE_READ_TIMEOUT", "600"))
+MODULE_MAX_CONNECTIONS = int(os.environ.get("MODULE_MAX_CONNECTIONS", "100"))
+MODULE_MAX_KEEPALIVE_CONNECTIONS = int(os.environ.get("MODULE_MAX_KEEPALIVE_CONNECTIONS", "20"))
+# Shorter than the keep-alive timeout of uvicorn (5 seconds), so that connections are not reused while the module
+# closes them
+MODULE_KEEPALIVE_EXPIRY = float(os.environ.get("MODULE_KEEPALIVE_EXPIRY", "4"))
+
+# Load balancing across the replicas of a module, see assessment_module_manager/module/replicas.py
+REPLICA_DISCOVERY_INTERVAL = float(os.environ.get("REPLICA_DISCOVERY_INTERVAL", "30"))
+REPLICA_MAX_FAILURES = int(os.environ.get("REPLICA_MAX_FAILURES", "3"))
+REPLICA_EJECTION_SECONDS = float(os.environ.get("REPLICA_EJECTION_SECONDS", "30"))
+
+# Health checks of the modules for /health, in the background every HEALTH_CHECK_INTERVAL seconds
+HEALTH_CHECK_INTERVAL = float(os.environ.get("HEALTH_CHECK_INTERVAL", "10"))
+HEALTH_CHECK_TIMEOUT = float(os.environ.get("HEALTH_CHECK_TIMEOUT", "5"))
+# Connections of the client for the health checks, separate from the pools of the module clients
+HEALTH_CHECK_MAX_CONNECTIONS = int(os.environ.get("HEALTH_CHECK_MAX_CONNECTIONS", "10"))
+
+# Secret for Prometheus to scrape /metrics (Authorization: Bearer <secret>), /metrics is disabled in production without it
+METRICS_SECRET = os.environ.get("METRICS_SECRET")
+
 MODULE_SECRETS = {}
 for module in list_modules():
     secret = os.environ.get(f"{module.name.upper()}_SECRET")
@@ -15,6 +46,13 @@ for module in list_modules():
                          f"Set the {module.name.upper()}_SECRET environment variable.")
     MODULE_SECRETS[module.name] = secret
 
+
+def get_module_secret(module_name: str) -> Optional[str]:
+    """The secret of the module, also for modules added to modules.ini while running (see list_modules)."""
+    if module_name in MODULE_SECRETS:
+        return MODULE_SECRETS[module_name]
+    return os.environ.get(f"{module_name.upper()}_SECRET")
+
 DEPLOYMENT_SECRETS = {}
 for deployment in list_deployments():
     secret = os.environ.get(f"LMS_{deployment.name.upper()}_SECRET")
@@ -1,11 +1,23 @@
-from .list_modules import list_modules
+from .list_modules import list_modules, get_module
 from .module import Module
-from .request_to_module import ModuleResponse, find_module_by_name, request_to_module
+from .module_client import get_module_client, get_health_check_client, close_module_clients
+from .replicas import get_replica_urls, get_exercise_affinity_key
+from .request_to_module import ModuleResponse, find_module_by_name, request_to_module, stream_from_module, \
+    pass_through_to_module, STREAMING_MEDIA_TYPES
 
 __all__ = [
     "Module",
     "list_modules",
+    "get_module",
+    "get_module_client",
+    "get_health_check_client",
+    "close_module_clients",
+    "get_replica_urls",
+    "get_exercise_affinity_key",
     "ModuleResponse",
     "find_module_by_name",
     "request_to_module",
+    "stream_from_module",
+    "pass_through_to_module",
+    "STREAMING_MEDIA_TYPES",
 ]
@@ -1,20 +1,53 @@
+"""
+In-memory registry of the modules in modules.ini, indexed by name and type.
+
+modules.ini is only parsed again when its modification time changes (checked at most every
+`MODULES_INI_CHECK_INTERVAL` seconds), so looking up the module of a proxied request is a dict lookup. A reload
+replaces the whole registry at once, so concurrent requests never see a half-loaded registry. If the changed file is
+invalid (e.g. while it is being written), the previous registry is kept.
+"""
 import configparser
 import os
+import threading
+import time
 
-from typing import List, cast
+from dataclasses import dataclass, replace
+from typing import Dict, List, Optional, Tuple, cast
 from pathlib import Path
 
 from pydantic import AnyHttpUrl
 
 from athena import ExerciseType
 
+from assessment_module_manager.logger import logger
 from .module import Module
 
+MODULES_INI_PATH = Path(__file__).parent.parent.parent / "modules.ini"
+MODULES_INI_CHECK_INTERVAL = 1.0
+
+
+@dataclass(frozen=True)
+class _ModuleRegistry:
+    mtime_ns: Optional[int]
+    modules: Tuple[Module, ...]
+    modules_by_name: Dict[str, Module]
+    modules_by_type: Dict[ExerciseType, Tuple[Module, ...]]
+
 
-def list_modules() -> List[Module]:
-    """Get a list of all Athena modules that are available."""
+def _get_mtime_ns() -> Optional[int]:
+    try:
+        return os.stat(MODULES_INI_PATH).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _read_modules() -> List[Module]:
+    """
+    Parse modules.ini, the URLs can be overridden with <MODULE_NAME>_URL and <MODULE_NAME>_REPLICA_URLS
+    (comma-separated) environment variables.
+    """
     modules_config = configparser.ConfigParser()
-    modules_config.read(Path(__file__).parent.parent.parent / "modules.ini")
+    modules_config.read(MODULES_INI_PATH)
     return [
         Module(
             name=module,
@@ -22,7 +55,66 @@ def list_modules() -> List[Module]:
             type=ExerciseType(modules_config[module]["type"]),
             supports_evaluation=modules_config[module].getboolean("supports_evaluation"),
             supports_non_graded_feedback_requests=modules_config[module].getboolean("supports_non_graded_feedback_requests"),
-            supports_graded_feedback_requests=modules_config[module].getboolean("supports_graded_feedback_requests")
+            supports_graded_feedback_requests=modules_config[module].getboolean("supports_graded_feedback_requests"),
+            replica_urls=cast(List[AnyHttpUrl], [
+                url.strip() for url in os.environ.get(
+                    f"{module.upper()}_REPLICA_URLS", modules_config[module].get("replica_urls", "")).split(",")
+                if url.strip()
+            ]),
+            replica_discovery=modules_config[module].get("replica_discovery"),
+            exercise_affinity=modules_config[module].getboolean("exercise_affinity", fallback=False),
         )
         for module in modules_config.sections()
     ]
+
+
+def _load_registry(mtime_ns: Optional[int]) -> _ModuleRegistry:
+    modules = tuple(_read_modules())
+    modules_by_type: Dict[ExerciseType, Tuple[Module, ...]] = {}
+    for module in modules:
+        modules_by_type[module.type] = modules_by_type.get(module.type, ()) + (module,)
+    return _ModuleRegistry(
+        mtime_ns=mtime_ns,
+        modules=modules,
+        modules_by_name={module.name: module for module in modules},
+        modules_by_type=modules_by_type,
+    )
+
+
+_registry = _load_registry(_get_mtime_ns())
+_registry_lock = threading.Lock()
+_next_check = time.monotonic() + MODULES_INI_CHECK_INTERVAL
+
+
+def _get_registry() -> _ModuleRegistry:
+    """The current registry, reloaded first if modules.ini has changed."""
+    global _registry, _next_check  # pylint: disable=global-statement
+    now = time.monotonic()
+    if now < _next_check:
+        return _registry
+    with _registry_lock:
+        if now >= _next_check:
+            _next_check = now + MODULES_INI_CHECK_INTERVAL
+            mtime_ns = _get_mtime_ns()
+            if mtime_ns != _registry.mtime_ns:
+                try:
+                    _registry = _load_registry(mtime_ns)
+                    logger.info("Reloaded %d modules from %s", len(_registry.modules), MODULES_INI_PATH)
+                except Exception:  # pylint: disable=broad-except
+                    logger.exception("Could not reload %s, keeping the previous modules", MODULES_INI_PATH)
+                    # Only try again after the next change
+                    _registry = replace(_registry, mtime_ns=mtime_ns)
+    return _registry
+
+
+def list_modules(exercise_type: Optional[ExerciseType] = None) -> List[Module]:
+    """Get a list of all Athena modules that are available, optionally only the ones of the given exercise type."""
+    registry = _get_registry()
+    if exercise_type is not None:
+        return list(registry.modules_by_type.get(exercise_type, ()))
+    return list(registry.modules)
+
+
+def get_module(module_name: str) -> Optional[Module]:
+    """Get the module with the given name, None if there is no such module."""
+    return _get_registry().modules_by_name.get(module_name)
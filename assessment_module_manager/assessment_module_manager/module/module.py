@@ -1,3 +1,5 @@
+from typing import List, Literal, Optional
+
 from pydantic import BaseModel, Field, AnyHttpUrl
 
 from athena import ExerciseType
@@ -11,3 +13,11 @@ class Module(BaseModel):
     supports_evaluation: bool = Field(description="Whether the module supports evaluation", example=True)
     supports_non_graded_feedback_requests: bool = Field(description="Whether the module supports non-graded feedback requests", example=True)
     supports_graded_feedback_requests: bool = Field(description="Whether the module supports graded feedback requests", example=True)
+    replica_urls: List[AnyHttpUrl] = Field([], description="URLs of more replicas of the module, requests are balanced "
+                                                        "across url and these (see module.replicas)",
+                                            example=["http://localhost:5011"])
+    replica_discovery: Optional[Literal["dns", "srv"]] = Field(
+        None, description="Discover the replicas in DNS instead: all A/AAAA records of the host of url (dns) "
+                          "or the SRV records _<scheme>._tcp.<host> (srv)", example="dns")
+    exercise_affinity: bool = Field(False, description="Whether requests for the same exercise should go to the same "
+                                                       "replica, e.g. to keep its caches warm", example=False)
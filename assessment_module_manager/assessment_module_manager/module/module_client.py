@@ -0,0 +1,76 @@
+"""
+Long-lived HTTP clients for the modules: one pooled client per module (replica) URL, so that requests to a module
+reuse open connections (keep-alive) instead of paying for a TCP (and TLS) handshake on every request.
+
+HTTP/2 is used for modules behind TLS if the h2 package is installed (`pip install httpx[http2]`), otherwise HTTP/1.1.
+The pool limits and timeouts can be configured with environment variables, see `assessment_module_manager.env`.
+
+Health checks use a separate small client with short timeouts (see `get_health_check_client`), so that they neither
+wait for nor take connections of the pools that serve the requests of the LMS.
+"""
+from typing import Dict, Optional
+
+import httpx
+
+from assessment_module_manager import env
+from assessment_module_manager.logger import logger
+from .module import Module
+
+try:
+    import h2  # pylint: disable=unused-import
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Clients by module (replica) URL
+_clients: Dict[str, httpx.AsyncClient] = {}
+_health_check_client: Optional[httpx.AsyncClient] = None
+
+
+def get_module_client(module: Module, url: Optional[str] = None) -> httpx.AsyncClient:
+    """
+    The pooled client for the module, or for the given replica of it (see module.replicas), created on first use.
+    Do not close it, see `close_module_clients`.
+    """
+    url = url or str(module.url)
+    client = _clients.get(url)
+    if client is None or client.is_closed:
+        logger.info("Creating HTTP client for module %s at %s (HTTP/2: %s)", module.name, url, HTTP2_AVAILABLE)
+        client = httpx.AsyncClient(
+            base_url=url,
+            http2=HTTP2_AVAILABLE,
+            timeout=httpx.Timeout(env.MODULE_READ_TIMEOUT, connect=env.MODULE_CONNECT_TIMEOUT),
+            limits=httpx.Limits(
+                max_connections=env.MODULE_MAX_CONNECTIONS,
+                max_keepalive_connections=env.MODULE_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=env.MODULE_KEEPALIVE_EXPIRY,
+            ),
+        )
+        _clients[url] = client
+    return client
+
+
+def get_health_check_client() -> httpx.AsyncClient:
+    """
+    The client for the health checks of all modules (and replicas), created on first use.
+    Requests have to use absolute URLs. Do not close it, see `close_module_clients`.
+    """
+    global _health_check_client  # pylint: disable=global-statement
+    if _health_check_client is None or _health_check_client.is_closed:
+        _health_check_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(env.HEALTH_CHECK_TIMEOUT),
+            limits=httpx.Limits(max_connections=env.HEALTH_CHECK_MAX_CONNECTIONS),
+        )
+    return _health_check_client
+
+
+async def close_module_clients():
+    """Close the connections of all module clients and of the health check client, on shutdown of the app."""
+    global _health_check_client  # pylint: disable=global-statement
+    clients = list(_clients.values())
+    _clients.clear()
+    if _health_check_client is not None:
+        clients.append(_health_check_client)
+        _health_check_client = None
+    for client in clients:
+        await client.aclose()
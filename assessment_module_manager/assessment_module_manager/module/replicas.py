@@ -0,0 +1,154 @@
+"""
+Load balancing across the replicas of a module, so that a module can be scaled horizontally.
+
+The replicas of a module are configured in modules.ini:
+- `url` and the comma-separated `replica_urls` (or the <MODULE_NAME>_REPLICA_URLS environment variable)
+- or `replica_discovery = dns`: all A/AAAA records of the host of `url` (e.g. a Docker Compose service with several
+  replicas or a headless Kubernetes service), with the port of `url`
+- or `replica_discovery = srv`: the SRV records `_<scheme>._tcp.<host of url>`, this needs the dnspython package
+Discovered replicas are cached for REPLICA_DISCOVERY_INTERVAL seconds, if DNS fails the previous replicas are kept.
+
+Each request goes to the available replica with the least outstanding requests (ties are broken randomly).
+A replica that fails REPLICA_MAX_FAILURES times in a row (connection errors, timeouts or 502/503/504 responses) is
+ejected for REPLICA_EJECTION_SECONDS, unless all replicas are ejected. Requests that could not connect to a replica are
+retried on the other replicas.
+
+With `exercise_affinity = true`, requests for the same exercise (see `get_exercise_affinity_key`) always go to the same
+available replica (rendezvous hashing), so that its caches (e.g. repositories, similarity caches) stay warm. Only the
+requests of exercises of a removed or ejected replica move to other replicas. The modules proxy endpoint takes the
+exercise from the X-Exercise-ID header, the exerciseId query parameter or the request body.
+"""
+import asyncio
+import hashlib
+import random
+import socket
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Sequence, Tuple
+from urllib.parse import urlsplit
+
+from assessment_module_manager import env
+from assessment_module_manager.logger import logger
+from .module import Module
+
+try:
+    import dns.asyncresolver
+except ImportError:
+    dns = None  # type: ignore
+
+# Responses that show that the replica itself has a problem, unlike e.g. a 500 for a single bad request
+FAILURE_STATUS_CODES = (502, 503, 504)
+
+
+@dataclass
+class _ReplicaState:
+    outstanding: int = 0
+    consecutive_failures: int = 0
+    ejected_until: float = 0.0
+
+
+# State by replica URL
+_replica_states: Dict[str, _ReplicaState] = {}
+# Discovered replica URLs with the time until which they are valid, by module name
+_discovered_replica_urls: Dict[str, Tuple[float, Tuple[str, ...]]] = {}
+
+
+def _get_state(url: str) -> _ReplicaState:
+    state = _replica_states.get(url)
+    if state is None:
+        state = _replica_states.setdefault(url, _ReplicaState())
+    return state
+
+
+def _replace_host(url: str, host: str, port: Optional[int]) -> str:
+    parts = urlsplit(url)
+    if ":" in host:
+        host = f"[{host}]"
+    netloc = f"{host}:{port}" if port is not None else host
+    return parts._replace(netloc=netloc).geturl().rstrip("/")
+
+
+async def _discover_replica_urls(module: Module) -> Tuple[str, ...]:
+    url = str(module.url)
+    parts = urlsplit(url)
+    if module.replica_discovery == "srv":
+        if dns is None:
+            raise RuntimeError("replica_discovery = srv needs the dnspython package")
+        records = await dns.asyncresolver.resolve(f"_{parts.scheme}._tcp.{parts.hostname}", "SRV")
+        return tuple(sorted(_replace_host(url, record.target.to_text(omit_final_dot=True), record.port)
+                            for record in records))
+    addresses = await asyncio.get_running_loop().getaddrinfo(parts.hostname, parts.port, type=socket.SOCK_STREAM)
+    return tuple(sorted({_replace_host(url, address[4][0], parts.port) for address in addresses}))
+
+
+async def get_replica_urls(module: Module) -> Tuple[str, ...]:
+    """The URLs of all replicas of the module."""
+    if module.replica_discovery is None:
+        return (str(module.url), *(str(url) for url in module.replica_urls))
+
+    now = time.monotonic()
+    valid_until, urls = _discovered_replica_urls.get(module.name, (0.0, ()))
+    if now < valid_until:
+        return urls
+    try:
+        discovered_urls = await _discover_replica_urls(module)
+        if not discovered_urls:
+            raise RuntimeError("no records found")
+        if discovered_urls != urls:
+            logger.info("Discovered %d replicas of module %s: %s", len(discovered_urls), module.name,
+                        ", ".join(discovered_urls))
+        urls = discovered_urls
+    except Exception as exc:  # pylint: disable=broad-except
+        logger.error("Could not discover the replicas of module %s, keeping the previous ones: %s", module.name, exc)
+        urls = urls or (str(module.url),)
+    _discovered_replica_urls[module.name] = (now + env.REPLICA_DISCOVERY_INTERVAL, urls)
+    return urls
+
+
+def _affinity_score(affinity_key: str, url: str) -> int:
+    return int.from_bytes(hashlib.blake2b(f"{affinity_key}|{url}".encode(), digest_size=8).digest(), "big")
+
+
+def choose_replica(urls: Sequence[str], affinity_key: Optional[str] = None) -> str:
+    """Choose the replica for a request, see the module documentation."""
+    if len(urls) == 1:
+        return urls[0]
+    now = time.monotonic()
+    available_urls = [url for url in urls if _get_state(url).ejected_until <= now] or list(urls)
+    if affinity_key is not None:
+        return max(available_urls, key=lambda url: _affinity_score(affinity_key, url))
+    least_outstanding = min(_get_state(url).outstanding for url in available_urls)
+    return random.choice([url for url in available_urls if _get_state(url).outstanding == least_outstanding])
+
+
+class ReplicaRequest:
+    """An outstanding request to a replica, `finish` it when the response has been received completely."""
+
+    def __init__(self, module: Module, url: str):
+        self.module = module
+        self.url = url
+        self._state = _get_state(url)
+        self._state.outstanding += 1
+        self._finished = False
+
+    def finish(self, failed: bool = False):
+        if self._finished:
+            return
+        self._finished = True
+        self._state.outstanding -= 1
+        if not failed:
+            self._state.consecutive_failures = 0
+            return
+        self._state.consecutive_failures += 1
+        if self._state.consecutive_failures >= env.REPLICA_MAX_FAILURES:
+            if self._state.ejected_until <= time.monotonic():
+                logger.warning("Ejecting replica %s of module %s for %s seconds after %d failures", self.url,
+                               self.module.name, env.REPLICA_EJECTION_SECONDS, self._state.consecutive_failures)
+            self._state.ejected_until = time.monotonic() + env.REPLICA_EJECTION_SECONDS
+
+
+def get_exercise_affinity_key(module: Module, exercise_id: Optional[object]) -> Optional[str]:
+    """The affinity key of requests for the given exercise, None if the module has no exercise affinity."""
+    if not module.exercise_affinity or exercise_id is None:
+        return None
+    return str(exercise_id)
@@ -1,16 +1,33 @@
 import json
-from typing import TypeVar, Generic, Optional
+from typing import AsyncIterable, Awaitable, Callable, Dict, TypeVar, Generic, Optional, Tuple, Union
 
 import httpx
 from fastapi import HTTPException
 from pydantic.generics import GenericModel
+from starlette.background import BackgroundTask
+from starlette.responses import Response, StreamingResponse
 
 from .module import Module
-from .list_modules import list_modules
+from .list_modules import get_module
+from .module_client import get_module_client
+from .replicas import FAILURE_STATUS_CODES, ReplicaRequest, choose_replica, get_replica_urls
 from athena import ExerciseType
+from athena.metadata import ENVELOPE_HEADER
+from athena.tracing import get_traceparent
+from athena.transport import COMPRESSION_MINIMUM_SIZE, SUPPORTED_ENCODINGS, FastJSONResponse, choose_encoding, \
+    compress_async, compress_stream, decompress, json_dumps, json_loads, parse_encodings
 from assessment_module_manager import env
 from assessment_module_manager.logger import logger
 
+# Response media types of modules that stream their results (see athena.streaming in the athena package)
+STREAMING_MEDIA_TYPES = ("application/x-ndjson", "text/event-stream")
+
+# Content encodings that the modules accept for requests by module name, from the Accept-Encoding header of their
+# responses (see athena.transport). Requests to a module are only compressed after its first response.
+_module_request_encodings: Dict[str, Tuple[str, ...]] = {}
+# Magic number at the start of zstd frames
+_ZSTD_MAGIC_NUMBER = b"\x28\xb5\x2f\xfd"
+
 D = TypeVar('D')
 M = TypeVar('M')
 class ModuleResponse(GenericModel, Generic[D, M]):
@@ -27,19 +44,21 @@ async def find_module_by_name(module_name: str) -> Optional[Module]:
     """
     Helper function to find a module by name.
     """
-    for module in list_modules():
-        if module.name == module_name:
-            return module
-    return None
+    return get_module(module_name)
 
 
-# pylint: disable=too-many-positional-arguments
-async def request_to_module(module: Module, headers: dict, path: str, lms_url: str, data: Optional[dict], method: str) -> ModuleResponse:
+def _add_module_headers(module: Module, headers: dict, lms_url: str):
     """
-    Helper function to send a request to a module.
-    It raises appropriate FastAPI HTTPException if the request fails.
+    Add the headers that authorize the request at the module and, for programming modules, at the LMS,
+    the traceparent header to continue the trace of the request in the module
+    and the response encodings that the assessment module manager accepts (only compressed ones if enabled).
     """
-    module_secret = env.MODULE_SECRETS[module.name]
+    headers['Accept-Encoding'] = ", ".join(SUPPORTED_ENCODINGS) if env.COMPRESS_MODULE_REQUESTS else "identity"
+    traceparent = get_traceparent()
+    if traceparent is not None:
+        headers['traceparent'] = traceparent
+
+    module_secret = env.get_module_secret(module.name)
     if module_secret:
         headers['Authorization'] = module_secret  # for inter-Athena communication
 
@@ -51,24 +70,275 @@ async def request_to_module(module: Module, headers: dict, path: str, lms_url: s
         # for repository access
         # should be the same as the LMS key
 
+
+async def _encode_request_body(
+        module: Module, headers: dict, data: Optional[dict], compressed: bool = True
+) -> Optional[bytes]:
+    """Serialize the request body with orjson and compress it if enabled and the module accepts compressed requests."""
+    headers.pop('Content-Encoding', None)
+    if data is None:
+        return None
+    body = json_dumps(data)
+    headers['Content-Type'] = "application/json"
+    encoding = choose_encoding(_module_request_encodings.get(module.name, ()))
+    if env.COMPRESS_MODULE_REQUESTS and compressed and encoding is not None and len(body) >= COMPRESSION_MINIMUM_SIZE:
+        body = await compress_async(body, encoding)
+        headers['Content-Encoding'] = encoding
+    return body
+
+
+def _remember_request_encodings(module: Module, response: httpx.Response):
+    accept_encoding = response.headers.get('Accept-Encoding')
+    if accept_encoding is not None:
+        _module_request_encodings[module.name] = parse_encodings(accept_encoding)
+
+
+def _response_content(response: httpx.Response) -> bytes:
+    """The content of the response, also decoded if it is zstd compressed (httpx only decodes gzip and deflate)."""
+    content = response.content
+    if response.headers.get('Content-Encoding') == "zstd" and content.startswith(_ZSTD_MAGIC_NUMBER):
+        content = decompress(content, "zstd")
+    return content
+
+
+def _to_module_response(module: Module, response: httpx.Response, content: Optional[bytes] = None) -> ModuleResponse:
+    _remember_request_encodings(module, response)
+    if content is None:
+        content = _response_content(response)
     try:
-        async with httpx.AsyncClient(base_url=module.url, timeout=600) as client:
-            if method == "POST":
-                response = await client.post(path, json=data, headers=headers)
-            elif method == "GET":
-                response = await client.get(path, headers=headers)
-            else:
-                raise NotImplementedError(f"Method {method} is not implemented")
-    except httpx.ConnectError as exc:
-        raise HTTPException(status_code=503, detail=f"Module {module.name} is not available") from exc
-    
-    try:
-        response_data = response.json()
+        response_data = json_loads(content)
         meta = response_data.get('meta', {})
         response_data = response_data.get('data', response_data)
     except json.JSONDecodeError:
-        response_data = response.text
+        response_data = content.decode(response.encoding or "utf-8", errors="replace")
         meta = None
-        logger.warning("Module %s returned non-JSON response: %s", module.name, response.text)
+        logger.warning("Module %s returned non-JSON response: %s", module.name, response_data)
+
+    return ModuleResponse(module_name=module.name, status=response.status_code, data=response_data, meta=meta)
+
+
+async def _send_to_replica(
+        module: Module, affinity_key: Optional[str], send: Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+) -> Tuple[httpx.Response, ReplicaRequest]:
+    """
+    Send a request with send(client) to a replica of the module (see module.replicas), retried on the other replicas
+    if it cannot connect. Finish the returned replica request once the response has been received completely.
+    """
+    urls = list(await get_replica_urls(module))
+    while True:
+        replica = ReplicaRequest(module, choose_replica(urls, affinity_key))
+        try:
+            return await send(get_module_client(module, replica.url)), replica
+        except (httpx.ConnectError, httpx.ConnectTimeout) as exc:
+            replica.finish(failed=True)
+            urls.remove(replica.url)
+            if not urls:
+                raise HTTPException(status_code=503, detail=f"Module {module.name} is not available") from exc
+            logger.warning("Could not connect to replica %s of module %s, trying another one", replica.url, module.name)
+        except httpx.HTTPError:
+            replica.finish(failed=True)
+            raise
+        except BaseException:
+            replica.finish()
+            raise
+
+
+# pylint: disable=too-many-positional-arguments
+async def request_to_module(
+        module: Module, headers: dict, path: str, lms_url: str, data: Optional[dict], method: str,
+        affinity_key: Optional[str] = None
+) -> ModuleResponse:
+    """
+    Helper function to send a request to a module.
+    affinity_key (e.g. from `get_exercise_affinity_key`) sends requests with the same key to the same replica.
+    It raises appropriate FastAPI HTTPException if the request fails.
+    """
+    if method not in ("POST", "GET"):
+        raise NotImplementedError(f"Method {method} is not implemented")
+    _add_module_headers(module, headers, lms_url)
+    content = await _encode_request_body(module, headers, data if method == "POST" else None)
+
+    async def send(client: httpx.AsyncClient) -> httpx.Response:
+        response = await client.request(method, path, content=content, headers=headers)
+        if response.status_code == 415 and 'Content-Encoding' in headers:
+            # The module does not accept the compressed request (anymore), e.g. after a downgrade
+            _remember_request_encodings(module, response)
+            uncompressed_content = await _encode_request_body(module, headers, data, compressed=False)
+            response = await client.request(method, path, content=uncompressed_content, headers=headers)
+        return response
+
+    response, replica = await _send_to_replica(module, affinity_key, send)
+    replica.finish(failed=response.status_code in FAILURE_STATUS_CODES)
+    return _to_module_response(module, response)
+
+
+# pylint: disable=too-many-positional-arguments
+async def stream_from_module(
+        module: Module, headers: dict, path: str, lms_url: str, data: Optional[dict], method: str,
+        affinity_key: Optional[str] = None
+) -> Union[StreamingResponse, ModuleResponse]:
+    """
+    Helper function to send a request to a module that may stream its response (e.g. feedback suggestions).
+    A streaming response of the module is passed through chunk by chunk, as soon as each chunk arrives.
+    Other responses are returned as a ModuleResponse, like in `request_to_module`.
+    It raises appropriate FastAPI HTTPException if the request fails.
+    """
+    if method not in ("POST", "GET"):
+        raise NotImplementedError(f"Method {method} is not implemented")
+    _add_module_headers(module, headers, lms_url)
+    content = await _encode_request_body(module, headers, data if method == "POST" else None)
+
+    async def send(client: httpx.AsyncClient) -> httpx.Response:
+        return await client.send(client.build_request(method, path, content=content, headers=headers), stream=True)
+
+    response, replica = await _send_to_replica(module, affinity_key, send)
+    media_type = response.headers.get("content-type", "").split(";")[0]
+    if media_type not in STREAMING_MEDIA_TYPES:
+        try:
+            await response.aread()
+        finally:
+            await response.aclose()
+            replica.finish(failed=response.status_code in FAILURE_STATUS_CODES)
+        return _to_module_response(module, response)
+    return _stream_response(response, media_type, replica)
+
+
+def _release(response: httpx.Response, replica: ReplicaRequest, failed: bool = False) -> Callable[[], Awaitable[None]]:
+    """
+    A function that finishes the replica request and closes the response of the module (which returns the connection
+    to the pool), both only once even if it is called several times.
+    Responses that are passed through call it when they end and as the background task of the StreamingResponse: the
+    generator of a StreamingResponse is never started if the LMS disconnects before, so its finally would not run.
+    """
+    async def release():
+        replica.finish(failed=failed)
+        await response.aclose()
+
+    return release
+
+
+def _stream_response(response: httpx.Response, media_type: str, replica: ReplicaRequest) -> StreamingResponse:
+    """Pass a streaming response of a module through chunk by chunk, as soon as each chunk arrives."""
+    release = _release(response, replica)
+
+    async def pass_through():
+        try:
+            async for chunk in response.aiter_raw():
+                yield chunk
+        finally:
+            await release()
+
+    return StreamingResponse(
+        pass_through(),
+        status_code=response.status_code,
+        media_type=media_type,
+        headers={"X-Accel-Buffering": "no"},
+        background=BackgroundTask(release),
+    )
+
+
+# pylint: disable=too-many-positional-arguments
+async def pass_through_to_module(
+        module: Module, headers: dict, path: str, lms_url: str, body: Optional[AsyncIterable[bytes]], method: str,
+        affinity_key: Optional[str] = None, accept_encoding: Optional[str] = None
+) -> Response:
+    """
+    Helper function to forward a request to a module without parsing it: the request body is streamed to the module
+    as it arrives (compressed if enabled, see `_encode_request_body`) and the response of the module is streamed back.
+    The response is the same as a ModuleResponse: JSON responses of the module that are marked with the envelope
+    header ({"data": ..., "meta": ...}, see athena.metadata) only get "module_name" and "status" prepended and are
+    compressed for the LMS as they are sent, depending on accept_encoding (the Accept-Encoding header of the LMS).
+    Other responses (e.g. errors) are converted like in `request_to_module`.
+    Streaming responses (e.g. feedback suggestions) are passed through like in `stream_from_module`.
+    headers has to contain the Content-Type, Content-Encoding and Content-Length headers of the body, if any.
+    It raises appropriate FastAPI HTTPException if the request fails.
+    """
+    if method not in ("POST", "GET"):
+        raise NotImplementedError(f"Method {method} is not implemented")
+    _add_module_headers(module, headers, lms_url)
+    # The JSON response is extended as it is, so it must not be compressed by the module
+    headers['Accept-Encoding'] = "identity"
+
+    encoding = choose_encoding(_module_request_encodings.get(module.name, ()))
+    if (body is not None and env.COMPRESS_MODULE_REQUESTS and encoding is not None
+            and 'Content-Encoding' not in headers
+            and int(headers.get('Content-Length', COMPRESSION_MINIMUM_SIZE)) >= COMPRESSION_MINIMUM_SIZE):
+        body = compress_stream(body, encoding)
+        headers['Content-Encoding'] = encoding
+        headers.pop('Content-Length', None)
+
+    async def send(client: httpx.AsyncClient) -> httpx.Response:
+        # The body is only read once connected, so the request can be retried on another replica if connecting fails
+        return await client.send(client.build_request(method, path, content=body, headers=headers), stream=True)
+
+    response, replica = await _send_to_replica(module, affinity_key, send)
+    _remember_request_encodings(module, response)
+
+    media_type = response.headers.get("content-type", "").split(";")[0]
+    if media_type in STREAMING_MEDIA_TYPES:
+        return _stream_response(response, media_type, replica)
+
+    failed = response.status_code in FAILURE_STATUS_CODES
+    chunks = response.aiter_raw()
+    start = b""
+    skipped = 0
+    is_envelope = (response.headers.get(ENVELOPE_HEADER) == "1" and media_type == "application/json"
+                   and response.headers.get('Content-Encoding', "identity") == "identity")
+    try:
+        content: Optional[bytes] = None
+        if is_envelope:
+            # The response is a JSON object, only its opening brace is replaced
+            async for chunk in chunks:
+                start += chunk
+                if start.lstrip():
+                    break
+            skipped = len(start) - len(start.lstrip())
+            start = start[skipped:]
+            is_envelope = start.startswith(b"{")
+            if not is_envelope:
+                content = start + b"".join([chunk async for chunk in chunks])
+        else:
+            await response.aread()
+    except BaseException:
+        await response.aclose()
+        replica.finish(failed=True)
+        raise
+    if not is_envelope:
+        # Errors (e.g. {"detail": ...}) and other responses are small, convert them like request_to_module
+        await response.aclose()
+        replica.finish(failed=failed)
+        module_response = _to_module_response(module, response, content)
+        return FastJSONResponse(status_code=module_response.status, content=module_response.dict())
+
+    # {"module_name": ..., "status": ..., "data": ..., "meta": ...}
+    envelope_start = json_dumps({"module_name": module.name, "status": response.status_code})[:-1] + b","
+    release = _release(response, replica, failed)
+
+    async def extended_response():
+        try:
+            yield envelope_start + start[1:]
+            async for chunk in chunks:
+                yield chunk
+        finally:
+            await release()
 
-    return ModuleResponse(module_name=module.name, status=response.status_code, data=response_data, meta=meta)
\ No newline at end of file
+    content_length = None
+    if 'Content-Length' in response.headers:
+        content_length = int(response.headers['Content-Length']) - skipped + len(envelope_start) - 1
+    response_headers = {}
+    response_encoding = choose_encoding(parse_encodings(accept_encoding))
+    stream: AsyncIterable[bytes] = extended_response()
+    if response_encoding is not None and (content_length is None or content_length >= COMPRESSION_MINIMUM_SIZE):
+        # The StreamingResponse is not compressed by the CompressionMiddleware (see athena.transport)
+        stream = compress_stream(stream, response_encoding)
+        response_headers['Content-Encoding'] = response_encoding
+        response_headers['Vary'] = "Accept-Encoding"
+    elif content_length is not None:
+        response_headers['Content-Length'] = str(content_length)
+    return StreamingResponse(
+        stream,
+        status_code=response.status_code,
+        media_type="application/json",
+        headers=response_headers,
+        background=BackgroundTask(release),
+    )
@@ -0,0 +1,147 @@
+"""
+Benchmark of the submission ingest through the assessment module manager: an LMS sends 2,000 text submissions of
+about 10 KB each to `/modules/text/module_text_llm/submissions`, which the assessment module manager forwards to the
+module. The module is an Athena app with a `submissions_consumer` that does nothing, so the numbers are the time spent
+on (de)serialization, compression and the two HTTP hops.
+
+The module and the assessment module manager run in their own processes on local ports, like in a deployment. Each
+configuration is measured with new processes:
+- "plain": uncompressed module requests (the default)
+- "compressed": COMPRESS_MODULE_REQUESTS=1, zstd if zstandard is installed, otherwise gzip
+
+Usage (from the assessment_module_manager directory):
+    python -m benchmarks.ingest_submissions [--configuration plain|compressed] [--submissions 2000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+CONFIGURATIONS = ("plain", "compressed")
+MANAGER_PORT = 6100
+MODULE_PORT = 6101
+LMS_URL = "http://localhost:8080"  # the "local" deployment of deployments.ini
+LMS_SECRET = "abcdef12345"  # the development secret of the assessment module manager
+SUBMISSION_SIZE = 10_000
+WORDS = ("the of and to in is that for it as was with be by on not this are or from at which but have an they you were "
+         "there one all we their can has more if will would about when what out up so into than them only some could "
+         "these two may first then do any like now over such our even most made after also did many before must "
+         "through back years where much your way well down should because each just those people how too little state "
+         "good very make world still own see work long get here between both life being under never day same another "
+         "know while last might great old year off come since against go came right used take three").split()
+
+MODULE_SCRIPT = """
+import uvicorn
+from typing import List
+from athena import app, submissions_consumer
+from athena.database import create_tables
+from athena.migrations import run_migrations
+from athena.text import Exercise, Submission
+
+@submissions_consumer
+def receive_submissions(exercise: Exercise, submissions: List[Submission]):
+    pass
+
+create_tables("text")
+run_migrations()
+uvicorn.run(app, port={port}, log_level="warning")
+"""
+
+
+def _essay(rng: random.Random) -> str:
+    sentences, size = [], 0
+    while size < SUBMISSION_SIZE:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 18))).capitalize() + "."
+        sentences.append(sentence)
+        size += len(sentence) + 1
+    return " ".join(sentences)
+
+
+def _request_body(n_submissions: int) -> dict:
+    rng = random.Random(1)
+    return {
+        "exercise": {"id": 1, "title": "Essay", "type": "text", "maxPoints": 10, "bonusPoints": 0,
+                     "gradingInstructions": "", "problemStatement": "Write an essay.", "meta": {}},
+        "submissions": [{"id": i, "exerciseId": 1, "text": _essay(rng), "language": "ENGLISH", "meta": {}}
+                        for i in range(1, n_submissions + 1)],
+    }
+
+
+def _wait_until_reachable(client: httpx.Client, url: str, process: subprocess.Popen):
+    for _ in range(300):
+        if process.poll() is not None:
+            raise RuntimeError(f"{url} exited with code {process.returncode}")
+        try:
+            client.get(url)
+            return
+        except httpx.TransportError:
+            time.sleep(0.1)
+    raise RuntimeError(f"{url} is not reachable")
+
+
+def run_configuration(configuration: str, n_submissions: int, repeat: int):
+    manager_directory = Path(__file__).parent.parent
+    module_directory = tempfile.mkdtemp(prefix="athena-benchmark-")
+    # The module reads its name from module.conf
+    Path(module_directory, "module.conf").write_text(
+        f"[module]\nname = module_text_llm\ntype = text\nport = {MODULE_PORT}\n")
+    module_env = {**os.environ, "DATABASE_URL": f"sqlite:///{module_directory}/data.sqlite"}
+    manager_env = {
+        **os.environ,
+        "MODULE_TEXT_LLM_URL": f"http://127.0.0.1:{MODULE_PORT}",
+        "COMPRESS_MODULE_REQUESTS": "1" if configuration == "compressed" else "0",
+    }
+    manager_script = f"import uvicorn; from assessment_module_manager.__main__ import app; " \
+                     f"uvicorn.run(app, port={MANAGER_PORT}, log_level='warning')"
+
+    body = json.dumps(_request_body(n_submissions)).encode()
+    headers = {"Authorization": LMS_SECRET, "X-Server-URL": LMS_URL, "Content-Type": "application/json"}
+    url = f"http://127.0.0.1:{MANAGER_PORT}/modules/text/module_text_llm/submissions"
+    processes = [
+        subprocess.Popen([sys.executable, "-c", MODULE_SCRIPT.format(port=MODULE_PORT)], cwd=module_directory,
+                         env=module_env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        subprocess.Popen([sys.executable, "-c", manager_script], cwd=manager_directory, env=manager_env,
+                         stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+    ]
+    try:
+        with httpx.Client(timeout=600) as client:
+            _wait_until_reachable(client, f"http://127.0.0.1:{MODULE_PORT}/", processes[0])
+            _wait_until_reachable(client, f"http://127.0.0.1:{MANAGER_PORT}/", processes[1])
+            # Warm up, the assessment module manager learns the accepted request encodings of the module
+            warm_up = client.post(url, content=json.dumps({**json.loads(body), "submissions": []}), headers=headers)
+            assert warm_up.status_code == 200, warm_up.text
+            best = float("inf")
+            for _ in range(repeat):
+                start = time.perf_counter()
+                response = client.post(url, content=body, headers=headers)
+                best = min(best, time.perf_counter() - start)
+                assert response.status_code == 200, response.text
+        print(f"{configuration:10s} {n_submissions} submissions ({len(body) / 1e6:.1f} MB) in {best:.2f}s "
+              f"({n_submissions / best:,.0f}/s)", flush=True)
+    finally:
+        for process in processes:
+            process.terminate()
+            process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--configuration", choices=CONFIGURATIONS,
+                        help="only measure this configuration (default: all)")
+    parser.add_argument("--submissions", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of this many runs")
+    args = parser.parse_args()
+    for configuration in CONFIGURATIONS:
+        if args.configuration in (None, configuration):
+            run_configuration(configuration, args.submissions, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Test setup: the requests that the assessment module manager sends to a module go to a module app in the same process
+(see `module_app`) instead of the URL of the module in modules.ini.
+`athena.database` creates the engine on import, so DATABASE_URL has to be set before athena is imported.
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from typing import Callable, Optional
+
+import httpx
+import pytest
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='athena-tests-')}/data.sqlite"
+
+# pylint: disable=wrong-import-position
+from fastapi import FastAPI
+
+from athena.request_context import RequestContextMiddleware
+from athena.transport import CompressionMiddleware, FastJSONResponse, FastRoute
+from assessment_module_manager.__main__ import app
+
+LMS_URL = "http://localhost:8080"  # the "local" deployment of deployments.ini
+LMS_HEADERS = {"Authorization": "abcdef12345", "X-Server-URL": LMS_URL}
+
+
+@pytest.fixture
+def module_app(monkeypatch) -> FastAPI:
+    """An empty module app (like the athena app) that answers the requests to all modules, add endpoints to it."""
+    module = FastAPI(default_response_class=FastJSONResponse)
+    module.router.route_class = FastRoute
+    module.add_middleware(CompressionMiddleware)
+    module.add_middleware(RequestContextMiddleware)
+    # The module is shadowed by the function of the same name in assessment_module_manager.module
+    request_to_module = sys.modules["assessment_module_manager.module.request_to_module"]
+    monkeypatch.setattr(request_to_module, "get_module_client", lambda module_, url=None: httpx.AsyncClient(
+        transport=httpx.ASGITransport(app=module), base_url=url or str(module_.url)))
+    return module
+
+
+@pytest.fixture
+def request_to_manager() -> Callable[..., httpx.Response]:
+    """Sends a request of the LMS to the assessment module manager, e.g. request_to_manager("POST", path, json=...)."""
+    def send(method: str, path: str, headers: Optional[dict] = None, **kwargs) -> httpx.Response:
+        async def request():
+            async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://manager") as client:
+                return await client.request(method, path, headers={**LMS_HEADERS, **(headers or {})}, **kwargs)
+        return asyncio.run(request())
+    return send
@@ -0,0 +1,72 @@
+"""The module registry is kept in memory and only reloaded when modules.ini changes (see module.list_modules)."""
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+from athena import ExerciseType
+from assessment_module_manager.module import get_module, list_modules
+
+# The module is shadowed by the function of the same name in assessment_module_manager.module
+list_modules_module = sys.modules["assessment_module_manager.module.list_modules"]
+
+MODULE = """
+[{name}]
+url = http://localhost:{port}
+type = {type}
+supports_evaluation = false
+supports_non_graded_feedback_requests = false
+supports_graded_feedback_requests = true
+"""
+
+
+@pytest.fixture
+def modules_ini(monkeypatch, tmp_path) -> Path:
+    """A modules.ini of the test, checked for changes on every lookup."""
+    path = tmp_path / "modules.ini"
+    path.write_text(MODULE.format(name="module_text_llm", port=5003, type="text"))
+    monkeypatch.setattr(list_modules_module, "MODULES_INI_PATH", path)
+    monkeypatch.setattr(list_modules_module, "MODULES_INI_CHECK_INTERVAL", 0)
+    # pylint: disable=protected-access
+    monkeypatch.setattr(list_modules_module, "_registry",
+                        list_modules_module._load_registry(list_modules_module._get_mtime_ns()))
+    monkeypatch.setattr(list_modules_module, "_next_check", 0.0)
+    return path
+
+
+def _change(path: Path, content: str):
+    """Write the file with a new modification time, even on file systems with a coarse resolution."""
+    mtime_ns = os.stat(path).st_mtime_ns
+    path.write_text(content)
+    os.utime(path, ns=(mtime_ns + 1_000_000_000, mtime_ns + 1_000_000_000))
+
+
+def test_modules_are_looked_up_by_name_and_type(modules_ini):
+    _change(modules_ini, modules_ini.read_text() + MODULE.format(name="module_programming_llm", port=5002,
+                                                                 type="programming"))
+
+    assert [module.name for module in list_modules()] == ["module_text_llm", "module_programming_llm"]
+    assert [module.name for module in list_modules(ExerciseType.programming)] == ["module_programming_llm"]
+    assert list_modules(ExerciseType.modeling) == []
+    assert str(get_module("module_text_llm").url) == "http://localhost:5003"  # type: ignore
+    assert get_module("module_missing") is None
+
+
+def test_the_registry_is_reloaded_when_the_file_changes(modules_ini):
+    # pylint: disable=protected-access
+    registry = list_modules_module._registry
+    list_modules()
+    # Unchanged: the same registry
+    assert list_modules_module._registry is registry
+
+    _change(modules_ini, MODULE.format(name="module_text_llm", port=5013, type="text"))
+
+    assert str(get_module("module_text_llm").url) == "http://localhost:5013"  # type: ignore
+
+
+def test_invalid_changes_keep_the_previous_modules(modules_ini):
+    _change(modules_ini, "[module_text_llm]\nurl = http://localhost:5013\n")
+
+    assert str(get_module("module_text_llm").url) == "http://localhost:5003"  # type: ignore
+    assert [module.name for module in list_modules()] == ["module_text_llm"]
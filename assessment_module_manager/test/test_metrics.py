@@ -0,0 +1,31 @@
+"""The Prometheus metrics of the assessment module manager are only served with the METRICS_SECRET in production."""
+import pytest
+
+from assessment_module_manager import env
+
+
+@pytest.fixture
+def production(monkeypatch):
+    monkeypatch.setattr(env, "PRODUCTION", True)
+    monkeypatch.setattr(env, "METRICS_SECRET", "metrics-secret")
+
+
+def test_metrics_are_served_with_the_secret(production, request_to_manager):
+    request_to_manager("GET", "/modules")
+    response = request_to_manager("GET", "/metrics", headers={"Authorization": "Bearer metrics-secret"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    assert 'athena_http_request_duration_seconds_count{method="GET",route="/modules",status="200"}' in response.text
+
+
+@pytest.mark.parametrize("authorization", ["abcdef12345", "Bearer wrong-secret"])
+def test_metrics_are_not_served_without_the_secret(production, request_to_manager, authorization):
+    response = request_to_manager("GET", "/metrics", headers={"Authorization": authorization})
+    assert response.status_code == 401
+    assert "athena_" not in response.text
+
+
+def test_metrics_are_not_served_in_production_without_a_configured_secret(production, monkeypatch, request_to_manager):
+    monkeypatch.setattr(env, "METRICS_SECRET", None)
+    response = request_to_manager("GET", "/metrics", headers={"Authorization": "Bearer "})
+    assert response.status_code == 401
@@ -0,0 +1,109 @@
+"""
+The modules proxy endpoint forwards requests to the modules without parsing them (PROXY_PASS_THROUGH, on by default)
+and extends the {"data": ..., "meta": ...} responses of the modules to ModuleResponses as they are streamed back.
+"""
+import sys
+from typing import Any
+
+import pytest
+
+from fastapi import HTTPException, Request
+from fastapi.responses import JSONResponse
+
+from athena.metadata import emit_meta, with_meta
+
+PATH = "/modules/text/module_text_llm/submissions"
+
+
+@pytest.fixture
+def without_conversion(monkeypatch):
+    """Fail if a module response is parsed and converted instead of extended as it is."""
+    def convert(*args, **kwargs):
+        raise AssertionError("The module response was converted")
+    monkeypatch.setattr(sys.modules["assessment_module_manager.module.request_to_module"], "_to_module_response",
+                        convert)
+
+
+def _add_submissions_endpoint(module_app, received: list):
+    @module_app.post("/submissions")
+    @with_meta
+    async def submissions(request: Request):
+        body = await request.json()
+        received.append(body)
+        emit_meta("received", len(body["submissions"]))
+        return {"ids": [submission["id"] for submission in body["submissions"]]}
+
+
+def test_module_response_is_extended_to_a_module_response(module_app, request_to_manager, without_conversion):
+    received: list = []
+    _add_submissions_endpoint(module_app, received)
+
+    response = request_to_manager("POST", PATH, json={"submissions": [{"id": 1}, {"id": 2}]})
+
+    assert response.status_code == 200
+    assert response.json()["module_name"] == "module_text_llm"
+    assert response.json()["status"] == 200
+    assert response.json()["data"] == {"ids": [1, 2]}
+    assert response.json()["meta"]["received"] == 2
+    assert received == [{"submissions": [{"id": 1}, {"id": 2}]}]
+
+
+def test_extended_response_is_compressed_for_the_lms(module_app, request_to_manager, without_conversion):
+    _add_submissions_endpoint(module_app, [])
+    submissions = [{"id": i} for i in range(1000)]
+
+    response = request_to_manager("POST", PATH, json={"submissions": submissions}, headers={"Accept-Encoding": "gzip"})
+
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in response.headers["Vary"]
+    # httpx decodes the response
+    assert response.json()["data"] == {"ids": list(range(1000))}
+
+
+def test_extended_response_is_not_compressed_without_accepted_encoding(module_app, request_to_manager,
+                                                                      without_conversion):
+    _add_submissions_endpoint(module_app, [])
+
+    response = request_to_manager("POST", PATH, json={"submissions": [{"id": 1}]},
+                                  headers={"Accept-Encoding": "identity"})
+
+    assert "Content-Encoding" not in response.headers
+    assert int(response.headers["Content-Length"]) == len(response.content)
+    assert response.json()["data"] == {"ids": [1]}
+
+
+def test_responses_without_envelope_header_are_converted(module_app, request_to_manager):
+    @module_app.post("/submissions")
+    async def submissions() -> Any:
+        # Like an envelope, but not from @with_meta, e.g. from a module with an older athena version
+        return JSONResponse({"meta": {"version": 1}, "data": [1, 2]})
+
+    response = request_to_manager("POST", PATH, json={"submissions": []})
+
+    assert response.json() == {"module_name": "module_text_llm", "status": 200, "data": [1, 2],
+                               "meta": {"version": 1}}
+
+
+def test_module_errors_are_converted(module_app, request_to_manager):
+    @module_app.post("/submissions")
+    @with_meta
+    async def submissions():
+        raise HTTPException(status_code=400, detail="Invalid exercise")
+
+    response = request_to_manager("POST", PATH, json={"submissions": []})
+
+    assert response.status_code == 400
+    assert response.json() == {"module_name": "module_text_llm", "status": 400,
+                               "data": {"detail": "Invalid exercise"}, "meta": {}}
+
+
+def test_non_object_json_bodies_are_rejected(module_app, request_to_manager):
+    received: list = []
+    _add_submissions_endpoint(module_app, received)
+
+    response = request_to_manager("POST", PATH, json=[{"id": 1}])
+
+    assert response.status_code == 422
+    assert response.json()["detail"] == "The request body must be a JSON object"
+    assert not received
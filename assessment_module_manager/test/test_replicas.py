@@ -0,0 +1,134 @@
+"""
+Requests to a module are balanced across its replicas (see module.replicas) over pooled clients (see module_client):
+least outstanding requests, exercise affinity, ejection of failing replicas and retries on connection errors.
+"""
+import asyncio
+import sys
+from typing import List
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from athena import ExerciseType
+from assessment_module_manager import env
+from assessment_module_manager.module import Module, get_module_client, request_to_module
+from assessment_module_manager.module.replicas import ReplicaRequest, choose_replica, get_replica_urls
+
+URLS = ("http://replica-1:5003", "http://replica-2:5003", "http://replica-3:5003")
+
+
+@pytest.fixture(autouse=True)
+def replica_states(monkeypatch):
+    """Fresh outstanding requests and failures of the replicas for each test."""
+    monkeypatch.setattr(sys.modules["assessment_module_manager.module.replicas"], "_replica_states", {})
+
+
+def _module(replica_urls=URLS[1:]) -> Module:
+    return Module(name="module_text_llm", url=URLS[0], type=ExerciseType.text, supports_evaluation=False,
+                  supports_non_graded_feedback_requests=False, supports_graded_feedback_requests=True,
+                  replica_urls=list(replica_urls))
+
+
+def test_replica_urls_are_the_url_and_replica_urls():
+    assert asyncio.run(get_replica_urls(_module())) == URLS
+
+
+def test_requests_go_to_the_replica_with_the_least_outstanding_requests():
+    module = _module()
+    busy = [ReplicaRequest(module, URLS[0]), ReplicaRequest(module, URLS[0]), ReplicaRequest(module, URLS[2])]
+
+    assert {choose_replica(URLS) for _ in range(20)} == {URLS[1]}
+    for request in busy:
+        request.finish()
+    assert {choose_replica(URLS) for _ in range(100)} == set(URLS)
+
+
+def test_failing_replicas_are_ejected(monkeypatch):
+    monkeypatch.setattr(env, "REPLICA_MAX_FAILURES", 2)
+    module = _module()
+    for _ in range(2):
+        ReplicaRequest(module, URLS[0]).finish(failed=True)
+
+    assert URLS[0] not in {choose_replica(URLS) for _ in range(100)}
+    # Unless all replicas are ejected
+    assert choose_replica(URLS[:1]) == URLS[0]
+
+
+def test_a_success_resets_the_failures(monkeypatch):
+    monkeypatch.setattr(env, "REPLICA_MAX_FAILURES", 2)
+    module = _module()
+    ReplicaRequest(module, URLS[0]).finish(failed=True)
+    ReplicaRequest(module, URLS[0]).finish()
+    ReplicaRequest(module, URLS[0]).finish(failed=True)
+
+    assert URLS[0] in {choose_replica(URLS) for _ in range(100)}
+
+
+def test_exercise_affinity_keeps_exercises_on_their_replica(monkeypatch):
+    monkeypatch.setattr(env, "REPLICA_MAX_FAILURES", 1)
+    replicas = {exercise_id: choose_replica(URLS, str(exercise_id)) for exercise_id in range(100)}
+
+    assert len(set(replicas.values())) == 3
+    assert all(choose_replica(URLS, str(exercise_id)) == url for exercise_id, url in replicas.items())
+    # Only the exercises of an ejected replica move
+    ReplicaRequest(_module(), URLS[0]).finish(failed=True)
+    for exercise_id, url in replicas.items():
+        expected_url = url if url != URLS[0] else choose_replica(URLS[1:], str(exercise_id))
+        assert choose_replica(URLS, str(exercise_id)) == expected_url
+
+
+@pytest.fixture
+def replica_handler(monkeypatch) -> List[str]:
+    """Replicas that answer with their URL, except replica-1 which refuses connections. Returns the requested URLs."""
+    requested_urls: List[str] = []
+
+    def handle(request: httpx.Request) -> httpx.Response:
+        url = f"{request.url.scheme}://{request.url.host}:{request.url.port}"
+        requested_urls.append(url)
+        if url == URLS[0]:
+            raise httpx.ConnectError("Connection refused", request=request)
+        return httpx.Response(200, json={"data": url, "meta": {}})
+
+    request_to_module_module = sys.modules["assessment_module_manager.module.request_to_module"]
+    monkeypatch.setattr(request_to_module_module, "get_module_client", lambda module, url=None: httpx.AsyncClient(
+        transport=httpx.MockTransport(handle), base_url=url or str(module.url)))
+    return requested_urls
+
+
+def _send(module: Module, affinity_key=None):
+    return asyncio.run(request_to_module(module, {}, "/submissions", "http://lms", {}, "POST",
+                                         affinity_key=affinity_key))
+
+
+def test_requests_are_retried_on_other_replicas_if_they_cannot_connect(replica_handler):
+    module = _module()
+    # With exercise affinity to replica-1
+    affinity_key = next(str(key) for key in range(100) if choose_replica(URLS, str(key)) == URLS[0])
+
+    response = _send(module, affinity_key)
+
+    assert replica_handler[0] == URLS[0]
+    assert response.status == 200
+    assert response.data == replica_handler[1] != URLS[0]
+
+
+def test_requests_fail_if_no_replica_is_reachable(replica_handler):
+    with pytest.raises(HTTPException) as exc_info:
+        _send(_module(replica_urls=[]))
+
+    assert exc_info.value.status_code == 503
+    assert replica_handler == [URLS[0]]
+
+
+def test_clients_are_pooled_per_replica(monkeypatch):
+    monkeypatch.setattr(sys.modules["assessment_module_manager.module.module_client"], "_clients", {})
+    module = _module()
+
+    async def clients():
+        return get_module_client(module), get_module_client(module, URLS[0]), get_module_client(module, URLS[1])
+    first, same, other = asyncio.run(clients())
+
+    assert first is same
+    assert other is not first
+    assert str(other.base_url).rstrip("/") == URLS[1]
@@ -1,11 +1,16 @@
 import os
 import runpy
 from pathlib import Path
+from typing import Optional
 
 from . import contextvars
 from .app import app
+from .authenticate import authenticated
+from .database import run_in_db_async
+from .jobs import get_jobs
 from .schemas import ExerciseType, GradingCriterion, StructuredGradingInstruction, StructuredGradingCriterion
-from .metadata import emit_meta, get_meta
+from .metadata import emit_meta, get_meta, with_meta
+from .timing import timed
 from .experiment import get_experiment_environment
 from .endpoints import submission_selector, submissions_consumer, feedback_consumer, feedback_provider, config_schema_provider, evaluation_provider  # type: ignore
 
@@ -15,6 +20,14 @@ def module_health():
     return {"status": "ok"}
 
 
+@app.get("/jobs")
+@authenticated
+@with_meta
+async def module_jobs(exercise_id: Optional[int] = None):
+    """Status of the most recent background jobs of the module (e.g. from the submissions consumer)."""
+    return await run_in_db_async(get_jobs, exercise_id)
+
+
 def run_module():
     """Helper function for nice poetry scripts to start athena modules."""
     module_parent_path = Path(os.getcwd())
@@ -33,6 +46,7 @@ __all__ = [
     "evaluation_provider",
     "emit_meta",
     "get_meta",
+    "timed",
     "get_experiment_environment",
     "ExerciseType",
     "GradingCriterion",
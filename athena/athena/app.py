@@ -10,12 +10,27 @@ from fastapi.exceptions import RequestValidationError
 from fastapi.responses import JSONResponse
 
 from . import env
-from .database import create_tables
+from .database import create_tables, engine
+from .migrations import run_migrations
 from .logger import logger
 from .module_config import get_module_config
-from .metadata import MetaDataMiddleware
-from .experiment import ExperimentMiddleware
-from .helpers.programming.repository_authorization_middleware import init_repo_auth_middleware
+from .request_context import RequestContextMiddleware
+from .jobs import count_queued_jobs, register_periodic_task, start_job_workers, stop_job_workers
+from .metrics import MetricsMiddleware, db_pool_connections, jobs_queued, metrics_endpoint, register_collector
+from .process_pool import start_process_pool, shutdown_process_pool
+from .storage import delete_unreferenced_meta_blobs
+from .tracing import TracingMiddleware, set_service_name
+from .transport import CompressionMiddleware, FastJSONResponse, FastRoute
+
+
+def _collect_module_metrics():
+    # Only registered when the module starts: the assessment module manager imports athena, but has no database
+    jobs_queued.set(count_queued_jobs())
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        db_pool_connections.set(pool.checkedin(), state="checked_in")  # type: ignore
+        db_pool_connections.set(pool.checkedout(), state="checked_out")  # type: ignore
+        db_pool_connections.set(max(pool.overflow(), 0), state="overflow")  # type: ignore
 
 
 class FastAPIWithStart(FastAPI):
@@ -25,9 +40,27 @@ class FastAPIWithStart(FastAPI):
     which uvicorn needs to discover in the module.
     """
     def __init__(self, *args, **kwargs):
+        # Parse requests and render responses with orjson, see athena.transport
+        kwargs.setdefault("default_response_class", FastJSONResponse)
         super().__init__(*args, **kwargs)
-        self.add_middleware(MetaDataMiddleware)
-        self.add_middleware(ExperimentMiddleware)
+        self.router.route_class = FastRoute
+        self.add_middleware(RequestContextMiddleware)
+        # Compress large responses and accept compressed requests, see athena.transport
+        self.add_middleware(CompressionMiddleware)
+        # Prometheus metrics, see athena.metrics
+        self.add_middleware(MetricsMiddleware)
+        self.add_api_route("/metrics", metrics_endpoint, include_in_schema=False)
+        self.add_event_handler("startup", lambda: register_collector(_collect_module_metrics))
+        # Distributed tracing, see athena.tracing
+        self.add_middleware(TracingMiddleware)
+        self.add_event_handler("startup", lambda: set_service_name(get_module_config().name))
+        # Run queued consumer jobs and periodic tasks in the background while the app is running
+        register_periodic_task(delete_unreferenced_meta_blobs, env.META_BLOB_CLEANUP_INTERVAL_SECONDS)
+        self.add_event_handler("startup", start_job_workers)
+        self.add_event_handler("shutdown", stop_job_workers)
+        # Start the worker processes for module functions with executor="process" early, not on the first request
+        self.add_event_handler("startup", start_process_pool)
+        self.add_event_handler("shutdown", shutdown_process_pool)
 
 
     def start(self) -> None:
@@ -40,6 +73,8 @@ class FastAPIWithStart(FastAPI):
 
         logger.debug("Creating database tables")
         create_tables(conf.type)
+        logger.debug("Running database migrations")
+        run_migrations()
 
         if env.PRODUCTION:
             logger.info("Running in PRODUCTION mode")
@@ -59,9 +94,6 @@ class FastAPIWithStart(FastAPI):
 
 app: FastAPIWithStart = FastAPIWithStart()
 
-# Initialize the repository authorization middleware for programming modules (also initializing it for other modules does not hurt)
-init_repo_auth_middleware(app)
-
 
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
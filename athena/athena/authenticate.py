@@ -30,6 +30,7 @@ def authenticated(func: Callable) -> Callable:
         def endpoint():
             ...
         """
+    is_coroutine_function = inspect.iscoroutinefunction(func)
 
     @wraps(func)
     async def wrapper(*args, secret: str = Depends(api_key_auth_header),
@@ -37,7 +38,7 @@ def authenticated(func: Callable) -> Callable:
                       **kwargs):
         verify_inter_module_secret_key(secret)  # this happens after the ASM Module reissued the request
         set_lms_url_context_var(lms_url)
-        if inspect.iscoroutinefunction(func):
+        if is_coroutine_function:
             return await func(*args, **kwargs)
         return func(*args, **kwargs)
 
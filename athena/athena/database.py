@@ -1,11 +1,17 @@
+import contextvars
 import importlib
 import os
+import time
 from contextlib import contextmanager
+from typing import Any, Callable, Optional, TypeVar
 
-from sqlalchemy import create_engine
-from sqlalchemy.orm import declarative_base, sessionmaker
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, declarative_base, sessionmaker
+from starlette.concurrency import run_in_threadpool
 
 from athena import env
+from athena.timing import add_span_time
+from athena.tracing import SPAN_KIND_CLIENT, record_span
 
 
 # SQLite specific configuration
@@ -22,9 +28,47 @@ engine = create_engine(
     env.DATABASE_URL, connect_args=connect_args
 )
 
+if is_sqlite:
+    @event.listens_for(engine, "connect")
+    def _enable_sqlite_wal(dbapi_connection, _connection_record):
+        # Readers do not block writers in WAL mode, e.g. while streaming submissions (see `athena.storage.stream_schemas`)
+        cursor = dbapi_connection.cursor()
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.close()
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Optional async engine (asyncpg/aiosqlite), see `run_in_db_async`
+if env.ASYNC_DATABASE_URL is not None:
+    from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+    async_engine = create_async_engine(env.ASYNC_DATABASE_URL)
+    AsyncSessionLocal = async_sessionmaker(async_engine, autocommit=False, autoflush=False)
+else:
+    async_engine = None
+    AsyncSessionLocal = None
+
+
+def _start_query_timing(conn, _cursor, _statement, _parameters, _context, _executemany):
+    conn.info["query_start"] = (time.perf_counter(), time.time_ns())
+
+
+def _end_query_timing(conn, _cursor, statement, _parameters, _context, _executemany):
+    start = conn.info.pop("query_start", None)
+    if start is not None:
+        add_span_time("db", time.perf_counter() - start[0])
+        record_span("db", start[1], time.time_ns(), SPAN_KIND_CLIENT,
+                    {"db.system": conn.dialect.name, "db.statement": statement[:1000]})
+
+
+# Time all queries as the "db" span of the current request (see `athena.timing`) and trace them (see `athena.tracing`)
+for _engine in [engine] + ([async_engine.sync_engine] if async_engine is not None else []):
+    event.listen(_engine, "before_cursor_execute", _start_query_timing)
+    event.listen(_engine, "after_cursor_execute", _end_query_timing)
+
+# The session of the async engine while running inside `run_in_db_async`, used by `get_db`
+bound_session_context: contextvars.ContextVar[Optional[Session]] = contextvars.ContextVar("bound_session", default=None)
+
 def create_tables(exercise_type: str):
     """
     Create all tables for models in athena.models, whose name starts with "DB"+exercise_type.name.title().
@@ -41,8 +85,39 @@ def create_tables(exercise_type: str):
 
 @contextmanager
 def get_db():
+    bound_session = bound_session_context.get()
+    if bound_session is not None:
+        # Running inside `run_in_db_async`, which also closes the session
+        yield bound_session
+        return
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+T = TypeVar("T")
+
+
+async def run_in_db_async(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """
+    Run a synchronous function that uses `get_db` (e.g. a storage function) without blocking the event loop.
+
+    If ASYNC_DATABASE_URL is set, the function runs on the async engine: `get_db` then returns the session of the
+    async engine and all database round trips are awaited instead of blocking.
+    Otherwise, the function runs in the threadpool with the synchronous engine.
+    Context variables (e.g. the LMS URL) are available to the function in both cases.
+    """
+    if AsyncSessionLocal is None:
+        return await run_in_threadpool(func, *args, **kwargs)
+
+    def run_with_bound_session(sync_session: Session) -> T:
+        token = bound_session_context.set(sync_session)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            bound_session_context.reset(token)
+
+    async with AsyncSessionLocal() as session:
+        return await session.run_sync(run_with_bound_session)
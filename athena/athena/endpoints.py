@@ -1,18 +1,34 @@
 # type: ignore # too much weird behavior of mypy with decorators
+import asyncio
+import functools
 import inspect
-from fastapi import Depends, BackgroundTasks, Body
+import json
+from dataclasses import dataclass
+from fastapi import Depends, Body, Request
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, ValidationError
-from typing import TypeVar, Callable, List, Union, Any, Coroutine, Type
+from typing import TypeVar, Callable, List, Union, Any, Coroutine, Type, Optional, AsyncIterator, Mapping
 
+from athena import env
 from athena.app import app
 from athena.authenticate import authenticated
-from athena.metadata import with_meta
+from athena.database import run_in_db_async
+from athena.experiment import get_experiment_environment
+from athena.jobs import enqueue_job, register_job_handler, register_periodic_task
+from athena.metadata import with_meta, emit_meta
 from athena.module_config import get_dynamic_module_config_factory
+from athena.process_pool import register_process_function, run_in_process
 from athena.logger import logger
 from athena.schemas import Exercise, Submission, Feedback
 from athena.schemas.schema import to_camel
-from athena.storage import get_stored_submission_meta, get_stored_exercise_meta, get_stored_feedback_meta, \
-    store_exercise, store_feedback, store_feedback_suggestions, store_submissions, get_stored_submissions
+from athena.streaming import get_streaming_media_type, stream_with_meta
+from athena.timing import timed
+from athena.storage import get_stored_exercises, get_stored_submissions, get_stored_feedback, \
+    get_stored_submission_meta_async, get_stored_exercise_meta_async, \
+    get_stored_submission_metas_async, get_stored_feedback_metas_async, store_exercise_async, store_feedbacks_async, \
+    store_feedback_suggestions_async, store_submissions_async, get_stored_submissions_async
+from athena.storage.feedback_cache_storage import get_feedback_cache_key, get_cached_feedback_suggestions, \
+    store_cached_feedback_suggestions, evict_cached_feedback_suggestions
 
 E = TypeVar('E', bound=Exercise)
 S = TypeVar('S', bound=Submission)
@@ -22,6 +38,10 @@ G = TypeVar('G', bound=bool)
 # Config type
 C = TypeVar("C", bound=BaseModel)
 
+# Called with the exercise, the received submissions and the request after /submissions stored them,
+# e.g. to precompute feedback suggestions (see feedback_provider)
+_submissions_received_hooks: List[Callable[[Exercise, List[Submission], Request], Coroutine[Any, Any, None]]] = []
+
 module_responses = {
     403: {
         "description": "API secret is invalid - set the environment variable SECRET and the Authorization header "
@@ -30,18 +50,105 @@ module_responses = {
 }
 
 
-def submissions_consumer(func: Union[
+def _job_payload(module_config: Optional[BaseModel], payload: dict) -> dict:
+    """Add the module config to a job payload, which is stored as JSON."""
+    if module_config is not None:
+        payload["module_config"] = json.loads(module_config.json())
+    return payload
+
+
+def _parse_job_module_config(module_config_type: Optional[Type[C]], payload: dict) -> Optional[C]:
+    """Get the module config from a job payload, the default config if it was not given."""
+    if module_config_type is None:
+        return None
+    return module_config_type.parse_obj(payload.get("module_config", {}))
+
+
+@dataclass(frozen=True)
+class _CallPlan:
+    """How to call a decorated module function, determined once at decoration time instead of on every request."""
+    call: Callable[..., Any]
+    parameters: Mapping[str, inspect.Parameter]
+    is_async_generator: bool
+    takes_module_config: bool
+    takes_is_graded: bool
+
+    def annotation(self, name: str) -> Any:
+        """Get the type annotation of the given parameter, or None if the function does not take it."""
+        parameter = self.parameters.get(name)
+        return parameter.annotation if parameter is not None else None
+
+    def get_kwargs(self, module_config: Optional[BaseModel] = None, is_graded: Optional[bool] = None) -> dict:
+        """Get the optional keyword arguments that the function takes."""
+        kwargs: dict = {}
+        if self.takes_module_config:
+            kwargs["module_config"] = module_config
+        if self.takes_is_graded:
+            kwargs["is_graded"] = is_graded
+        return kwargs
+
+
+def _get_call_plan(func: Callable, executor: str) -> _CallPlan:
+    """Inspect the decorated function once and get the plan to call it with the given executor."""
+    parameters = inspect.signature(func).parameters
+    return _CallPlan(
+        call=_get_call(func, executor),
+        parameters=parameters,
+        is_async_generator=inspect.isasyncgenfunction(func),
+        takes_module_config="module_config" in parameters,
+        takes_is_graded="is_graded" in parameters,
+    )
+
+
+def _get_call(func: Callable, executor: str) -> Callable[..., Coroutine]:
+    """
+    Get an async function that calls the decorated function with the given executor.
+    Async functions (and async generator functions) are called directly. Synchronous functions run in the threadpool
+    ("thread", the default) or in the process pool for CPU-bound work ("process", see `athena.process_pool`),
+    so they do not block the event loop.
+    Calls are timed as the "module.<function name>" span (see `athena.timing`), except for async generator functions.
+    """
+    if executor not in ("thread", "process"):
+        raise ValueError(f"Unknown executor {executor}, expected 'thread' or 'process'")
+    span_name = f"module.{func.__name__}"
+    if inspect.iscoroutinefunction(func) or inspect.isasyncgenfunction(func):
+        if executor == "process":
+            raise TypeError(f"{func.__name__}: executor='process' is only supported for synchronous functions")
+        if inspect.isasyncgenfunction(func):
+            # The chunks are consumed outside of the function, so its time cannot be measured as one span
+            return func
+        return timed(span_name)(func)
+
+    if executor == "process":
+        register_process_function(func)
+
+        @timed(span_name)
+        async def call_in_process(*args, **kwargs):
+            return await run_in_process(func, *args, **kwargs)
+        return call_in_process
+
+    @timed(span_name)
+    async def call_in_threadpool(*args, **kwargs):
+        return await run_in_threadpool(func, *args, **kwargs)
+    return call_in_threadpool
+
+
+def submissions_consumer(func: Optional[Union[
     Callable[[E, List[S]], None],
     Callable[[E, List[S]], Coroutine[Any, Any, None]],
     Callable[[E, List[S], C], None],
     Callable[[E, List[S], C], Coroutine[Any, Any, None]]
-]):
+]] = None, *, executor: str = "thread"):
     """
     Receive submissions from the Assessment Module Manager.
     The submissions consumer is usually called whenever the deadline for an exercise is reached.
+    It runs as a job in the durable background job queue (see `athena.jobs`), the request returns immediately.
     
     This decorator can be used with several types of functions: synchronous or asynchronous, with or without a module config.
 
+    Synchronous functions run in the threadpool. Use `executor="process"` for CPU-bound synchronous functions to run
+    them in the process pool instead (see `athena.process_pool`).
+
     Examples:
         Below are some examples of possible functions that you can decorate with this decorator:
 
@@ -63,58 +170,68 @@ def submissions_consumer(func: Union[
         ... async def async_receive_submissions_with_config(exercise: Exercise, submissions: List[Submission], module_config: Optional[dict]):
         ...     # process submissions asynchronously here using module_config
     """
-    exercise_type = inspect.signature(func).parameters["exercise"].annotation
-    submission_type = inspect.signature(func).parameters["submissions"].annotation.__args__[0]
-    module_config_type = inspect.signature(func).parameters["module_config"].annotation if "module_config" in inspect.signature(func).parameters else None
+    if func is None:
+        return functools.partial(submissions_consumer, executor=executor)
+    plan = _get_call_plan(func, executor)
+
+    exercise_type = plan.parameters["exercise"].annotation
+    submission_type = plan.parameters["submissions"].annotation.__args__[0]
+    module_config_type = plan.annotation("module_config")
+
+    def parse_job_payload(payload: dict):
+        """Load the stored exercise and submissions for a queued job."""
+        exercise = next(iter(get_stored_exercises(exercise_type, only_ids=[payload["exercise_id"]])))
+        stored_submissions = {s.id: s for s in get_stored_submissions(submission_type, exercise.id, payload["submission_ids"])}
+        submissions = [stored_submissions[i] for i in payload["submission_ids"] if i in stored_submissions]
+        kwargs = plan.get_kwargs(module_config=_parse_job_module_config(module_config_type, payload))
+        return (exercise, submissions), kwargs
+
+    register_job_handler("submissions", plan.call, parse_job_payload)
 
     @app.post("/submissions", responses=module_responses)
     @authenticated
     @with_meta
     async def wrapper(
-            background_tasks: BackgroundTasks,
+            request: Request,
             exercise: exercise_type,
             submissions: List[submission_type],
             module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
 
         # Retrieve existing metadata for the exercise and submissions
-        exercise_meta = get_stored_exercise_meta(exercise) or {}
+        exercise_meta = await get_stored_exercise_meta_async(exercise) or {}
         exercise_meta.update(exercise.meta)
         exercise.meta = exercise_meta
         submissions_dict = {s.id: s for s in submissions}
         if submissions:
-            stored_submissions = get_stored_submissions(
-                submissions[0].__class__, exercise.id, [s.id for s in submissions])
-            for stored_submission in stored_submissions:
-                if stored_submission.id in submissions_dict:
-                    submission_meta = get_stored_submission_meta(stored_submission) or {}
-                    submission_meta.update(stored_submission.meta)
-                    submissions_dict[stored_submission.id].meta = submission_meta
-
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
+            # Load the metadata of all already stored submissions at once
+            stored_submission_metas = await get_stored_submission_metas_async(submission_type, list(submissions_dict.keys()))
+            for submission_id, submission_meta in stored_submission_metas.items():
+                submissions_dict[submission_id].meta = submission_meta
 
-        store_exercise(exercise)
+        await store_exercise_async(exercise)
         submissions = list(submissions_dict.values())
-        store_submissions(submissions)
+        await store_submissions_async(submissions)
 
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
+        # Call the actual consumer asynchronously in the job queue
+        job_id = await enqueue_job("submissions", exercise.id, _job_payload(module_config, {
+            "exercise_id": exercise.id,
+            "submission_ids": [s.id for s in submissions],
+        }))
+        emit_meta("job_id", job_id)
 
-        # Call the actual consumer asynchronously
-        background_tasks.add_task(func, exercise, submissions, **kwargs)
+        for hook in _submissions_received_hooks:
+            await hook(exercise, submissions, request)
 
         return None
     return wrapper
 
 
-def submission_selector(func: Union[
+def submission_selector(func: Optional[Union[
     Callable[[E, List[S]], S],
     Callable[[E, List[S]], Coroutine[Any, Any, S]],
     Callable[[E, List[S], C], S],
     Callable[[E, List[S], C], Coroutine[Any, Any, S]]
-]):
+]] = None, *, executor: str = "thread"):
     """
     Receive an exercise and some (not necessarily all!) submissions from the Assessment Module Manager and
     return the submission that should ideally be assessed next.
@@ -122,6 +239,9 @@ def submission_selector(func: Union[
 
     This decorator can be used with several types of functions: synchronous or asynchronous, with or without a module config.
 
+    Synchronous functions run in the threadpool. Use `executor="process"` for CPU-bound synchronous functions to run
+    them in the process pool instead (see `athena.process_pool`).
+
     Examples:
         Below are some examples of possible functions that you can decorate with this decorator:
 
@@ -143,9 +263,13 @@ def submission_selector(func: Union[
         ... async def async_select_submission_with_config(exercise: Exercise, submissions: List[Submission], module_config: Optional[dict]):
         ...     # process submissions here using module_config and return the chosen submission
     """
-    exercise_type = inspect.signature(func).parameters["exercise"].annotation
-    submission_type = inspect.signature(func).parameters["submissions"].annotation.__args__[0]
-    module_config_type = inspect.signature(func).parameters["module_config"].annotation if "module_config" in inspect.signature(func).parameters else None
+    if func is None:
+        return functools.partial(submission_selector, executor=executor)
+    plan = _get_call_plan(func, executor)
+
+    exercise_type = plan.parameters["exercise"].annotation
+    submission_type = plan.parameters["submissions"].annotation.__args__[0]
+    module_config_type = plan.annotation("module_config")
 
     # own request model to allow for `submissionIds` instead of `submission_ids` (camelCase vs snake_case)
     class SubmissionSelectorRequest(BaseModel):
@@ -168,11 +292,11 @@ def submission_selector(func: Union[
         submission_ids = request.submission_ids
         module_config = request.module_config
 
-        exercise.meta.update(get_stored_exercise_meta(exercise) or {})
-        store_exercise(exercise)
+        exercise.meta.update(await get_stored_exercise_meta_async(exercise) or {})
+        await store_exercise_async(exercise)
 
         # Get the full submission objects
-        submissions = list(get_stored_submissions(submission_type, exercise.id, submission_ids))
+        submissions = await get_stored_submissions_async(submission_type, exercise.id, submission_ids)
         if len(submission_ids) != len(submissions):
             logger.warning("Not all submissions were found in the database! "
                            "Have you sent all submissions to the submission consumer before?")
@@ -180,15 +304,10 @@ def submission_selector(func: Union[
             # Nothing to select from
             return -1
 
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
+        kwargs = plan.get_kwargs(module_config=module_config)
 
         # Select the submission
-        if inspect.iscoroutinefunction(func):
-            submission = await func(exercise, submissions, **kwargs)
-        else:
-            submission = func(exercise, submissions, **kwargs)
+        submission = await plan.call(exercise, submissions, **kwargs)
 
         if submission is None:
             return -1
@@ -197,18 +316,22 @@ def submission_selector(func: Union[
     return wrapper
 
 
-def feedback_consumer(func: Union[
+def feedback_consumer(func: Optional[Union[
     Callable[[E, S, List[F]], None],
     Callable[[E, S, List[F]], Coroutine[Any, Any, None]],
     Callable[[E, S, List[F], C], None],
     Callable[[E, S, List[F], C], Coroutine[Any, Any, None]]
-]):
+]] = None, *, executor: str = "thread"):
     """
     Receive feedback from the Assessment Module Manager.
     The feedback consumer is usually called whenever the LMS gets feedback from a tutor.
+    It runs as a job in the durable background job queue (see `athena.jobs`), the request returns immediately.
 
     This decorator can be used with several types of functions: synchronous or asynchronous, with or without a module config.
 
+    Synchronous functions run in the threadpool. Use `executor="process"` for CPU-bound synchronous functions to run
+    them in the process pool instead (see `athena.process_pool`).
+
     Examples:
         Below are some examples of possible functions that you can decorate with this decorator:
 
@@ -229,56 +352,110 @@ def feedback_consumer(func: Union[
         >>> @feedback_consumer
         ... async def async_process_feedback_with_config(exercise: Exercise, submission: Submission, feedbacks: List[Feedback], module_config: Optional[dict]):
         ...     # process feedback here using module_config
+
+        Running a CPU-bound synchronous function in the process pool:
+        >>> @feedback_consumer(executor="process")
+        ... def sync_process_feedback_in_process_pool(exercise: Exercise, submission: Submission, feedbacks: List[Feedback]):
+        ...     # process feedback here, e.g. with expensive similarity computations
     """
-    exercise_type = inspect.signature(func).parameters["exercise"].annotation
-    submission_type = inspect.signature(func).parameters["submission"].annotation
-    feedback_type = inspect.signature(func).parameters["feedbacks"].annotation.__args__[0]
-    module_config_type = inspect.signature(func).parameters["module_config"].annotation if "module_config" in inspect.signature(func).parameters else None
+    if func is None:
+        return functools.partial(feedback_consumer, executor=executor)
+    plan = _get_call_plan(func, executor)
+
+    exercise_type = plan.parameters["exercise"].annotation
+    submission_type = plan.parameters["submission"].annotation
+    feedback_type = plan.parameters["feedbacks"].annotation.__args__[0]
+    module_config_type = plan.annotation("module_config")
+
+    def parse_job_payload(payload: dict):
+        """Load the stored exercise, submission and feedbacks for a queued job."""
+        exercise = next(iter(get_stored_exercises(exercise_type, only_ids=[payload["exercise_id"]])))
+        submission = next(iter(get_stored_submissions(submission_type, exercise.id, [payload["submission_id"]])))
+        stored_feedbacks = {f.id: f for f in get_stored_feedback(feedback_type, exercise.id, submission.id)}
+        feedbacks = [stored_feedbacks[i] for i in payload["feedback_ids"] if i in stored_feedbacks]
+        kwargs = plan.get_kwargs(module_config=_parse_job_module_config(module_config_type, payload))
+        return (exercise, submission, feedbacks), kwargs
+
+    register_job_handler("feedbacks", plan.call, parse_job_payload)
 
     @app.post("/feedbacks", responses=module_responses)
     @authenticated
     @with_meta
     async def wrapper(
-            background_tasks: BackgroundTasks,
             exercise: exercise_type,
             submission: submission_type,
             feedbacks: List[feedback_type],
             module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
 
         # Retrieve existing metadata for the exercise, submission and feedback
-        exercise.meta.update(get_stored_exercise_meta(exercise) or {})
-        store_exercise(exercise)
-        submission.meta.update(get_stored_submission_meta(submission) or {})
-        store_submissions([submission])
+        exercise.meta.update(await get_stored_exercise_meta_async(exercise) or {})
+        await store_exercise_async(exercise)
+        submission.meta.update(await get_stored_submission_meta_async(submission) or {})
+        await store_submissions_async([submission])
+        stored_feedback_metas = await get_stored_feedback_metas_async(feedback_type, [f.id for f in feedbacks if f.id is not None])
         for feedback in feedbacks:
-            feedback.meta.update(get_stored_feedback_meta(feedback) or {})
-            # Change the ID of the LMS to an internal ID
-            feedback.id = store_feedback(feedback, is_lms_id=True).id
-
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
-
-        # Call the actual consumer asynchronously
-        background_tasks.add_task(func, exercise, submission, feedbacks, **kwargs)
+            feedback.meta.update(stored_feedback_metas.get(feedback.id, {}))
+        # Change the IDs of the LMS to internal IDs
+        stored_feedbacks = await store_feedbacks_async(feedbacks, is_lms_id=True)
+        for feedback, stored_feedback in zip(feedbacks, stored_feedbacks):
+            feedback.id = stored_feedback.id
+
+        # Call the actual consumer asynchronously in the job queue
+        job_id = await enqueue_job("feedbacks", exercise.id, _job_payload(module_config, {
+            "exercise_id": exercise.id,
+            "submission_id": submission.id,
+            "feedback_ids": [f.id for f in feedbacks],
+        }))
+        emit_meta("job_id", job_id)
 
         return None
     return wrapper
 
 
-def feedback_provider(func: Union[
+def _is_experiment_request() -> bool:
+    """Whether the current request belongs to an experiment run, see `athena.experiment`."""
+    experiment = get_experiment_environment()
+    return experiment.experiment_id is not None or experiment.run_id is not None
+
+
+def feedback_provider(func: Optional[Union[
     Callable[[E, S], List[F]],
     Callable[[E, S], Coroutine[Any, Any, List[F]]],
     Callable[[E, S, C], List[F]],
     Callable[[E, S, C], Coroutine[Any, Any, List[F]]],
     Callable[[E, S, G, C], List[F]],
-]):
+    Callable[[E, S], AsyncIterator[Union[F, List[F]]]],
+    Callable[[E, S, C], AsyncIterator[Union[F, List[F]]]],
+    Callable[[E, S, G, C], AsyncIterator[Union[F, List[F]]]],
+]] = None, *, executor: str = "thread", cache: bool = False, precompute: bool = False):
     """
     Provide feedback to the Assessment Module Manager.
     The feedback provider is usually called whenever the tutor requests feedback for a submission in the LMS.
 
+    Besides `/feedback_suggestions` for a single submission, this also provides `/feedback_suggestions/batch`, which
+    takes one exercise and many submissions and returns the feedback suggestions (or an error) per submission.
+    The provider is called for at most `FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY` submissions at the same time.
+
+    The provider can also be an async generator that yields feedback (or lists of feedback) as soon as it is available.
+    If the client accepts `application/x-ndjson` or `text/event-stream`, `/feedback_suggestions` then streams each
+    yielded chunk right away (see `athena.streaming`). Otherwise, the response contains all feedback at the end.
+
+    With `cache=True`, the returned feedback suggestions are cached (see `athena.storage.feedback_cache_storage`).
+    Requests with the same exercise, submission, `is_graded` and module config then return the cached suggestions
+    without calling the provider again, e.g. when the tutor reloads the page. This is useful for expensive providers.
+    Requests of experiments (with an X-Experiment-ID or X-Run-ID header, e.g. from the playground) bypass the cache,
+    so that repeated runs really call the provider again, e.g. to measure the variance of LLM results.
+
+    With `precompute=True` (implies `cache=True`), the feedback suggestions for all submissions received by the
+    submissions consumer (`/submissions`) are generated in the job queue right away and stored in the cache.
+    `/feedback_suggestions` then returns them without waiting, or calls the provider if nothing is precomputed yet.
+    The suggestions are precomputed for graded feedback requests with the module config of the `/submissions` request.
+
     This decorator can be used with several types of functions: synchronous or asynchronous, with or without a module config.
 
+    Synchronous functions run in the threadpool. Use `executor="process"` for CPU-bound synchronous functions to run
+    them in the process pool instead (see `athena.process_pool`).
+
     Examples:
         Below are some examples of possible functions that you can decorate with this decorator:
 
@@ -299,44 +476,233 @@ def feedback_provider(func: Union[
         >>> @feedback_provider
         ... async def async_suggest_feedback_with_config(exercise: Exercise, submission: Submission, module_config: Optional[dict]):
         ...     # suggest feedback here using module_config and return it as a list
+
+        Streaming feedback as soon as it is available:
+        >>> @feedback_provider
+        ... async def async_stream_feedback(exercise: Exercise, submission: Submission):
+        ...     # suggest feedback here and yield it, e.g. one list of feedback per file
+
+        Caching the feedback suggestions of an expensive provider:
+        >>> @feedback_provider(cache=True)
+        ... async def async_suggest_feedback_with_cache(exercise: Exercise, submission: Submission):
+        ...     # suggest feedback here and return it as a list
+
+        Precomputing the feedback suggestions when the submissions are received:
+        >>> @feedback_provider(precompute=True)
+        ... async def async_suggest_feedback_with_precomputation(exercise: Exercise, submission: Submission):
+        ...     # suggest feedback here and return it as a list
     """
-    exercise_type = inspect.signature(func).parameters["exercise"].annotation
-    submission_type = inspect.signature(func).parameters["submission"].annotation
-    module_config_type = inspect.signature(func).parameters["module_config"].annotation if "module_config" in inspect.signature(func).parameters else None
-    is_graded_type = inspect.signature(func).parameters["is_graded"].annotation if "is_graded" in inspect.signature(func).parameters else None
+    if func is None:
+        return functools.partial(feedback_provider, executor=executor, cache=cache, precompute=precompute)
+    plan = _get_call_plan(func, executor)
+    cache = cache or precompute
+    if cache:
+        register_periodic_task(evict_cached_feedback_suggestions, env.FEEDBACK_CACHE_EVICTION_INTERVAL_SECONDS)
+
+    async def get_feedback_chunks(exercise, submission, **kwargs):
+        """Get the feedback of the provider in chunks, as soon as each chunk is available."""
+        if plan.is_async_generator:
+            async for chunk in plan.call(exercise, submission, **kwargs):
+                yield chunk if isinstance(chunk, list) else [chunk]
+        else:
+            yield await plan.call(exercise, submission, **kwargs)
+
+    async def get_feedbacks(exercise, submission, **kwargs):
+        """Get all feedback of the provider at once."""
+        return [feedback async for chunk in get_feedback_chunks(exercise, submission, **kwargs) for feedback in chunk]
+
+    def get_cache_keys(exercise, submissions, kwargs):
+        """
+        Get the feedback cache key of each submission, keyed by submission id
+        (empty if the cache is disabled or bypassed for an experiment).
+        """
+        if not cache or _is_experiment_request():
+            return {}
+        return {
+            submission.id: get_feedback_cache_key(
+                exercise, submission, kwargs.get("is_graded"), kwargs.get("module_config"))
+            for submission in submissions
+        }
+
+    exercise_type = plan.parameters["exercise"].annotation
+    submission_type = plan.parameters["submission"].annotation
+    module_config_type = plan.annotation("module_config")
+    is_graded_type = plan.annotation("is_graded")
+
+    if precompute:
+        async def precompute_feedback_suggestions(exercise, submissions, cache_keys, **kwargs):
+            """Generate and cache the feedback suggestions of all given submissions that are not cached yet."""
+            cached_feedbacks_by_key = await run_in_db_async(get_cached_feedback_suggestions, list(cache_keys.values()))
+            semaphore = asyncio.Semaphore(env.FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY)
+
+            async def precompute_for_submission(submission):
+                async with semaphore:
+                    feedbacks = await get_feedbacks(exercise, submission, **kwargs)
+                    feedbacks = await store_feedback_suggestions_async(feedbacks)
+                    await run_in_db_async(
+                        store_cached_feedback_suggestions, exercise.id, {cache_keys[submission.id]: feedbacks})
+
+            results = await asyncio.gather(*(
+                precompute_for_submission(submission) for submission in submissions
+                if cache_keys[submission.id] not in cached_feedbacks_by_key
+            ), return_exceptions=True)
+            errors = [result for result in results if isinstance(result, Exception)]
+            if errors:
+                # Fail the job, so that the retry precomputes the remaining submissions (the others are cached now)
+                raise RuntimeError(f"Precomputing feedback suggestions failed for {len(errors)} submissions") from errors[0]
+
+        def parse_job_payload(payload: dict):
+            """Load the stored exercise and submissions for a queued precomputation job."""
+            exercise = next(iter(get_stored_exercises(exercise_type, only_ids=[payload["exercise_id"]])))
+            submission_ids = [int(submission_id) for submission_id in payload["cache_keys"]]
+            stored_submissions = {s.id: s for s in get_stored_submissions(submission_type, exercise.id, submission_ids)}
+            submissions = [stored_submissions[i] for i in submission_ids if i in stored_submissions]
+            kwargs = plan.get_kwargs(module_config=_parse_job_module_config(module_config_type, payload), is_graded=True)
+            cache_keys = {int(submission_id): cache_key for submission_id, cache_key in payload["cache_keys"].items()}
+            return (exercise, submissions, cache_keys), kwargs
+
+        register_job_handler("feedback_suggestions", precompute_feedback_suggestions, parse_job_payload)
+
+        get_precomputation_module_config = get_dynamic_module_config_factory(module_config_type)
+
+        async def enqueue_precomputation(exercise, submissions, request: Request):
+            if _is_experiment_request():
+                # Experiments bypass the cache, so the precomputed suggestions would never be used
+                return
+            # The cache keys are based on the exercise and submissions as sent by the LMS,
+            # like in the later /feedback_suggestions requests
+            module_config = await get_precomputation_module_config(request.headers.get("X-Module-Config"))
+            kwargs = plan.get_kwargs(module_config=module_config, is_graded=True)
+            cache_keys = get_cache_keys(exercise, submissions, kwargs)
+            job_id = await enqueue_job("feedback_suggestions", exercise.id, _job_payload(kwargs.get("module_config"), {
+                "exercise_id": exercise.id,
+                "cache_keys": {str(submission_id): cache_key for submission_id, cache_key in cache_keys.items()},
+            }))
+            emit_meta("feedback_suggestions_job_id", job_id)
+
+        _submissions_received_hooks.append(enqueue_precomputation)
 
     @app.post("/feedback_suggestions", responses=module_responses)
     @authenticated
     @with_meta
     async def wrapper(
+            request: Request,
             exercise: exercise_type,
             submission: submission_type,
             isGraded: is_graded_type = Body(True, alias="isGraded"),
             module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
 
         # Retrieve existing metadata for the exercise, submission and feedback
-        exercise.meta.update(get_stored_exercise_meta(exercise) or {})
-        submission.meta.update(get_stored_submission_meta(submission) or {})
-
-        store_exercise(exercise)
-        store_submissions([submission])
-
-        kwargs = {}
-        if "module_config" in inspect.signature(func).parameters:
-            kwargs["module_config"] = module_config
-
-        if "is_graded" in inspect.signature(func).parameters:
-            kwargs["is_graded"] = isGraded
+        exercise.meta.update(await get_stored_exercise_meta_async(exercise) or {})
+        submission.meta.update(await get_stored_submission_meta_async(submission) or {})
+
+        await store_exercise_async(exercise)
+        await store_submissions_async([submission])
+
+        kwargs = plan.get_kwargs(module_config=module_config, is_graded=isGraded)
+
+        streaming_media_type = get_streaming_media_type(request)
+
+        # Return cached feedback suggestions without calling the provider
+        cache_key = get_cache_keys(exercise, [submission], kwargs).get(submission.id)
+        if cache_key is not None:
+            cached_feedbacks = (await run_in_db_async(get_cached_feedback_suggestions, [cache_key])).get(cache_key)
+            if cached_feedbacks is not None:
+                emit_meta("feedback_cache_hit", True)
+                if streaming_media_type is not None:
+                    async def cached_feedback_chunks():
+                        yield cached_feedbacks
+                    return stream_with_meta(cached_feedback_chunks(), streaming_media_type)
+                return cached_feedbacks
+
+        if streaming_media_type is not None:
+            async def stored_feedback_chunks():
+                # Store each chunk of feedback suggestions to assign internal IDs before sending it
+                stored_feedbacks = []
+                async for chunk in get_feedback_chunks(exercise, submission, **kwargs):
+                    chunk = await store_feedback_suggestions_async(chunk)
+                    stored_feedbacks.extend(chunk)
+                    yield chunk
+                if cache_key is not None:
+                    await run_in_db_async(store_cached_feedback_suggestions, exercise.id, {cache_key: stored_feedbacks})
+            return stream_with_meta(stored_feedback_chunks(), streaming_media_type)
 
         # Call the actual provider
-        if inspect.iscoroutinefunction(func):
-            feedbacks = await func(exercise, submission, **kwargs)
-        else:
-            feedbacks = func(exercise, submission, **kwargs)
+        feedbacks = await get_feedbacks(exercise, submission, **kwargs)
 
         # Store feedback suggestions and assign internal IDs
-        feedbacks = store_feedback_suggestions(feedbacks)
+        feedbacks = await store_feedback_suggestions_async(feedbacks)
+        if cache_key is not None:
+            await run_in_db_async(store_cached_feedback_suggestions, exercise.id, {cache_key: feedbacks})
         return feedbacks
+
+    @app.post("/feedback_suggestions/batch", responses=module_responses)
+    @authenticated
+    @with_meta
+    async def batch_wrapper(
+            exercise: exercise_type,
+            submissions: List[submission_type],
+            isGraded: is_graded_type = Body(True, alias="isGraded"),
+            module_config: module_config_type = Depends(get_dynamic_module_config_factory(module_config_type))):
+
+        # Retrieve existing metadata for the exercise and all submissions
+        exercise.meta.update(await get_stored_exercise_meta_async(exercise) or {})
+        stored_submission_metas = await get_stored_submission_metas_async(
+            submission_type, [submission.id for submission in submissions])
+        for submission in submissions:
+            submission.meta.update(stored_submission_metas.get(submission.id, {}))
+
+        await store_exercise_async(exercise)
+        await store_submissions_async(submissions)
+
+        kwargs = plan.get_kwargs(module_config=module_config, is_graded=isGraded)
+
+        # Get cached feedback suggestions, the provider is only called for the other submissions
+        cache_keys = get_cache_keys(exercise, submissions, kwargs)
+        cached_feedbacks_by_key = await run_in_db_async(get_cached_feedback_suggestions, list(cache_keys.values()))
+        if cached_feedbacks_by_key:
+            emit_meta("feedback_cache_hits", len(cached_feedbacks_by_key))
+        results = {
+            submission_id: (cached_feedbacks_by_key[cache_key], None)
+            for submission_id, cache_key in cache_keys.items() if cache_key in cached_feedbacks_by_key
+        }
+        uncached_submissions = [submission for submission in submissions if submission.id not in results]
+
+        semaphore = asyncio.Semaphore(env.FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY)
+
+        async def suggest_feedback(submission):
+            async with semaphore:
+                try:
+                    return await get_feedbacks(exercise, submission, **kwargs), None
+                except Exception as exc:  # pylint: disable=broad-except
+                    # One failing submission should not fail the whole batch
+                    logger.exception("Feedback provider failed for submission %d", submission.id)
+                    return None, str(exc)
+
+        # Call the actual provider for all submissions, with at most FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY at a time
+        provider_results = await asyncio.gather(*(suggest_feedback(submission) for submission in uncached_submissions))
+
+        # Store all feedback suggestions at once and assign internal IDs
+        stored_feedbacks = iter(await store_feedback_suggestions_async(
+            [feedback for feedbacks, _ in provider_results if feedbacks for feedback in feedbacks]))
+        for submission, (feedbacks, error) in zip(uncached_submissions, provider_results):
+            results[submission.id] = ([next(stored_feedbacks) for _ in feedbacks] if error is None else None, error)
+
+        if cache_keys:
+            await run_in_db_async(store_cached_feedback_suggestions, exercise.id, {
+                cache_keys[submission.id]: results[submission.id][0]
+                for submission in uncached_submissions if results[submission.id][1] is None
+            })
+
+        return [
+            {
+                "submissionId": submission.id,
+                "feedbacks": results[submission.id][0],
+                "error": results[submission.id][1],
+            }
+            for submission in submissions
+        ]
+
     return wrapper
 
 
@@ -367,10 +733,10 @@ def config_schema_provider(cls: Type[C]) -> Type[C]:
     return cls
 
 
-def evaluation_provider(func: Union[
+def evaluation_provider(func: Optional[Union[
     Callable[[E, S, List[F], List[F]], Any],
     Callable[[E, S, List[F], List[F]], Coroutine[Any, Any, Any]]
-]):
+]] = None, *, executor: str = "thread"):
     """
     Provide evaluated feedback to the Assessment Module Manager.
     
@@ -379,6 +745,9 @@ def evaluation_provider(func: Union[
 
     This decorator can be used with several types of functions: synchronous or asynchronous.
 
+    Synchronous functions run in the threadpool. Use `executor="process"` for CPU-bound synchronous functions to run
+    them in the process pool instead (see `athena.process_pool`).
+
     Examples:
         Below are some examples of possible functions that you can decorate with this decorator:
 
@@ -397,9 +766,13 @@ def evaluation_provider(func: Union[
         ... ) -> Any:
         ...     # evaluate predicted feedback here and return evaluation results
     """
-    exercise_type = inspect.signature(func).parameters["exercise"].annotation
-    submission_type = inspect.signature(func).parameters["submission"].annotation
-    feedback_type = inspect.signature(func).parameters["predicted_feedbacks"].annotation.__args__[0]
+    if func is None:
+        return functools.partial(evaluation_provider, executor=executor)
+    plan = _get_call_plan(func, executor)
+
+    exercise_type = plan.parameters["exercise"].annotation
+    submission_type = plan.parameters["submission"].annotation
+    feedback_type = plan.parameters["predicted_feedbacks"].annotation.__args__[0]
 
     @app.post("/evaluation", responses=module_responses)
     @authenticated
@@ -411,16 +784,15 @@ def evaluation_provider(func: Union[
             predicted_feedbacks: List[feedback_type],
     ):
         # Retrieve existing metadata for the exercise, submission and feedback
-        exercise.meta.update(get_stored_exercise_meta(exercise) or {})
-        submission.meta.update(get_stored_submission_meta(submission) or {})
-        for feedback in true_feedbacks + predicted_feedbacks:
-            feedback.meta.update(get_stored_feedback_meta(feedback) or {})
+        exercise.meta.update(await get_stored_exercise_meta_async(exercise) or {})
+        submission.meta.update(await get_stored_submission_meta_async(submission) or {})
+        all_feedbacks = true_feedbacks + predicted_feedbacks
+        stored_feedback_metas = await get_stored_feedback_metas_async(feedback_type, [f.id for f in all_feedbacks if f.id is not None])
+        for feedback in all_feedbacks:
+            feedback.meta.update(stored_feedback_metas.get(feedback.id, {}))
 
         # Call the actual provider
-        if inspect.iscoroutinefunction(func):
-            evaluation = await func(exercise, submission, true_feedbacks, predicted_feedbacks)
-        else:
-            evaluation = func(exercise, submission, true_feedbacks, predicted_feedbacks)
+        evaluation = await plan.call(exercise, submission, true_feedbacks, predicted_feedbacks)
 
         return evaluation
     return wrapper
@@ -3,7 +3,39 @@ import os
 
 PRODUCTION = os.environ.get("PRODUCTION", "0") == "1"
 DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///../data/data.sqlite")
+# optional URL with an async driver (e.g. postgresql+asyncpg://... or sqlite+aiosqlite:///...) for the same database,
+# used by the async storage functions. If not set, the async storage functions run in a threadpool instead.
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL")
 
 # a key is needed to authorize a module to
 # communicate with the assessment module manager
-ASSESSMENT_MODULE_MANAGER_TO_ATHENA_MODULE_SECRET = os.getenv("SECRET")
\ No newline at end of file
+ASSESSMENT_MODULE_MANAGER_TO_ATHENA_MODULE_SECRET = os.getenv("SECRET")
+
+# background jobs (e.g. from the submissions and feedback consumers), see athena/jobs.py
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+# running jobs are kept alive with a heartbeat, jobs without a heartbeat for JOB_STALE_SECONDS are started again
+JOB_HEARTBEAT_SECONDS = int(os.environ.get("JOB_HEARTBEAT_SECONDS", "10"))
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "60"))
+
+# maximum number of concurrent feedback provider calls in /feedback_suggestions/batch
+# and when precomputing feedback suggestions
+FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY = int(os.environ.get("FEEDBACK_SUGGESTIONS_BATCH_CONCURRENCY", "4"))
+
+# result cache of feedback providers with cache=True, see athena/storage/feedback_cache_storage.py
+FEEDBACK_CACHE_TTL_SECONDS = int(os.environ.get("FEEDBACK_CACHE_TTL_SECONDS", str(7 * 24 * 60 * 60)))
+FEEDBACK_CACHE_MAX_ENTRIES = int(os.environ.get("FEEDBACK_CACHE_MAX_ENTRIES", "10000"))
+FEEDBACK_CACHE_EVICTION_INTERVAL_SECONDS = int(os.environ.get("FEEDBACK_CACHE_EVICTION_INTERVAL_SECONDS", "600"))
+
+# deletion of the shared blobs of promoted meta fields that no feedback references anymore, see athena/models/meta_fields.py
+META_BLOB_CLEANUP_INTERVAL_SECONDS = int(os.environ.get("META_BLOB_CLEANUP_INTERVAL_SECONDS", "3600"))
+
+# worker processes for module functions with executor="process", see athena/process_pool.py
+PROCESS_POOL_WORKERS = int(os.environ.get("PROCESS_POOL_WORKERS", os.cpu_count() or 1))
+
+# distributed tracing, see athena/tracing.py: "otlp" (OTLP/HTTP JSON, e.g. to a local OpenTelemetry collector),
+# "file" (one JSON span per line) or empty to only pass on the trace context
+TRACE_EXPORTER = os.environ.get("TRACE_EXPORTER", "")
+TRACE_OTLP_ENDPOINT = os.environ.get("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT", "http://localhost:4318/v1/traces")
+TRACE_FILE = os.environ.get("TRACE_FILE", "../data/traces.jsonl")
+TRACE_SERVICE_NAME = os.environ.get("OTEL_SERVICE_NAME")
@@ -5,6 +5,8 @@ from typing import Optional, cast
 from zipfile import ZipFile
 
 from athena import contextvars
+from athena.metrics import repository_cache_requests_total
+from athena.timing import timed
 
 import httpx
 from git.repo import Repo
@@ -12,6 +14,7 @@ from git.repo import Repo
 cache_dir = Path(tempfile.mkdtemp())
 
 
+@timed("get_repository_zip")
 def get_repository_zip(url: str, authorization_secret: Optional[str] = None) -> ZipFile:
     """
     Retrieve a zip file of a code repository from the given URL, either from
@@ -22,7 +25,9 @@ def get_repository_zip(url: str, authorization_secret: Optional[str] = None) ->
     file_name = url_hash + ".zip"
     cache_file_path = cache_dir / file_name
 
-    if not cache_file_path.exists():
+    is_cached = cache_file_path.exists()
+    repository_cache_requests_total.inc(kind="zip", result="hit" if is_cached else "miss")
+    if not is_cached:
         if authorization_secret is None:
             if contextvars.repository_authorization_secret_context_var_empty():
                 raise ValueError("Authorization secret for the repository API is not set. Pass authorization_secret to this function or add the X-Repository-Authorization-Secret header to the request from the assessment module manager.")
@@ -36,6 +41,7 @@ def get_repository_zip(url: str, authorization_secret: Optional[str] = None) ->
     return ZipFile(cache_file_path)
 
 
+@timed("get_repository")
 def get_repository(url: str, authorization_secret: Optional[str] = None) -> Repo:
     """
     Retrieve a code repository from the given URL, either from the cache or by
@@ -46,7 +52,9 @@ def get_repository(url: str, authorization_secret: Optional[str] = None) -> Repo
     dir_name = url_hash + ".git"
     cache_dir_path = cache_dir / dir_name
 
-    if not cache_dir_path.exists():
+    is_cached = cache_dir_path.exists()
+    repository_cache_requests_total.inc(kind="repository", result="hit" if is_cached else "miss")
+    if not is_cached:
         repo_zip = get_repository_zip(url, authorization_secret)
         repo_zip.extractall(cache_dir_path)
         if not (cache_dir_path / ".git").exists():
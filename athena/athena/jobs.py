@@ -0,0 +1,307 @@
+"""
+Provides a durable job queue for the work of the consumer endpoints, like processing received submissions.
+
+Jobs are stored in the database, so queued and interrupted jobs survive restarts of the module.
+A fixed number of workers (JOB_WORKERS) runs them, with at most one running job per exercise at a time.
+Failed jobs are retried with exponential backoff, up to JOB_MAX_ATTEMPTS attempts.
+
+Several instances of a module can share the database. Each instance records itself as the owner of the jobs it runs
+and updates their heartbeat every JOB_HEARTBEAT_SECONDS. Running jobs whose heartbeat is older than JOB_STALE_SECONDS
+(e.g. because their instance crashed) are queued again, jobs of instances that are still alive are left alone.
+
+The database allows only one running job per exercise (see the unique index of DBJob), so that instances that claim
+jobs of the same exercise at the same time cannot both start one.
+
+The workers also run the periodic maintenance tasks of the module (see `register_periodic_task`), e.g. the eviction of
+the feedback cache, on every instance.
+
+The repository authorization secret of programming modules is stored with the job, encrypted with the secret of the
+module (SECRET), so that jobs can also be run after a restart or by another instance. If it cannot be decrypted
+(e.g. because SECRET was changed in the meantime), the job fails right away with an explicit error instead of being
+retried.
+
+Example usage:
+    register_job_handler("submissions", receive_submissions, parse_payload)
+    job_id = await enqueue_job("submissions", exercise.id, {"submission_ids": [1, 2, 3]})
+"""
+import asyncio
+import base64
+import hashlib
+import inspect
+import os
+import socket
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidToken
+from sqlalchemy import and_, exists, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased
+from starlette.concurrency import run_in_threadpool
+
+from athena import env
+from athena.contextvars import get_lms_url, set_lms_url_context_var, set_repository_authorization_secret_context_var, \
+    repository_authorization_secret_context_var_empty, get_repository_authorization_secret_context_var
+from athena.database import get_db, run_in_db_async
+from athena.logger import logger
+from athena.models import DBJob
+from athena.schemas import Job, JobStatus
+
+# Workers look for due jobs at least this often, even if no new job was enqueued (e.g. for retries)
+POLL_INTERVAL_SECONDS = 5
+RETRY_BACKOFF_SECONDS = 10
+# Claims that lose the race for a job against another instance look for the next job this often
+CLAIM_ATTEMPTS = 3
+
+# Function to call and a function to get its (args, kwargs) from the job payload, by job kind
+_job_handlers: Dict[str, Tuple[Callable, Callable[[dict], Tuple[tuple, dict]]]] = {}
+# Functions to run periodically and their interval in seconds
+_periodic_tasks: List[Tuple[Callable[[], None], float]] = []
+# Identifies this instance as the owner of the jobs it runs
+_instance_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+_workers: List[asyncio.Task] = []
+_new_job_event = asyncio.Event()
+_claim_lock = asyncio.Lock()
+
+
+def register_job_handler(kind: str, func: Callable, parse_payload: Callable[[dict], Tuple[tuple, dict]]):
+    """
+    Register the function that runs jobs of the given kind.
+    The function can be synchronous (runs in the threadpool) or asynchronous.
+    parse_payload gets the payload of the job and returns the args and kwargs for the function.
+    """
+    _job_handlers[kind] = (func, parse_payload)
+
+
+def register_periodic_task(func: Callable[[], None], interval_seconds: float):
+    """
+    Register a synchronous function that runs every interval_seconds while the job workers run (in the threadpool,
+    or with the async engine, see `run_in_db_async`). Registering the same function again has no effect.
+    """
+    if all(registered_func is not func for registered_func, _ in _periodic_tasks):
+        _periodic_tasks.append((func, interval_seconds))
+
+
+def _get_secret_cipher() -> Fernet:
+    """The cipher for the repository authorization secrets of the jobs, with a key derived from the module secret."""
+    module_secret = env.ASSESSMENT_MODULE_MANAGER_TO_ATHENA_MODULE_SECRET or ""
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(module_secret.encode()).digest()))
+
+
+def _insert_job(kind: str, exercise_id: int, payload: dict, lms_url: str,
+                repository_authorization_secret: Optional[str]) -> int:
+    with get_db() as db:
+        job = DBJob(kind=kind, exercise_id=exercise_id, payload=payload, lms_url=lms_url,
+                    repository_authorization_secret=repository_authorization_secret)
+        db.add(job)
+        db.commit()
+        return job.id
+
+
+async def enqueue_job(kind: str, exercise_id: int, payload: dict) -> int:
+    """Store a new job for the current LMS and wake up the workers. Returns the ID of the job."""
+    lms_url = get_lms_url()
+    repository_authorization_secret = None
+    if not repository_authorization_secret_context_var_empty():
+        repository_authorization_secret = _get_secret_cipher().encrypt(
+            get_repository_authorization_secret_context_var().encode()).decode()
+    job_id = await run_in_db_async(_insert_job, kind, exercise_id, payload, lms_url, repository_authorization_secret)
+    _new_job_event.set()
+    return job_id
+
+
+def get_jobs(exercise_id: Optional[int] = None, limit: int = 100) -> List[Job]:
+    """Returns the most recent jobs of the current LMS, optionally only for the given exercise."""
+    with get_db() as db:
+        query = db.query(DBJob).filter(DBJob.lms_url == get_lms_url())
+        if exercise_id is not None:
+            query = query.filter(DBJob.exercise_id == exercise_id)
+        return [j.to_schema() for j in query.order_by(DBJob.id.desc()).limit(limit).all()]
+
+
+def count_queued_jobs() -> int:
+    """Returns the number of jobs waiting to be run, for all LMS instances."""
+    with get_db() as db:
+        return db.query(DBJob).filter(DBJob.status == JobStatus.queued).count()
+
+
+def _claim_next_job() -> Optional[Tuple[int, str, str, dict, int, Optional[str]]]:
+    """Mark the oldest due job of an exercise without a running job as running by this instance and return it."""
+    running_job = aliased(DBJob)
+    for _ in range(CLAIM_ATTEMPTS):
+        now = datetime.utcnow()
+        with get_db() as db:
+            job = db.query(DBJob).filter(
+                DBJob.status == JobStatus.queued,
+                DBJob.next_run_at <= now,
+                ~exists().where(and_(
+                    running_job.status == JobStatus.running,
+                    running_job.exercise_id == DBJob.exercise_id,
+                    running_job.lms_url == DBJob.lms_url,
+                )),
+            ).order_by(DBJob.id).with_for_update(skip_locked=True).first()
+            if job is None:
+                return None
+            claimed = (job.id, job.kind, job.lms_url, job.payload, job.attempts + 1,
+                       job.repository_authorization_secret)
+            try:
+                # Only if no other instance has claimed the job since (e.g. on SQLite, which ignores skip_locked)
+                n_claimed = db.query(DBJob).filter(DBJob.id == job.id, DBJob.status == JobStatus.queued).update({
+                    DBJob.status: JobStatus.running,
+                    DBJob.attempts: DBJob.attempts + 1,
+                    DBJob.updated_at: now,
+                    DBJob.claimed_by: _instance_id,
+                    DBJob.heartbeat_at: now,
+                }, synchronize_session=False)
+                db.commit()
+            except IntegrityError:
+                # Another instance has started a job of the same exercise since, see the unique index of DBJob
+                db.rollback()
+                continue
+            if n_claimed == 1:
+                return claimed
+    return None
+
+
+def _finish_job(job_id: int, attempts: int, error: Optional[str], retry: bool = True):
+    now = datetime.utcnow()
+    with get_db() as db:
+        job = db.query(DBJob).filter(DBJob.id == job_id).with_for_update().one()
+        if job.status != JobStatus.running or job.claimed_by != _instance_id:
+            # The heartbeat was missed and the job has been started again in the meantime
+            logger.warning("Job %d is not owned by this instance anymore, not recording its result", job_id)
+            return
+        job.updated_at = now
+        job.claimed_by = None
+        job.heartbeat_at = None
+        if error is None:
+            job.status = JobStatus.done
+            job.last_error = None
+        elif retry and attempts < env.JOB_MAX_ATTEMPTS:
+            job.status = JobStatus.queued
+            job.last_error = error
+            job.next_run_at = now + timedelta(seconds=RETRY_BACKOFF_SECONDS * 2 ** (attempts - 1))
+        else:
+            job.status = JobStatus.failed
+            job.last_error = error
+        db.commit()
+
+
+def _update_heartbeats():
+    """Report that the jobs of this instance are still running."""
+    with get_db() as db:
+        db.query(DBJob).filter(DBJob.status == JobStatus.running, DBJob.claimed_by == _instance_id).update(
+            {DBJob.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+        db.commit()
+
+
+def _requeue_jobs(stale: bool):
+    """
+    Queue running jobs again: the ones without a recent heartbeat of any instance (e.g. because the instance crashed),
+    or with stale=False the ones of this instance (on shutdown).
+    """
+    with get_db() as db:
+        query = db.query(DBJob).filter(DBJob.status == JobStatus.running)
+        if stale:
+            cutoff = datetime.utcnow() - timedelta(seconds=env.JOB_STALE_SECONDS)
+            query = query.filter(or_(DBJob.heartbeat_at.is_(None), DBJob.heartbeat_at < cutoff))
+        else:
+            query = query.filter(DBJob.claimed_by == _instance_id)
+        n_jobs = query.update({DBJob.status: JobStatus.queued, DBJob.claimed_by: None, DBJob.heartbeat_at: None},
+                              synchronize_session=False)
+        db.commit()
+    if n_jobs:
+        logger.info("Requeued %d %s jobs", n_jobs, "stale" if stale else "interrupted")
+        _new_job_event.set()
+
+
+async def _heartbeat():
+    while True:
+        try:
+            await run_in_db_async(_update_heartbeats)
+            await run_in_db_async(_requeue_jobs, True)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Could not update the heartbeat of the running jobs")
+        await asyncio.sleep(env.JOB_HEARTBEAT_SECONDS)
+
+
+async def _run_periodically(func: Callable[[], None], interval_seconds: float):
+    while True:
+        try:
+            await run_in_db_async(func)
+        except Exception:  # pylint: disable=broad-except
+            logger.exception("Periodic task %s failed", func.__name__)
+        await asyncio.sleep(interval_seconds)
+
+
+async def _run_job(job_id: int, kind: str, lms_url: str, payload: dict, attempts: int,
+                   repository_authorization_secret: Optional[str]):
+    set_lms_url_context_var(lms_url)
+    if repository_authorization_secret is not None:
+        try:
+            set_repository_authorization_secret_context_var(
+                _get_secret_cipher().decrypt(repository_authorization_secret.encode()).decode())
+        except InvalidToken:
+            # Retrying would not help, the secret only comes with new requests from the LMS
+            error = ("The repository authorization secret of the job cannot be decrypted with the secret of the "
+                     "module (SECRET), e.g. because it was changed since the job was enqueued. Send the request again.")
+            logger.error("Job %d (%s) failed: %s", job_id, kind, error)
+            await run_in_db_async(_finish_job, job_id, attempts, error, False)
+            return
+
+    error = None
+    try:
+        func, parse_payload = _job_handlers[kind]
+        args, kwargs = await run_in_db_async(parse_payload, payload)
+        if inspect.iscoroutinefunction(func):
+            await func(*args, **kwargs)
+        else:
+            await run_in_threadpool(func, *args, **kwargs)
+    except Exception:  # pylint: disable=broad-except
+        error = traceback.format_exc()
+        logger.error("Job %d (%s) failed in attempt %d:\n%s", job_id, kind, attempts, error)
+
+    await run_in_db_async(_finish_job, job_id, attempts, error)
+
+
+async def _worker():
+    while True:
+        async with _claim_lock:
+            claimed = await run_in_db_async(_claim_next_job)
+        if claimed is None:
+            _new_job_event.clear()
+            try:
+                await asyncio.wait_for(_new_job_event.wait(), timeout=POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            continue
+        # Each job runs in its own context, so that context variables do not leak between jobs
+        await asyncio.create_task(_run_job(*claimed))
+        # Another job of the same exercise might be waiting for this one
+        _new_job_event.set()
+
+
+async def start_job_workers():
+    """
+    Start the job workers, the heartbeat, which also requeues stale jobs, and the periodic tasks. Called on app startup.
+    """
+    _workers.append(asyncio.create_task(_heartbeat()))
+    for func, interval_seconds in _periodic_tasks:
+        _workers.append(asyncio.create_task(_run_periodically(func, interval_seconds)))
+    for _ in range(env.JOB_WORKERS):
+        _workers.append(asyncio.create_task(_worker()))
+    logger.info("Started %d job workers (instance %s)", env.JOB_WORKERS, _instance_id)
+
+
+async def stop_job_workers():
+    """
+    Stop the job workers. The running jobs of this instance are queued again right away,
+    so that they are started again without waiting for their heartbeat to become stale. Called on app shutdown.
+    """
+    for worker in _workers:
+        worker.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
+    await run_in_db_async(_requeue_jobs, False)
@@ -2,13 +2,15 @@
 Provides request metadata handling for Athena.
 
 You can use this module to add metadata to HTTP responses for most endpoints (decorated with @with_meta).
+The metadata context is reset at the start of each request by the RequestContextMiddleware (see athena.request_context).
 
 Example usage:
     from fastapi import FastAPI
-    from .metadata import MetaDataMiddleware, with_meta, emit_meta
+    from .metadata import with_meta, emit_meta
+    from .request_context import RequestContextMiddleware
 
     app = FastAPI()
-    app.add_middleware(MetaDataMiddleware)
+    app.add_middleware(RequestContextMiddleware)
 
     @app.get("/items/{item_id}")
     @with_meta
@@ -16,7 +18,7 @@ Example usage:
         emit_meta("item_id", item_id)
         return {"item_id": item_id, "name": "Fancy Item"}
 
-    Response of /items/42:
+    Response of /items/42 (with the header X-Athena-Envelope: 1):
     {
         "data": {
             "item_id": 42
@@ -32,37 +34,18 @@ import contextvars
 from typing import Dict, Any
 from functools import wraps
 
-from fastapi import Request
-from starlette.middleware.base import BaseHTTPMiddleware, RequestResponseEndpoint
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
 
+from athena.timing import get_timings
+from athena.transport import FastJSONResponse
 
-metadata_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("metadata")
-
-
-class MetaDataMiddleware(BaseHTTPMiddleware):
-    """
-    Middleware to handle metadata in the context of HTTP requests.
-
-    This middleware allows to set and get metadata context in each HTTP request.
-    The context is then available throughout the processing of a request, even in asynchronous operations.
-    """
-    async def dispatch(self, request: Request, call_next: RequestResponseEndpoint):
-        """
-        Middleware dispatcher.
 
-        This method sets the metadata context at the start of processing each request.
-        It then gets the response from the next middleware or the actual route handler, and returns it.
+# Header of the {"data": ..., "meta": ...} responses of endpoints decorated with @with_meta, so that the assessment
+# module manager can extend them without parsing them (see its pass-through mode)
+ENVELOPE_HEADER = "X-Athena-Envelope"
 
-        Args:
-            request (Request): The incoming HTTP request.
-            call_next (RequestResponseEndpoint): The next middleware or route handler.
-
-        Returns:
-            The response from the next middleware or route handler.
-        """
-        metadata_context.set({})
-        response = await call_next(request)
-        return response
+metadata_context: contextvars.ContextVar[Dict[str, Any]] = contextvars.ContextVar("metadata")
 
 
 def get_meta() -> Dict[str, Any]:
@@ -89,6 +72,13 @@ def emit_meta(key: str, value: Any):
     metadata[key] = value
 
 
+def emit_timings():
+    """Add the timings of the current request so far (see `athena.timing`) to the metadata context."""
+    timings = get_timings()
+    if timings is not None:
+        emit_meta("timings", timings)
+
+
 def with_meta(func):
     """
     Decorator for endpoints that can send back metadata.
@@ -102,8 +92,12 @@ def with_meta(func):
     @wraps(func)
     async def wrapper(*args, **kwargs):
         data = await func(*args, **kwargs)
-        return {
-            "data": data,
-            "meta": get_meta(),
-        }
-    return wrapper
\ No newline at end of file
+        if isinstance(data, Response):
+            # Responses like streaming responses (see athena.streaming) send their metadata themselves
+            return data
+        emit_timings()
+        return FastJSONResponse(
+            content=jsonable_encoder({"data": data, "meta": get_meta()}),
+            headers={ENVELOPE_HEADER: "1"},
+        )
+    return wrapper
@@ -0,0 +1,206 @@
+"""
+Prometheus metrics for the Athena modules and the assessment module manager, served at `/metrics`
+in the Prometheus text format.
+
+Every `FastAPIWithStart` app (see `athena.app`) serves these metrics. The assessment module manager serves them too,
+but only with its METRICS_SECRET, because it is reachable from the internet:
+- `athena_http_request_duration_seconds` (histogram) by method, route and status, and `athena_http_requests_in_flight`
+- `athena_jobs_queued`: background jobs that are waiting to run (see `athena.jobs`)
+- `athena_llm_requests_total`, `athena_llm_request_duration_seconds` and `athena_llm_tokens_total` by model
+  (from the `UsageHandler` of llm_core)
+- `athena_repository_cache_requests_total` by kind and result (hit or miss), see `athena.helpers.programming`
+- `athena_db_pool_connections` by state
+
+The metrics are implemented here instead of using prometheus_client, so the modules do not need another dependency.
+Metrics are kept per process, like in prometheus_client without its multiprocess mode: metrics recorded in the workers
+of the process pool (see `athena.process_pool`) are not served.
+
+Example:
+    from athena.metrics import Counter
+    feedback_counter = Counter("athena_module_feedback_total", "Feedback suggested by the module", ["kind"])
+    feedback_counter.inc(kind="method")
+"""
+import bisect
+import threading
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from starlette.responses import Response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+_metrics: List["_Metric"] = []
+# Functions that update metrics right before they are served, e.g. gauges that are expensive to keep up to date
+_collectors: List[Callable[[], None]] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(label_names: Sequence[str], label_values: Sequence[str]) -> str:
+    if not label_names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in zip(label_names, label_values)) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+        _metrics.append(self)
+
+    def _label_values(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"{self.name} expects the labels {self.label_names}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        with self._lock:
+            samples = self._samples()
+        return "\n".join([f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}", *samples])
+
+
+class Counter(_Metric):
+    """A value that only goes up, e.g. the number of requests."""
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels: str):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def _samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(value)}"
+                for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    """A value that goes up and down, e.g. the number of requests in flight."""
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels: str):
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels: str):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Counts of observed values (e.g. durations in seconds) in buckets, with their count and sum."""
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # Per label values: count per bucket (the last one is +Inf, not cumulative) and the sum of all values
+        self._values: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels: str):
+        key = self._label_values(labels)
+        with self._lock:
+            bucket_counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def _samples(self) -> List[str]:
+        samples = []
+        bucket_label_names = self.label_names + ("le",)
+        for key, (bucket_counts, total) in self._values.items():
+            cumulative = 0
+            for upper_bound, count in zip(self.buckets + (float("inf"),), bucket_counts):
+                cumulative += count
+                labels = _format_labels(bucket_label_names, key + (_format_value(upper_bound),))
+                samples.append(f"{self.name}_bucket{labels} {cumulative}")
+            samples.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+            samples.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total[0])}")
+        return samples
+
+
+def register_collector(collector: Callable[[], None]):
+    """Register a function that updates metrics right before they are served."""
+    if collector not in _collectors:
+        _collectors.append(collector)
+
+
+def generate_metrics() -> str:
+    """All metrics in the Prometheus text format."""
+    for collector in _collectors:
+        collector()
+    return "\n".join(metric.render() for metric in _metrics) + "\n"
+
+
+def metrics_endpoint() -> Response:
+    """Endpoint for Prometheus to scrape. Synchronous, so collectors that query the database run in the threadpool."""
+    return Response(generate_metrics(), media_type=CONTENT_TYPE)
+
+
+http_request_duration_seconds = Histogram(
+    "athena_http_request_duration_seconds", "Duration of HTTP requests until the response is sent completely",
+    ["method", "route", "status"])
+http_requests_in_flight = Gauge("athena_http_requests_in_flight", "HTTP requests that are being processed", ["method"])
+jobs_queued = Gauge("athena_jobs_queued", "Background jobs that are waiting to run")
+llm_requests_total = Counter("athena_llm_requests_total", "LLM requests by model and outcome", ["model", "outcome"])
+llm_request_duration_seconds = Histogram("athena_llm_request_duration_seconds", "Duration of LLM requests", ["model"])
+llm_tokens_total = Counter("athena_llm_tokens_total", "Tokens used in LLM requests by type (input or output)",
+                           ["model", "type"])
+repository_cache_requests_total = Counter(
+    "athena_repository_cache_requests_total", "Lookups in the repository cache by kind (zip or repository) and result",
+    ["kind", "result"])
+db_pool_connections = Gauge("athena_db_pool_connections",
+                            "Connections of the database pool by state (checked_in, checked_out or overflow)", ["state"])
+
+
+class MetricsMiddleware:
+    """Measures the duration of HTTP requests by route template (e.g. `/modules/{module_type}/{module_name}/{path}`)."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status: Optional[int] = None
+
+        async def send_with_status(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        http_requests_in_flight.inc(method=method)
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            http_requests_in_flight.dec(method=method)
+            # The router stores the matched route in the scope, its path template keeps the number of labels small
+            route = scope.get("route")
+            http_request_duration_seconds.observe(
+                time.perf_counter() - start,
+                method=method, route=getattr(route, "path", "unmatched"), status=str(status or 500))
@@ -0,0 +1,95 @@
+"""
+Versioned migrations of the database schema, run by `app.start()` right after `create_tables`.
+
+`create_tables` only creates missing tables, so changes to existing tables (new indexes, columns, ...) need a migration.
+Every migration has a unique version and runs at most once per database, in the order of the versions.
+The applied versions are recorded in the schema_migration table.
+On PostgreSQL, an advisory lock ensures that only one module instance runs the migrations at a time.
+
+Migrations should not depend on the current models, because these change over time.
+Tables created by `create_tables` already have their current schema, so migrations have to be no-ops for them.
+
+Example migration:
+    @migration(2, "Add the language column to text submissions")
+    def _add_text_submission_language(connection: Connection):
+        if "language" not in {column["name"] for column in inspect(connection).get_columns("text_submissions")}:
+            connection.execute(text("ALTER TABLE text_submissions ADD COLUMN language VARCHAR"))
+"""
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Callable, Dict, List
+
+from sqlalchemy import Connection, Index, MetaData, Table, inspect, insert, select, text
+
+from athena.database import engine
+from athena.logger import logger
+from athena.models import DBSchemaMigration
+from athena.models.meta_fields import add_missing_promoted_columns
+
+# Arbitrary key of the PostgreSQL advisory lock held while running migrations
+_MIGRATION_LOCK_KEY = 4_143_821
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    description: str
+    upgrade: Callable[[Connection], None]
+
+
+_migrations: Dict[int, Migration] = {}
+
+
+def migration(version: int, description: str):
+    """Register the decorated function as the migration with the given version. It gets the connection to migrate."""
+    def decorator(upgrade: Callable[[Connection], None]):
+        if version in _migrations:
+            raise ValueError(f"There already is a migration with version {version}")
+        _migrations[version] = Migration(version=version, description=description, upgrade=upgrade)
+        return upgrade
+    return decorator
+
+
+def run_migrations():
+    """
+    Run all migrations that have not been applied to the database yet, in a single transaction.
+    Also add the columns of newly promoted meta fields (see `athena.models.meta_fields`).
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name == "postgresql":
+            connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": _MIGRATION_LOCK_KEY})
+        DBSchemaMigration.__table__.create(connection, checkfirst=True)  # type: ignore
+
+        applied_versions = set(connection.execute(select(DBSchemaMigration.version)).scalars())
+        for version in sorted(_migrations):
+            if version in applied_versions:
+                continue
+            pending = _migrations[version]
+            logger.info("Running database migration %d: %s", version, pending.description)
+            pending.upgrade(connection)
+            connection.execute(insert(DBSchemaMigration).values(
+                version=version, description=pending.description, applied_at=datetime.utcnow()
+            ))
+
+        # Promoted meta fields are declared by the modules, so they have no migration version
+        add_missing_promoted_columns(connection)
+
+
+def _create_index(connection: Connection, table_name: str, index_name: str, column_names: List[str]):
+    """Create the index on the given table, unless the table does not exist or already has the index."""
+    if not inspect(connection).has_table(table_name):
+        return
+    table = Table(table_name, MetaData(), autoload_with=connection)
+    Index(index_name, *(table.c[column_name] for column_name in column_names)).create(connection, checkfirst=True)
+
+
+@migration(1, "Add composite indexes for the filters in athena.storage")
+def _add_storage_indexes(connection: Connection):
+    for exercise_type in ("text", "programming", "modeling"):
+        submissions_table = f"{exercise_type}_submissions"
+        _create_index(connection, submissions_table, f"ix_{submissions_table}_exercise_id_lms_url",
+                      ["exercise_id", "lms_url"])
+        feedbacks_table = f"{exercise_type}_feedbacks"
+        _create_index(connection, feedbacks_table, f"ix_{feedbacks_table}_exercise_id_lms_url_is_suggestion_submission_id",
+                      ["exercise_id", "lms_url", "is_suggestion", "submission_id"])
+
@@ -2,6 +2,7 @@
 
 import functools
 
+import athena.models
 import athena.storage
 from .module_config import get_module_config
 from .schemas import ModelingExercise, ModelingFeedback, ModelingSubmission
@@ -22,8 +23,16 @@ count_stored_submissions = functools.partial(athena.storage.count_stored_submiss
 get_stored_submissions = functools.partial(athena.storage.get_stored_submissions, Submission)
 get_stored_feedback = functools.partial(athena.storage.get_stored_feedback, Feedback)
 get_stored_feedback_suggestions = functools.partial(athena.storage.get_stored_feedback_suggestions, Feedback)
+get_stored_exercises_async = functools.partial(athena.storage.get_stored_exercises_async, Exercise)
+count_stored_submissions_async = functools.partial(athena.storage.count_stored_submissions_async, Submission)
+get_stored_submissions_async = functools.partial(athena.storage.get_stored_submissions_async, Submission)
+get_stored_feedback_async = functools.partial(athena.storage.get_stored_feedback_async, Feedback)
+get_stored_feedback_suggestions_async = functools.partial(athena.storage.get_stored_feedback_suggestions_async, Feedback)
+promote_feedback_meta_fields = functools.partial(athena.models.promote_meta_fields, Feedback.get_model_class())
 
 __all__ = [
     "Exercise", "Submission", "Feedback",
-    "get_stored_exercises", "get_stored_submissions", "get_stored_feedback", "get_stored_feedback_suggestions"
+    "get_stored_exercises", "get_stored_submissions", "get_stored_feedback", "get_stored_feedback_suggestions",
+    "get_stored_exercises_async", "count_stored_submissions_async", "get_stored_submissions_async",
+    "get_stored_feedback_async", "get_stored_feedback_suggestions_async", "promote_feedback_meta_fields"
 ]
\ No newline at end of file
@@ -15,4 +15,9 @@ from .db_modeling_submission import DBModelingSubmission
 from .db_programming_feedback import DBProgrammingFeedback
 from .db_text_feedback import DBTextFeedback
 from .db_modeling_feedback import DBModelingFeedback
-from .db_structured_grading_criterion import DBStructuredGradingCriterion
\ No newline at end of file
+from .db_structured_grading_criterion import DBStructuredGradingCriterion
+from .db_feedback_cache_entry import DBFeedbackCacheEntry
+from .db_job import DBJob
+from .db_schema_migration import DBSchemaMigration
+from .db_meta_blob import DBMetaBlob
+from .meta_fields import promote_meta_fields
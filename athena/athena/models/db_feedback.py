@@ -1,11 +1,20 @@
-from sqlalchemy import Column, BigInteger, Boolean, String, Float, JSON, UniqueConstraint
+from sqlalchemy import Column, BigInteger, Boolean, String, Float, JSON, UniqueConstraint, Index
+from sqlalchemy.orm import declared_attr
 
 from .model import Model
+from .meta_fields import get_promoted_meta
 from .big_integer_with_autoincrement import BigIntegerWithAutoincrement
 
 
 class DBFeedback(Model):
-    __table_args__ = (UniqueConstraint('lms_id'),)
+    @declared_attr.directive
+    def __table_args__(cls):  # pylint: disable=no-self-argument
+        # Matches the filters in athena/storage/feedback_storage.py, see also athena/migrations.py
+        return (
+            UniqueConstraint('lms_id'),
+            Index(f"ix_{cls.__tablename__}_exercise_id_lms_url_is_suggestion_submission_id",
+                  "exercise_id", "lms_url", "is_suggestion", "submission_id"),
+        )
 
     id = Column(BigIntegerWithAutoincrement, primary_key=True, index=True, autoincrement=True)
     lms_url = Column(String, index=True, nullable=False)
@@ -19,3 +28,10 @@ class DBFeedback(Model):
 
     # not in the schema, but used in the database to distinguish between feedbacks and feedback suggestions
     is_suggestion = Column(Boolean, default=False, nullable=False)
+
+    def to_schema(self):
+        schema = super().to_schema()
+        promoted_meta = get_promoted_meta(self)
+        if promoted_meta:
+            schema.meta = {**schema.meta, **promoted_meta}
+        return schema
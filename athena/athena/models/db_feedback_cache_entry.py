@@ -0,0 +1,19 @@
+from datetime import datetime
+
+from sqlalchemy import Column, String, DateTime, JSON
+
+from athena.database import Base
+from .big_integer_with_autoincrement import BigIntegerWithAutoincrement
+
+
+class DBFeedbackCacheEntry(Base):
+    __tablename__ = "feedback_cache_entry"
+
+    # hash of the feedback provider inputs, see athena/storage/feedback_cache_storage.py
+    key = Column(String, primary_key=True)
+    lms_url = Column(String, nullable=False)
+    exercise_id = Column(BigIntegerWithAutoincrement, nullable=False, index=True)
+    # stored feedback suggestions as returned by the feedback provider endpoint
+    feedbacks = Column(JSON, nullable=False)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_used_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -0,0 +1,37 @@
+from datetime import datetime
+
+from sqlalchemy import Column, String, Integer, DateTime, JSON, Enum as SqlEnum, Index, text
+
+from athena.database import Base
+from athena.schemas.job import JobStatus
+from .model import Model
+from .big_integer_with_autoincrement import BigIntegerWithAutoincrement
+
+
+class DBJob(Model, Base):
+    __tablename__ = "job"
+    __table_args__ = (
+        Index("ix_job_status_next_run_at", "status", "next_run_at"),
+        # At most one running job per exercise, also if several instances claim jobs at the same time (see athena/jobs.py)
+        Index("ix_job_running_lms_url_exercise_id", "lms_url", "exercise_id", unique=True,
+              postgresql_where=text("status = 'running'"), sqlite_where=text("status = 'running'")),
+    )
+
+    id = Column(BigIntegerWithAutoincrement, primary_key=True, index=True, autoincrement=True)
+    kind = Column(String, nullable=False)
+    lms_url = Column(String, nullable=False)
+    exercise_id = Column(BigIntegerWithAutoincrement, nullable=False)
+    # arguments for the job handler, usually IDs of stored exercises, submissions and feedback
+    payload = Column(JSON, nullable=False)
+    status = Column(SqlEnum(JobStatus), nullable=False, default=JobStatus.queued)
+    attempts = Column(Integer, nullable=False, default=0)
+    last_error = Column(String, nullable=True)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    updated_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # queued jobs are not started before this time (used for the backoff between retries)
+    next_run_at = Column(DateTime, nullable=False, default=datetime.utcnow)
+    # the module instance running the job and when it last reported that the job is still running
+    claimed_by = Column(String, nullable=True)
+    heartbeat_at = Column(DateTime, nullable=True)
+    # the repository authorization secret of the request, encrypted with the module secret (see athena/jobs.py)
+    repository_authorization_secret = Column(String, nullable=True)
@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, JSON
+
+from athena.database import Base
+
+
+class DBMetaBlob(Base):
+    __tablename__ = "meta_blob"
+
+    # hash of the value, so every value is only stored once (see athena/models/meta_fields.py)
+    hash = Column(String, primary_key=True)
+    value = Column(JSON, nullable=False)
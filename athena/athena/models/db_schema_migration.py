@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime
+
+from athena.database import Base
+
+
+class DBSchemaMigration(Base):
+    __tablename__ = "schema_migration"
+
+    # version of an applied migration, see athena/migrations.py
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    description = Column(String, nullable=False)
+    applied_at = Column(DateTime, nullable=False, default=datetime.utcnow)
@@ -1,10 +1,16 @@
-from sqlalchemy import Column, JSON, String
+from sqlalchemy import Column, JSON, String, Index
+from sqlalchemy.orm import declared_attr
 
 from .model import Model
 from .big_integer_with_autoincrement import BigIntegerWithAutoincrement
 
 
 class DBSubmission(Model):
+    @declared_attr.directive
+    def __table_args__(cls):  # pylint: disable=no-self-argument
+        # Matches the filters in athena/storage/submission_storage.py, see also athena/migrations.py
+        return (Index(f"ix_{cls.__tablename__}_exercise_id_lms_url", "exercise_id", "lms_url"),)
+
     id = Column(BigIntegerWithAutoincrement, primary_key=True, index=True, autoincrement=True,)
     lms_url = Column(String, index=True, nullable=False)
     meta = Column(JSON, nullable=False)
@@ -0,0 +1,197 @@
+"""
+Promotes frequently used meta fields of feedback out of the JSON meta column, see `promote_meta_fields`:
+- columns: stored in typed and indexed columns of a side table (one per feedback table),
+  so that queries can filter on them (see the `meta` filter of `get_stored_feedback_suggestions`)
+- blobs: large values (e.g. source code or ASTs of methods) are stored only once in the meta_blob table, keyed by their
+  hash, and only referenced by the feedback. For example, all suggestions copied from the same feedback share them.
+
+For the module, promoted fields are still part of `feedback.meta`: the storage functions move them into the side table
+when storing feedback and back into the meta when reading it. Promoted fields set to None are not kept.
+
+Call `promote_meta_fields` when the module is imported, i.e. before the tables are created. Fields that are promoted
+later are added to an existing side table on startup (see `athena.migrations`). Feedback stored before keeps them in the
+JSON meta column, so they are still part of its meta, but queries cannot filter on them.
+
+Blobs that no feedback references anymore (e.g. after the feedback was updated with another value) are deleted
+periodically by the job workers, see `delete_unreferenced_meta_blobs` in `athena.storage`.
+
+Example:
+    promote_meta_fields(DBProgrammingFeedback, columns={"method_name": str}, blobs=["method_code"])
+"""
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import BigInteger, Boolean, Column, Connection, Float, ForeignKey, String, inspect, text
+from sqlalchemy.orm import Query, Session, relationship
+
+from athena.database import Base
+from .db_meta_blob import DBMetaBlob
+from .big_integer_with_autoincrement import BigIntegerWithAutoincrement
+
+
+# Column types for the Python types of promoted fields, other column types can be given as SQLAlchemy types
+_COLUMN_TYPES = {str: String, int: BigInteger, float: Float, bool: Boolean}
+
+
+@dataclass(frozen=True)
+class PromotedMetaFields:
+    side_cls: type
+    columns: Tuple[str, ...]
+    blobs: Tuple[str, ...]
+
+
+_promoted_meta_fields: Dict[type, PromotedMetaFields] = {}
+
+
+def promote_meta_fields(model_cls: type, columns: Optional[Dict[str, Any]] = None, blobs: Iterable[str] = ()):
+    """
+    Promote the given meta fields of a feedback model class out of the JSON meta column.
+
+    Promote the fields that are read or filtered often, and large values that are copied into the meta of many
+    feedbacks: for example, the programming modules copy the code of the method of a feedback into the meta of every
+    suggestion created from it, so storing it once instead of in every JSON meta keeps the database small.
+
+    Args:
+        model_cls: The feedback model class, e.g. DBProgrammingFeedback.
+        columns: Types of the fields to store in indexed columns by field name, e.g. {"method_name": str}.
+        blobs: Names of the fields with large values to store only once.
+    """
+    columns = columns or {}
+    blobs = tuple(blobs)
+    if model_cls in _promoted_meta_fields:
+        # The module can be imported twice, e.g. as __main__ and by uvicorn
+        promoted = _promoted_meta_fields[model_cls]
+        if promoted.columns == tuple(columns) and promoted.blobs == blobs:
+            return
+        raise ValueError(f"Other meta fields of {model_cls.__name__} are already promoted")
+    if "id" in columns or "id" in blobs or set(columns) & set(blobs):
+        raise ValueError("Meta fields cannot be called 'id' or be promoted to a column and a blob at the same time")
+
+    table_name = model_cls.__tablename__  # type: ignore
+    attributes: Dict[str, Any] = {
+        "__tablename__": f"{table_name}_meta_fields",
+        "id": Column(BigIntegerWithAutoincrement, ForeignKey(f"{table_name}.id", ondelete="CASCADE"), primary_key=True),
+    }
+    for name, column_type in columns.items():
+        attributes[name] = Column(_COLUMN_TYPES.get(column_type, column_type), index=True, nullable=True)
+    for name in blobs:
+        # Indexed for the deletion of unreferenced blobs
+        hash_column = Column(String, ForeignKey(DBMetaBlob.hash), nullable=True, index=True)
+        attributes[f"{name}_hash"] = hash_column
+        # The storage functions write the blobs themselves, because most of them already exist
+        attributes[f"{name}_blob"] = relationship(DBMetaBlob, foreign_keys=[hash_column], lazy="selectin", viewonly=True)
+    side_cls = type(f"{model_cls.__name__}MetaFields", (Base,), attributes)
+
+    # Loaded with one additional query per chunk of feedback, also when streaming
+    model_cls.promoted_meta = relationship(side_cls, uselist=False, lazy="selectin")  # type: ignore
+    _promoted_meta_fields[model_cls] = PromotedMetaFields(side_cls=side_cls, columns=tuple(columns), blobs=blobs)
+
+
+def get_blob_hash_columns() -> List[Column]:
+    """The columns of all side tables that reference blobs."""
+    return [
+        getattr(promoted.side_cls, f"{name}_hash")
+        for promoted in _promoted_meta_fields.values() for name in promoted.blobs
+    ]
+
+
+def get_blob_hash(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def split_promoted_meta(model):
+    """Move the promoted fields of a model that is about to be stored from its meta into a new side table row."""
+    promoted = _promoted_meta_fields.get(type(model))
+    if promoted is None:
+        return
+    meta = dict(model.meta or {})
+    side = promoted.side_cls()
+    for name in promoted.columns:
+        setattr(side, name, meta.pop(name, None))
+    for name in promoted.blobs:
+        if name in meta:
+            value = meta.pop(name)
+            blob = DBMetaBlob(hash=get_blob_hash(value), value=value)
+            setattr(side, f"{name}_hash", blob.hash)
+            setattr(side, f"{name}_blob", blob)
+    model.meta = meta
+    model.promoted_meta = side
+
+
+def get_promoted_side_models(models: List[Any]) -> Tuple[List[Any], List[DBMetaBlob]]:
+    """Side table rows of the given stored models (after `split_promoted_meta`) and the blobs they reference."""
+    side_models = []
+    blobs: Dict[str, DBMetaBlob] = {}
+    for model in models:
+        promoted = _promoted_meta_fields.get(type(model))
+        if promoted is None or model.promoted_meta is None:
+            continue
+        side = model.promoted_meta
+        side.id = model.id
+        side_models.append(side)
+        for name in promoted.blobs:
+            blob = getattr(side, f"{name}_blob")
+            if blob is not None:
+                blobs[blob.hash] = blob
+    return side_models, list(blobs.values())
+
+
+def _side_model_to_meta(promoted: PromotedMetaFields, side) -> dict:
+    meta = {}
+    for name in promoted.columns:
+        value = getattr(side, name)
+        if value is not None:
+            meta[name] = value
+    for name in promoted.blobs:
+        blob = getattr(side, f"{name}_blob")
+        if blob is not None:
+            meta[name] = blob.value
+    return meta
+
+
+def get_promoted_meta(model) -> dict:
+    """The promoted meta fields of the given model, to merge into its meta."""
+    promoted = _promoted_meta_fields.get(type(model))
+    if promoted is None or model.promoted_meta is None:
+        return {}
+    return _side_model_to_meta(promoted, model.promoted_meta)
+
+
+def get_promoted_metas(db: Session, model_cls: type, ids: List[int]) -> Dict[int, dict]:
+    """The promoted meta fields of the stored models with the given IDs, keyed by ID, in a single query."""
+    promoted = _promoted_meta_fields.get(model_cls)
+    if promoted is None or not ids:
+        return {}
+    side_models = db.query(promoted.side_cls).filter(promoted.side_cls.id.in_(ids)).all()  # type: ignore
+    return {side.id: _side_model_to_meta(promoted, side) for side in side_models}
+
+
+def filter_by_promoted_meta(query: Query, model_cls: type, meta: Dict[str, Any]) -> Query:
+    """Only keep the models whose promoted meta fields (columns, not blobs) have the given values."""
+    promoted = _promoted_meta_fields.get(model_cls)
+    not_promoted = set(meta) - set(promoted.columns if promoted is not None else ())
+    if not_promoted:
+        raise ValueError(f"Cannot filter on the meta fields {sorted(not_promoted)} of {model_cls.__name__}, "
+                         f"because they are not promoted to columns")
+    query = query.join(model_cls.promoted_meta)  # type: ignore
+    for name, value in meta.items():
+        query = query.filter(getattr(promoted.side_cls, name) == value)  # type: ignore
+    return query
+
+
+def add_missing_promoted_columns(connection: Connection):
+    """Add the columns (and their indexes) of fields that were promoted after the side table was created."""
+    inspector = inspect(connection)
+    for promoted in _promoted_meta_fields.values():
+        table = promoted.side_cls.__table__  # type: ignore
+        if not inspector.has_table(table.name):
+            continue
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name not in existing_columns:
+                column_type = column.type.compile(dialect=connection.dialect)
+                connection.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}"))
+        for index in table.indexes:
+            index.create(connection, checkfirst=True)
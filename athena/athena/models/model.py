@@ -1,19 +1,26 @@
-import importlib
+from typing import Optional
 
 from pydantic import BaseModel
-from sqlalchemy import Column, String, UniqueConstraint
+
+import athena.schemas
 
 
 class Model:
+    # Set for every model class when it is defined, see __init_subclass__
+    _schema_class: Optional[type] = None
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        # The schema class has the same name as myself, but without the "DB" prefix.
+        # athena.schemas is always imported before the models, so it can be resolved right away.
+        cls._schema_class = getattr(athena.schemas, cls.__name__[2:], None)
 
     @classmethod
     def get_schema_class(cls) -> BaseModel:
-        # The schema class has the same name as myself, but without the "DB" prefix.
-        # We can import it from athena.schemas
-        # and then use getattr to get the class from the module.
-        schema_module = importlib.import_module("athena.schemas")
-        schema_class_name = cls.__name__[2:]
-        return getattr(schema_module, schema_class_name)
+        if cls._schema_class is None:
+            raise AttributeError(f"There is no schema class for {cls.__name__} in athena.schemas")
+        return cls._schema_class  # type: ignore
 
     def to_schema(self):
-        return type(self).get_schema_class().from_orm(self)
+        # Models are only read back from the database, where Athena stored them after validating them
+        return type(self).get_schema_class().from_trusted_orm(self)  # type: ignore
@@ -1,5 +1,6 @@
 import configparser
 from dataclasses import dataclass
+from functools import lru_cache
 import json
 from pydantic import BaseModel, ValidationError
 from typing import TypeVar, Optional, Type
@@ -29,6 +30,32 @@ def get_module_config() -> ModuleConfig:
 
 
 C = TypeVar("C", bound=BaseModel)
+
+
+@lru_cache(maxsize=128)
+def _parse_module_config(module_config_type: Type[C], module_config: Optional[str]) -> C:
+    """
+    Parse and validate the module config from the request header.
+    Cached by the raw header value, because clients often send the same config many times (e.g. playground experiments).
+    Invalid configs raise an exception and are therefore not cached.
+    """
+    if module_config is not None:
+        try:
+            config_dict = json.loads(module_config)
+        except json.JSONDecodeError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
+                                detail="Invalid module config received, could not parse JSON from X-Module-Config header.") from exc
+        
+        try:
+            return module_config_type.parse_obj(config_dict)
+        except ValidationError as exc:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
+                                detail=f"Validation error for module config: {exc}") from exc
+    
+    # Return a default instance of module_config_type when module_config is None
+    return module_config_type()
+
+
 def get_dynamic_module_config_factory(module_config_type: Optional[Type[C]]):
     """Create a function that gets the dynamic module config from the request header."""
 
@@ -36,21 +63,8 @@ def get_dynamic_module_config_factory(module_config_type: Optional[Type[C]]):
         """Get the dynamic module config from the request header."""
         if module_config_type is None:
             return None
-
-        if module_config is not None:
-            try:
-                config_dict = json.loads(module_config)
-            except json.JSONDecodeError as exc:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
-                                    detail="Invalid module config received, could not parse JSON from X-Module-Config header.") from exc
-            
-            try:
-                return module_config_type.parse_obj(config_dict)
-            except ValidationError as exc:
-                raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, 
-                                    detail=f"Validation error for module config: {exc}") from exc
-        
-        # Return a default instance of module_config_type when module_config is None
-        return module_config_type()
+        # Copy the cached config (with its nested models), so that changes to it in one request do not leak into other
+        # requests
+        return _parse_module_config(module_config_type, module_config).copy(deep=True)
     
     return get_dynamic_module_config
\ No newline at end of file
@@ -0,0 +1,114 @@
+"""
+Provides a managed process pool to run CPU-bound synchronous module functions on all cores.
+
+Functions of the endpoint decorators with `executor="process"` are registered here.
+The functions themselves are not sent to the worker processes, because the decorated names in the module refer to the
+endpoints: Instead, each worker imports the modules of the registered functions once on startup (warm, preloaded
+workers), which registers the same functions in the worker, and then calls them by name.
+
+The LMS URL and the repository authorization secret of the request are passed to the worker, and metadata emitted
+in the worker with `emit_meta` is added to the metadata of the request, the same for its timings (see `athena.timing`).
+Spans recorded in the worker continue the trace of the request (see `athena.tracing`) and are exported by the worker.
+"""
+import asyncio
+import importlib
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from athena import env
+from athena.contextvars import get_lms_url, set_lms_url_context_var, set_repository_authorization_secret_context_var, \
+    repository_authorization_secret_context_var_empty, get_repository_authorization_secret_context_var
+from athena.logger import logger
+from athena.metadata import emit_meta, get_meta, metadata_context
+from athena.timing import Span, start_timings, timed
+from athena.tracing import continue_trace, get_service_name, get_traceparent, set_service_name
+
+_process_functions: Dict[str, Callable] = {}
+_process_pool: Optional[ProcessPoolExecutor] = None
+
+
+def _function_key(func: Callable) -> str:
+    return f"{func.__module__}:{func.__qualname__}"
+
+
+def register_process_function(func: Callable):
+    """Register a synchronous function to be run in the process pool with `run_in_process`."""
+    _process_functions[_function_key(func)] = func
+
+
+def _init_worker(module_names: Tuple[str, ...], service_name: str):
+    """Import the modules of all registered functions in a new worker process."""
+    set_service_name(service_name)
+    for module_name in module_names:
+        importlib.import_module(module_name)
+
+
+def _warm_up() -> int:
+    return os.getpid()
+
+
+# pylint: disable=too-many-positional-arguments
+def _call_in_worker(key: str, lms_url: Optional[str], repository_authorization_secret: Optional[str],
+                    traceparent: Optional[str], args: tuple, kwargs: dict) -> Tuple[Any, Dict[str, Any], Span]:
+    if lms_url is not None:
+        set_lms_url_context_var(lms_url)
+    if repository_authorization_secret is not None:
+        set_repository_authorization_secret_context_var(repository_authorization_secret)
+    metadata_context.set({})
+    continue_trace(traceparent)
+    root_span = start_timings()
+    result = _process_functions[key](*args, **kwargs)
+    return result, get_meta(), root_span
+
+
+def start_process_pool():
+    """Start the process pool and its workers if any function was registered for it. Called on app startup."""
+    global _process_pool  # pylint: disable=global-statement
+    if _process_pool is not None or not _process_functions:
+        return
+    module_names = tuple(sorted({key.split(":")[0] for key in _process_functions}))
+    _process_pool = ProcessPoolExecutor(
+        max_workers=env.PROCESS_POOL_WORKERS,
+        # spawn instead of fork: the workers should not inherit the event loop, threads or database connections
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(module_names, get_service_name()),
+    )
+    # Start all workers now instead of on the first request
+    for _ in range(env.PROCESS_POOL_WORKERS):
+        _process_pool.submit(_warm_up)
+    logger.info("Started process pool with %d workers for %s", env.PROCESS_POOL_WORKERS, ", ".join(module_names))
+
+
+def shutdown_process_pool():
+    """Stop the process pool. Called on app shutdown."""
+    global _process_pool  # pylint: disable=global-statement
+    if _process_pool is not None:
+        _process_pool.shutdown(wait=False, cancel_futures=True)
+        _process_pool = None
+
+
+async def run_in_process(func: Callable, *args, **kwargs) -> Any:
+    """Run a registered synchronous function in the process pool without blocking the event loop."""
+    if _process_pool is None:
+        start_process_pool()
+    try:
+        lms_url = get_lms_url()
+    except LookupError:
+        lms_url = None
+    repository_authorization_secret = None
+    if not repository_authorization_secret_context_var_empty():
+        repository_authorization_secret = get_repository_authorization_secret_context_var()
+
+    loop = asyncio.get_running_loop()
+    with timed("process_pool") as timer:
+        result, meta, worker_span = await loop.run_in_executor(
+            _process_pool, _call_in_worker, _function_key(func), lms_url, repository_authorization_secret,
+            get_traceparent(), args, kwargs)
+        if timer.span is not None:
+            timer.span.merge(worker_span)
+    for key, value in meta.items():
+        emit_meta(key, value)
+    return result
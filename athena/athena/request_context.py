@@ -0,0 +1,46 @@
+"""
+Sets the context variables of a request from its headers, so they are available throughout the processing of the
+request, even in asynchronous operations:
+- the metadata context (see `athena.metadata`), empty at the start of each request
+- the timings of the request (see `athena.timing`), which start when the request arrives
+- the experiment environment (see `athena.experiment`) from the X-Experiment-ID, X-Module-Configuration-ID
+  and X-Run-ID headers
+- the repository authorization secret (see `athena.contextvars`) from the X-Repository-Authorization-Secret header,
+  which the assessment module manager passes to the module. This way, the secret only has to be configured once.
+
+This is a pure ASGI middleware instead of a `BaseHTTPMiddleware`,
+so it does not add a task and a response stream wrapper to every request, and streaming responses pass through as is.
+"""
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from athena.contextvars import set_repository_authorization_secret_context_var
+from athena.experiment import ExperimentEnvironment, experiment_context
+from athena.metadata import metadata_context
+from athena.timing import start_timings
+
+
+class RequestContextMiddleware:
+    """Middleware to set all context variables of a request at once."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        metadata_context.set({})
+        start_timings()
+        experiment_context.set(ExperimentEnvironment(
+            experiment_id=headers.get("x-experiment-id"),
+            module_configuration_id=headers.get("x-module-configuration-id"),
+            run_id=headers.get("x-run-id"),
+        ))
+        repository_authorization_secret = headers.get("x-repository-authorization-secret")
+        if repository_authorization_secret:
+            set_repository_authorization_secret_context_var(repository_authorization_secret)
+
+        await self.app(scope, receive, send)
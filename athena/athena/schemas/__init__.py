@@ -14,4 +14,5 @@ from .modeling_feedback import ModelingFeedback
 from .modeling_exercise import ModelingExercise
 from .modeling_submission import ModelingSubmission
 from .grading_criterion import GradingCriterion, StructuredGradingInstruction
-from .structured_grading_criterion import StructuredGradingCriterion
\ No newline at end of file
+from .structured_grading_criterion import StructuredGradingCriterion
+from .job import Job, JobStatus
@@ -0,0 +1,30 @@
+from datetime import datetime
+from enum import Enum
+from typing import Optional
+
+from pydantic import Field
+
+from .schema import Schema
+
+
+class JobStatus(str, Enum):
+    """The status of a background job."""
+    queued = "queued"
+    running = "running"
+    done = "done"
+    failed = "failed"
+
+
+class Job(Schema):
+    """A background job, e.g. running the submissions consumer of the module for received submissions."""
+    id: int = Field(example=1)
+    kind: str = Field(description="What the job does, e.g. 'submissions' or 'feedbacks'.", example="submissions")
+    exercise_id: int = Field(example=1)
+    status: JobStatus = Field(example=JobStatus.queued)
+    attempts: int = Field(0, description="How often the job has been started so far.", example=1)
+    last_error: Optional[str] = Field(None, description="The error of the last failed attempt.", example=None)
+    created_at: datetime = Field(example="2023-01-01T00:00:00")
+    updated_at: datetime = Field(example="2023-01-01T00:00:00")
+
+    class Config:
+        orm_mode = True
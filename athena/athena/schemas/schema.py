@@ -1,10 +1,24 @@
 import abc
 import importlib
+from datetime import datetime
+from enum import Enum
+from functools import lru_cache
+from typing import Dict, Tuple
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
+from pydantic.fields import ModelField, SHAPE_LIST, SHAPE_SINGLETON
+from sqlalchemy import Enum as SqlEnum
 
 from athena.database import Base
 
+# Model classes by schema class, filled on the first conversion of each schema class
+_model_classes: Dict[type, type] = {}
+
+# Field types that the database already returns as they are, so they do not have to be validated again.
+# Enums are only returned as they are from Enum columns, see _is_trusted_field.
+_TRUSTED_FIELD_TYPES = (int, float, bool, dict, datetime)
+_MISSING = object()
+
 
 # https://stackoverflow.com/a/42450252/4306257
 def to_camel(snake_str):
@@ -12,15 +26,55 @@ def to_camel(snake_str):
     return ''.join([first.lower(), *map(str.title, others)])
 
 
+def _is_trusted_field(field: ModelField, model_class: type) -> bool:
+    if field.shape not in (SHAPE_SINGLETON, SHAPE_LIST) or (field.shape == SHAPE_SINGLETON and field.sub_fields):
+        return False  # e.g. unions and mappings
+    if not isinstance(field.type_, type):
+        return False
+    if issubclass(field.type_, Enum):
+        # Enums stored in a String column (like the language of text submissions) are read back as str
+        column = model_class.__mapper__.columns.get(field.name)
+        return column is not None and isinstance(column.type, SqlEnum) and column.type.enum_class is field.type_
+    # Subclasses of str like AnyUrl are converted by pydantic, so only plain str is trusted
+    return field.type_ is str or issubclass(field.type_, _TRUSTED_FIELD_TYPES)
+
+
+@lru_cache(maxsize=None)
+def _get_untrusted_fields(schema_class: type, model_class: type) -> Tuple[ModelField, ...]:
+    """Fields of the schema class that are validated even for trusted data, e.g. nested schemas and URLs."""
+    return tuple(field for field in schema_class.__fields__.values() if not _is_trusted_field(field, model_class))
+
+
 class Schema(BaseModel, abc.ABC):
     @classmethod
     def get_model_class(cls) -> type:
-        # The model class has the same name as myself, but with a "DB" prefix.
-        # We can import it from athena.models
-        # and then use getattr to get the class from the module.
-        model_module = importlib.import_module("athena.models")
-        model_class_name = "DB" + cls.__name__
-        return getattr(model_module, model_class_name)
+        model_class = _model_classes.get(cls)
+        if model_class is None:
+            # The model class has the same name as myself, but with a "DB" prefix.
+            # We can import it from athena.models
+            # and then use getattr to get the class from the module.
+            model_module = importlib.import_module("athena.models")
+            model_class = _model_classes[cls] = getattr(model_module, "DB" + cls.__name__)
+        return model_class
+
+    @classmethod
+    def from_trusted_orm(cls, obj):
+        """
+        Like `from_orm`, but without validating the fields that the database already returns in the right type.
+        Only use this for data that was validated before it was stored, like the models that Athena reads back from
+        the database.
+        """
+        values = {}
+        for name in cls.__fields__:
+            value = getattr(obj, name, _MISSING)
+            if value is not _MISSING:
+                values[name] = value
+        for field in _get_untrusted_fields(cls, type(obj)):
+            if field.name in values:
+                values[field.name], errors = field.validate(values[field.name], values, loc=field.name, cls=cls)
+                if errors:
+                    raise ValidationError([errors], cls)
+        return cls.construct(**values)
 
     def to_model(self):
         model_class = type(self).get_model_class()
@@ -32,4 +86,4 @@ class Schema(BaseModel, abc.ABC):
     class Config:
         # Allow camelCase field names in the API (converted to snake_case)
         alias_generator = to_camel
-        allow_population_by_field_name = True
\ No newline at end of file
+        allow_population_by_field_name = True
@@ -1,3 +1,4 @@
 from .feedback_storage import *
 from .submission_storage import *
 from .exercise_storage import *
+from .async_storage import *
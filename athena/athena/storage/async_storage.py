@@ -0,0 +1,64 @@
+"""
+Async variants of the storage functions, for use in async code like the endpoint decorators.
+
+They run the synchronous storage functions with `run_in_db_async`, so they do not block the event loop:
+On the async engine if ASYNC_DATABASE_URL is set, otherwise in the threadpool.
+Functions returning an iterable return a list instead.
+"""
+from functools import wraps
+from typing import Callable
+
+from athena.database import run_in_db_async
+from .exercise_storage import get_stored_exercises, get_stored_exercise_meta, store_exercises, store_exercise
+from .submission_storage import count_stored_submissions, get_stored_submissions, get_stored_submission_meta, \
+    get_stored_submission_metas, store_submissions, store_submission
+from .feedback_storage import get_stored_feedback, get_stored_feedback_meta, get_stored_feedback_metas, \
+    store_feedback, store_feedbacks, get_stored_feedback_suggestions, store_feedback_suggestions, \
+    store_feedback_suggestion
+
+
+def _async_variant(func: Callable, returns_iterable: bool = False) -> Callable:
+    """Create an async variant of the given storage function."""
+    def call(*args, **kwargs):
+        result = func(*args, **kwargs)
+        if returns_iterable:
+            return list(result)
+        return result
+
+    @wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_in_db_async(call, *args, **kwargs)
+
+    wrapper.__name__ = wrapper.__qualname__ = func.__name__ + "_async"
+    return wrapper
+
+
+get_stored_exercises_async = _async_variant(get_stored_exercises, returns_iterable=True)
+get_stored_exercise_meta_async = _async_variant(get_stored_exercise_meta)
+store_exercises_async = _async_variant(store_exercises)
+store_exercise_async = _async_variant(store_exercise)
+
+count_stored_submissions_async = _async_variant(count_stored_submissions)
+get_stored_submissions_async = _async_variant(get_stored_submissions, returns_iterable=True)
+get_stored_submission_meta_async = _async_variant(get_stored_submission_meta)
+get_stored_submission_metas_async = _async_variant(get_stored_submission_metas)
+store_submissions_async = _async_variant(store_submissions)
+store_submission_async = _async_variant(store_submission)
+
+get_stored_feedback_async = _async_variant(get_stored_feedback, returns_iterable=True)
+get_stored_feedback_meta_async = _async_variant(get_stored_feedback_meta)
+get_stored_feedback_metas_async = _async_variant(get_stored_feedback_metas)
+store_feedback_async = _async_variant(store_feedback)
+store_feedbacks_async = _async_variant(store_feedbacks)
+get_stored_feedback_suggestions_async = _async_variant(get_stored_feedback_suggestions, returns_iterable=True)
+store_feedback_suggestions_async = _async_variant(store_feedback_suggestions)
+store_feedback_suggestion_async = _async_variant(store_feedback_suggestion)
+
+__all__ = [
+    "get_stored_exercises_async", "get_stored_exercise_meta_async", "store_exercises_async", "store_exercise_async",
+    "count_stored_submissions_async", "get_stored_submissions_async", "get_stored_submission_meta_async",
+    "get_stored_submission_metas_async", "store_submissions_async", "store_submission_async",
+    "get_stored_feedback_async", "get_stored_feedback_meta_async", "get_stored_feedback_metas_async",
+    "store_feedback_async", "store_feedbacks_async", "get_stored_feedback_suggestions_async",
+    "store_feedback_suggestions_async", "store_feedback_suggestion_async",
+]
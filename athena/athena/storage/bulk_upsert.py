@@ -0,0 +1,191 @@
+"""
+Bulk upsert and insert of models, used by the storage functions.
+
+`db.merge()` runs a SELECT by primary key for every single row before writing it, which adds up to thousands of
+round trips when the LMS sends all submissions of an exercise at once.
+Instead, we use the native `INSERT ... ON CONFLICT DO UPDATE` of PostgreSQL and SQLite here.
+Very large batches on PostgreSQL are loaded with `COPY` into a temporary table first.
+Other dialects fall back to `db.merge()`.
+
+Like with the ORM, None values of columns with a default (e.g. `default=datetime.utcnow` or a `server_default`) are
+left out of the statement, so new rows get the default and existing rows keep their value on conflict. Rows with
+different columns are written with one statement per set of columns.
+"""
+import io
+from typing import Any, Dict, List, Sequence, Tuple
+
+from sqlalchemy import Table, inspect, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+# Batches with at least this many rows are loaded with COPY on PostgreSQL
+COPY_THRESHOLD = 5000
+
+
+def bulk_upsert(db: Session, models: Sequence[Any]):
+    """
+    Insert or update the given models, all at once. Models with the same primary key are overwritten.
+    If the same primary key occurs several times in the models, the last occurrence wins (like with `db.merge()`).
+    For joined table inheritance (e.g. exercises), the base table is written before the subclass table.
+    This does not commit the session.
+    """
+    if not models:
+        return
+
+    dialect = db.get_bind().dialect
+    dialect_name = dialect.name
+    if dialect_name not in ("postgresql", "sqlite"):
+        for model in models:
+            db.merge(model)
+        return
+    # COPY needs the psycopg2 cursor (not available with the async drivers)
+    use_copy = dialect_name == "postgresql" and dialect.driver == "psycopg2"
+
+    # Group by model class, because each class can map to different tables
+    models_by_class: Dict[type, List[Any]] = {}
+    for model in models:
+        models_by_class.setdefault(type(model), []).append(model)
+
+    for model_cls, class_models in models_by_class.items():
+        mapper = inspect(model_cls)
+        for table in mapper.tables:
+            # ON CONFLICT DO UPDATE cannot affect the same row twice in one statement on PostgreSQL
+            rows = _deduplicate_rows(table, _get_rows(mapper, table, class_models))
+            for column_names, group_rows in _group_rows_by_columns(rows).items():
+                # COPY cannot apply the Python defaults of left out columns
+                if use_copy and len(group_rows) >= COPY_THRESHOLD and not any(
+                        column.default is not None for column in table.columns if column.name not in column_names):
+                    _copy_upsert(db, table, column_names, group_rows)
+                else:
+                    _insert_upsert(db, dialect_name, table, column_names, group_rows)
+
+
+def bulk_insert(db: Session, models: Sequence[Any]):
+    """
+    Insert the given new models (without primary key), all at once, and assign the generated primary keys to them.
+    Uses a single `INSERT ... RETURNING` statement on PostgreSQL and SQLite, so no flush per row is needed.
+    All models have to be of the same class, mapped to a single table.
+    This does not commit the session.
+    """
+    if not models:
+        return
+
+    mapper = inspect(type(models[0]))
+    dialect_name = db.get_bind().dialect.name
+    if dialect_name not in ("postgresql", "sqlite") or len(mapper.tables) != 1:
+        for model in models:
+            db.add(model)
+        db.flush()  # Ensure the IDs are generated now
+        return
+
+    table = mapper.local_table
+    primary_key = table.primary_key.columns[0]
+    primary_key_attribute = mapper.get_property_by_column(primary_key).key
+    rows = _get_rows(mapper, table, models, exclude_columns=[primary_key])
+    models_by_row_id = {id(row): model for row, model in zip(rows, models)}
+    for group_rows in _group_rows_by_columns(rows).values():
+        statement = table.insert().returning(primary_key, sort_by_parameter_order=True)
+        generated_ids = db.execute(statement, group_rows).scalars().all()
+        for row, generated_id in zip(group_rows, generated_ids):
+            setattr(models_by_row_id[id(row)], primary_key_attribute, generated_id)
+
+
+def _get_rows(mapper, table: Table, models: Sequence[Any], exclude_columns: Sequence[Any] = ()) -> List[Dict[str, Any]]:
+    """
+    Get the column values of the given table for each model, keyed by column name.
+    None values of columns with a default are left out, so that the default (of SQLAlchemy or the database) applies.
+    """
+    columns = [
+        (column, mapper.get_property_by_column(column).key)
+        for column in table.columns if column not in exclude_columns
+    ]
+    rows = []
+    for model in models:
+        row = {}
+        for column, key in columns:
+            value = getattr(model, key)
+            if value is None and (column.default is not None or column.server_default is not None):
+                continue
+            row[column.name] = value
+        rows.append(row)
+    return rows
+
+
+def _group_rows_by_columns(rows: List[Dict[str, Any]]) -> Dict[Tuple[str, ...], List[Dict[str, Any]]]:
+    """Group the rows by their columns, in order, because an executemany statement needs the same columns in all rows."""
+    rows_by_columns: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+    for row in rows:
+        rows_by_columns.setdefault(tuple(row), []).append(row)
+    return rows_by_columns
+
+
+def _deduplicate_rows(table: Table, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Keep only the last row for each primary key."""
+    primary_keys = [column.name for column in table.primary_key.columns]
+    rows_by_primary_key = {tuple(row[key] for key in primary_keys): row for row in rows}
+    if len(rows_by_primary_key) == len(rows):
+        return rows
+    return list(rows_by_primary_key.values())
+
+
+def _insert_upsert(
+        db: Session, dialect_name: str, table: Table, column_names: Sequence[str], rows: List[Dict[str, Any]]
+):
+    """Upsert with a single executemany `INSERT ... ON CONFLICT DO UPDATE` statement, of the given columns only."""
+    insert = postgresql.insert if dialect_name == "postgresql" else sqlite.insert
+    statement = insert(table)
+    primary_keys = [column.name for column in table.primary_key.columns]
+    updates = {column.name: statement.excluded[column.name] for column in table.columns
+               if not column.primary_key and column.name in column_names}
+    if updates:
+        statement = statement.on_conflict_do_update(index_elements=primary_keys, set_=updates)
+    else:
+        statement = statement.on_conflict_do_nothing(index_elements=primary_keys)
+    db.execute(statement, rows)
+
+
+def _copy_upsert(db: Session, table: Table, column_names: Sequence[str], rows: List[Dict[str, Any]]):
+    """
+    Upsert by copying all rows into a temporary table and merging it into the target table in one statement,
+    of the given columns only.
+    """
+    dialect = db.get_bind().dialect
+    columns = [column for column in table.columns if column.name in column_names]
+    processors = [column.type.bind_processor(dialect) for column in columns]
+
+    buffer = io.StringIO()
+    for row in rows:
+        values = []
+        for column, processor in zip(columns, processors):
+            value = row[column.name]
+            if processor is not None and value is not None:
+                value = processor(value)
+            values.append(_to_csv_field(value))
+        buffer.write(",".join(values))
+        buffer.write("\n")
+    buffer.seek(0)
+
+    temporary_table = f"tmp_upsert_{table.name}"
+    column_list = ", ".join(f'"{column.name}"' for column in columns)
+    primary_keys = ", ".join(f'"{column.name}"' for column in table.primary_key.columns)
+    updates = ", ".join(f'"{column.name}" = EXCLUDED."{column.name}"' for column in columns if not column.primary_key)
+    on_conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+
+    db.execute(text(f'CREATE TEMPORARY TABLE "{temporary_table}" (LIKE "{table.name}" INCLUDING DEFAULTS)'))
+    cursor = db.connection().connection.cursor()
+    try:
+        cursor.copy_expert(f'COPY "{temporary_table}" ({column_list}) FROM STDIN WITH (FORMAT csv)', buffer)
+    finally:
+        cursor.close()
+    db.execute(text(
+        f'INSERT INTO "{table.name}" ({column_list}) SELECT {column_list} FROM "{temporary_table}" '
+        f'ON CONFLICT ({primary_keys}) {on_conflict}'
+    ))
+    db.execute(text(f'DROP TABLE "{temporary_table}"'))
+
+
+def _to_csv_field(value: Any) -> str:
+    """Format a value for COPY in CSV format: NULL is an unquoted empty field, everything else is quoted."""
+    if value is None:
+        return ""
+    return '"' + str(value).replace('"', '""') + '"'
@@ -3,6 +3,7 @@ from typing import List, Iterable, Optional, Type
 from athena.contextvars import get_lms_url
 from athena.database import get_db
 from athena.schemas import Exercise
+from .bulk_upsert import bulk_upsert
 
 
 def get_stored_exercises(exercise_cls: Type[Exercise], lms_url: Optional[str] = None, only_ids: Optional[List[int]] = None) -> \
@@ -37,16 +38,19 @@ def get_stored_exercise_meta(exercise: Exercise, lms_url: Optional[str] = None,
 
 
 def store_exercises(exercises: List[Exercise], lms_url: Optional[str] = None):
-    """Stores the given exercises, all at once."""
+    """Stores the given exercises, all at once (as a single bulk upsert)."""
 
     if lms_url is None:
         lms_url = get_lms_url()
 
+    exercise_models = []
+    for e in exercises:
+        exercise_model = e.to_model()
+        exercise_model.lms_url = lms_url
+        exercise_models.append(exercise_model)
+
     with get_db() as db:
-        for e in exercises:
-            exercise_model = e.to_model()
-            exercise_model.lms_url = lms_url
-            db.merge(exercise_model)
+        bulk_upsert(db, exercise_models)
         db.commit()
 
 
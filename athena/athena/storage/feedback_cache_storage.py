@@ -0,0 +1,114 @@
+"""
+Result cache for feedback providers (see `feedback_provider(cache=True)`).
+
+Entries are keyed by a hash of everything the feedback provider gets as input, so a changed exercise, submission or
+module config never returns outdated suggestions. Entries expire after FEEDBACK_CACHE_TTL_SECONDS, and only the
+FEEDBACK_CACHE_MAX_ENTRIES most recently used entries are kept: expired and least recently used entries are evicted
+every FEEDBACK_CACHE_EVICTION_INTERVAL_SECONDS (see `evict_cached_feedback_suggestions`), not on every write. The last use of an entry is only recorded with a
+resolution of LAST_USED_RESOLUTION_SECONDS, so that most cache hits do not write to the database.
+"""
+import hashlib
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel
+from sqlalchemy import delete, select
+
+from athena import env
+from athena.contextvars import get_lms_url
+from athena.database import get_db
+from athena.models import DBFeedbackCacheEntry
+from athena.schemas import Exercise, Submission, Feedback
+from .bulk_upsert import bulk_upsert
+
+# last_used_at is only updated once it is older than this, which is precise enough for the LRU eviction
+LAST_USED_RESOLUTION_SECONDS = 60 * 60
+
+
+def get_feedback_cache_key(
+        exercise: Exercise,
+        submission: Submission,
+        is_graded: Optional[bool] = None,
+        module_config: Optional[BaseModel] = None,
+        lms_url: Optional[str] = None,
+) -> str:
+    """Returns the cache key for the given feedback provider inputs.
+    The metadata is not part of the key, because modules update it themselves (e.g. when receiving submissions)."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    content = {
+        "lms_url": lms_url,
+        "exercise": json.loads(exercise.json(exclude={"meta"})),
+        "submission": json.loads(submission.json(exclude={"meta"})),
+        "is_graded": is_graded,
+        "module_config": json.loads(module_config.json()) if module_config is not None else None,
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+def get_cached_feedback_suggestions(keys: List[str]) -> Dict[str, List[dict]]:
+    """Returns the cached feedback suggestions for the given cache keys, in a single query.
+    Keys without an entry that is still valid are missing from the result."""
+
+    if not keys:
+        return {}
+
+    now = datetime.utcnow()
+    with get_db() as db:
+        entries = db.query(DBFeedbackCacheEntry).filter(
+            DBFeedbackCacheEntry.key.in_(keys),
+            DBFeedbackCacheEntry.created_at >= now - timedelta(seconds=env.FEEDBACK_CACHE_TTL_SECONDS),
+        ).all()
+        last_used_before = now - timedelta(seconds=LAST_USED_RESOLUTION_SECONDS)
+        outdated_keys = [entry.key for entry in entries if entry.last_used_at < last_used_before]
+        if outdated_keys:
+            db.query(DBFeedbackCacheEntry).filter(DBFeedbackCacheEntry.key.in_(outdated_keys)).update(
+                {DBFeedbackCacheEntry.last_used_at: now}, synchronize_session=False)
+            db.commit()
+        return {entry.key: entry.feedbacks for entry in entries}  # type: ignore
+
+
+def store_cached_feedback_suggestions(
+        exercise_id: int, feedbacks_by_key: Dict[str, List[Feedback]], lms_url: Optional[str] = None
+):
+    """Stores the given feedback suggestions in the cache, all at once."""
+
+    if not feedbacks_by_key:
+        return
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    now = datetime.utcnow()
+    with get_db() as db:
+        bulk_upsert(db, [
+            DBFeedbackCacheEntry(
+                key=key,
+                lms_url=lms_url,
+                exercise_id=exercise_id,
+                feedbacks=jsonable_encoder(feedbacks),
+                created_at=now,
+                last_used_at=now,
+            )
+            for key, feedbacks in feedbacks_by_key.items()
+        ])
+        db.commit()
+
+
+def evict_cached_feedback_suggestions():
+    """Deletes the expired and the least recently used entries of the cache (of all LMS instances)."""
+
+    now = datetime.utcnow()
+    with get_db() as db:
+        db.execute(delete(DBFeedbackCacheEntry).where(
+            DBFeedbackCacheEntry.created_at < now - timedelta(seconds=env.FEEDBACK_CACHE_TTL_SECONDS)
+        ))
+        least_recently_used = select(DBFeedbackCacheEntry.key).order_by(
+            DBFeedbackCacheEntry.last_used_at.desc()
+        ).offset(env.FEEDBACK_CACHE_MAX_ENTRIES)
+        db.execute(delete(DBFeedbackCacheEntry).where(DBFeedbackCacheEntry.key.in_(least_recently_used)))
+        db.commit()
@@ -1,27 +1,41 @@
-from typing import Iterable, Union, Type, Optional, List
+from typing import Any, Dict, Iterable, Union, Type, Optional, List
+
+from sqlalchemy import delete, exists
 
 from athena.contextvars import get_lms_url
 from athena.database import get_db
+from athena.models.meta_fields import split_promoted_meta, get_promoted_side_models, get_promoted_metas, \
+    filter_by_promoted_meta, get_blob_hash_columns
+from athena.models import DBMetaBlob
 from athena.schemas import Feedback
+from .bulk_upsert import bulk_insert, bulk_upsert
+from .stream_schemas import stream_schemas
 
 
 def get_stored_feedback(
-        feedback_cls: Type[Feedback], exercise_id: int, submission_id: Union[int, None], lms_url: Optional[str] = None
+        feedback_cls: Type[Feedback], exercise_id: int, submission_id: Union[int, None], lms_url: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None
 ) -> Iterable[Feedback]:
     """
-    Returns a list of feedbacks for the given exercise in the given submission.
+    Returns the feedbacks for the given exercise in the given submission, streamed from the database in chunks.
     If submission_id is None, returns all feedbacks for the given exercise.
+    If meta is given, only returns feedbacks with these values of promoted meta fields (see `promote_meta_fields`).
     """
 
     if lms_url is None:
         lms_url = get_lms_url()
 
     db_feedback_cls = feedback_cls.get_model_class()
-    with get_db() as db:
+
+    def build_query(db):
         query = db.query(db_feedback_cls).filter_by(exercise_id=exercise_id, is_suggestion=0, lms_url=lms_url)
         if submission_id is not None:
             query = query.filter_by(submission_id=submission_id)
-        return (f.to_schema() for f in query.all())
+        if meta:
+            query = filter_by_promoted_meta(query, db_feedback_cls, meta)
+        return query
+
+    return stream_schemas(build_query)
 
 
 def get_stored_feedback_meta(feedback: Feedback, lms_url: Optional[str] = None) -> Optional[dict]:
@@ -32,8 +46,33 @@ def get_stored_feedback_meta(feedback: Feedback, lms_url: Optional[str] = None)
 
     db_feedback_cls = feedback.__class__.get_model_class()
     with get_db() as db:
-        return db.query(db_feedback_cls.meta).filter_by(id=feedback.id,  # type: ignore
+        meta = db.query(db_feedback_cls.meta).filter_by(id=feedback.id,  # type: ignore
                                                         lms_url=lms_url).scalar()
+        if meta is None:
+            return None
+        return {**meta, **get_promoted_metas(db, db_feedback_cls, [feedback.id]).get(feedback.id, {})}  # type: ignore
+
+
+def get_stored_feedback_metas(
+        feedback_cls: Type[Feedback], feedback_ids: List[int], lms_url: Optional[str] = None
+) -> Dict[int, dict]:
+    """Returns the stored metadata of the given feedbacks, keyed by feedback id, in a single query.
+    Feedbacks that are not stored yet are missing from the result."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    if not feedback_ids:
+        return {}
+
+    db_feedback_cls = feedback_cls.get_model_class()
+    with get_db() as db:
+        query = db.query(db_feedback_cls.id, db_feedback_cls.meta).filter(  # type: ignore
+            db_feedback_cls.id.in_(feedback_ids), db_feedback_cls.lms_url == lms_url)  # type: ignore
+        metas = {feedback_id: meta or {} for feedback_id, meta in query.all()}
+        for feedback_id, promoted_meta in get_promoted_metas(db, db_feedback_cls, list(metas)).items():
+            metas[feedback_id] = {**metas[feedback_id], **promoted_meta}
+        return metas
 
 
 def store_feedback(feedback: Feedback, is_lms_id=False, lms_url: Optional[str] = None) -> Feedback:
@@ -46,43 +85,82 @@ def store_feedback(feedback: Feedback, is_lms_id=False, lms_url: Optional[str] =
     Returns:
         Feedback: The stored feedback with its internal ID assigned.
     """
+    return store_feedbacks([feedback], is_lms_id, lms_url)[0]
+
+
+def store_feedbacks(feedbacks: List[Feedback], is_lms_id=False, lms_url: Optional[str] = None) -> List[Feedback]:
+    """Stores the given LMS feedbacks, all at once.
+
+    LMS IDs are resolved to internal IDs with a single query, existing feedbacks are updated with a single bulk upsert
+    and new feedbacks are inserted with a single `INSERT ... RETURNING` statement.
+
+    Args:
+        feedbacks (List[Feedback]): The feedbacks to store.
+        is_lms_id (bool, optional): Whether the feedbacks' IDs are LMS IDs. Defaults to False.
+        lms_url (str, optional): The URL of the LMS instance that issued the query
+    Returns:
+        List[Feedback]: The stored feedbacks with their internal IDs assigned, in the same order.
+    """
 
     if lms_url is None:
         lms_url = get_lms_url()
 
-    db_feedback_cls = feedback.__class__.get_model_class()
+    if not feedbacks:
+        return []
+
+    db_feedback_cls = feedbacks[0].__class__.get_model_class()
     with get_db() as db:
-        lms_id = None
+        internal_ids = {}
         if is_lms_id:
-            lms_id = feedback.id
-            internal_id = db.query(db_feedback_cls.id).filter_by(lms_id=lms_id,  # type: ignore
-                                                                 lms_url=lms_url).scalar()
-            feedback.id = internal_id
-
-        stored_feedback_model = db.merge(feedback.to_model(lms_id=lms_id, lms_url=lms_url))
+            lms_ids = [f.id for f in feedbacks if f.id is not None]
+            internal_ids = dict(
+                db.query(db_feedback_cls.lms_id, db_feedback_cls.id)  # type: ignore
+                .filter(db_feedback_cls.lms_id.in_(lms_ids), db_feedback_cls.lms_url == lms_url)  # type: ignore
+                .all()
+            )
+
+        feedback_models = []
+        for feedback in feedbacks:
+            if is_lms_id:
+                feedback_model = feedback.to_model(lms_id=feedback.id, lms_url=lms_url)
+                feedback_model.id = internal_ids.get(feedback.id)
+            else:
+                feedback_model = feedback.to_model(lms_url=lms_url)
+            feedback_models.append(feedback_model)
+
+        _store_feedback_models(db, feedback_models)
+        # Before the commit expires the models that were added to the session (see `bulk_insert`)
+        stored_feedbacks = [feedback_model.to_schema() for feedback_model in feedback_models]
         db.commit()
-        return stored_feedback_model.to_schema()
+    return stored_feedbacks
 
 
 def get_stored_feedback_suggestions(
-        feedback_cls: Type[Feedback], exercise_id: int, submission_id: int, lms_url: Optional[str] = None
+        feedback_cls: Type[Feedback], exercise_id: int, submission_id: int, lms_url: Optional[str] = None,
+        meta: Optional[Dict[str, Any]] = None
 ) -> Iterable[Feedback]:
-    """Returns a list of feedback suggestions for the given exercise in the given submission."""
+    """Returns the feedback suggestions for the given exercise in the given submission, streamed from the database in chunks.
+    If meta is given, only returns suggestions with these values of promoted meta fields (see `promote_meta_fields`)."""
 
     if lms_url is None:
         lms_url = get_lms_url()
 
     db_feedback_cls = feedback_cls.get_model_class()
-    with get_db() as db:
+
+    def build_query(db):
         query = db.query(db_feedback_cls).filter_by(exercise_id=exercise_id, is_suggestion=True,
                                                     lms_url=lms_url)
         if submission_id is not None:
             query = query.filter_by(submission_id=submission_id)
-        return (f.to_schema() for f in query.all())
+        if meta:
+            query = filter_by_promoted_meta(query, db_feedback_cls, meta)
+        return query
+
+    return stream_schemas(build_query)
 
 
 def store_feedback_suggestions(feedbacks: List[Feedback], lms_url: Optional[str] = None) -> List[Feedback]:
-    """Stores the given feedbacks as a suggestions.
+    """Stores the given feedbacks as a suggestions, all at once.
 
     Returns:
         List[Feedback]: The stored feedback suggestions with their internal IDs assigned.
@@ -91,14 +169,16 @@ def store_feedback_suggestions(feedbacks: List[Feedback], lms_url: Optional[str]
     if lms_url is None:
         lms_url = get_lms_url()
 
-    stored_feedbacks: List[Feedback] = []
+    feedback_models = []
+    for feedback in feedbacks:
+        feedback_model = feedback.to_model(is_suggestion=True)
+        feedback_model.lms_url = lms_url
+        feedback_models.append(feedback_model)
+
     with get_db() as db:
-        for feedback in feedbacks:
-            feedback_model = feedback.to_model(is_suggestion=True)
-            feedback_model.lms_url = lms_url
-            feedback_model = db.merge(feedback_model)
-            db.flush()  # Ensure the ID is generated now
-            stored_feedbacks.append(feedback_model.to_schema())
+        _store_feedback_models(db, feedback_models)
+        # In the session, because the models can be added to it (see `bulk_insert`)
+        stored_feedbacks = [feedback_model.to_schema() for feedback_model in feedback_models]
         db.commit()
     return stored_feedbacks
 
@@ -106,3 +186,38 @@ def store_feedback_suggestions(feedbacks: List[Feedback], lms_url: Optional[str]
 def store_feedback_suggestion(feedback: Feedback, lms_url: Optional[str] = None):
     """Stores the given feedback as a suggestion."""
     store_feedback_suggestions([feedback], lms_url)
+
+
+def _store_feedback_models(db, feedback_models: list):
+    """Upserts feedback models that already have an ID and inserts the others, assigning their generated IDs.
+    Promoted meta fields (see `athena.models.meta_fields`) are written to their side table, new blobs only once."""
+    models_by_class: dict = {}
+    for feedback_model in feedback_models:
+        split_promoted_meta(feedback_model)
+        models_by_class.setdefault(type(feedback_model), []).append(feedback_model)
+    for class_models in models_by_class.values():
+        bulk_upsert(db, [m for m in class_models if m.id is not None])
+        bulk_insert(db, [m for m in class_models if m.id is None])
+
+    side_models, blobs = get_promoted_side_models(feedback_models)
+    if blobs:
+        existing_hashes = {blob_hash for (blob_hash,) in db.query(DBMetaBlob.hash).filter(  # type: ignore
+            DBMetaBlob.hash.in_([blob.hash for blob in blobs]))}
+        bulk_upsert(db, [blob for blob in blobs if blob.hash not in existing_hashes])
+    bulk_upsert(db, side_models)
+
+
+def delete_unreferenced_meta_blobs():
+    """Deletes the blobs of promoted meta fields (see `athena.models.meta_fields`) that no feedback references anymore.
+    Blobs are shared by all feedback with the same value, so they are not deleted together with the feedback."""
+
+    blob_hash_columns = get_blob_hash_columns()
+    if not blob_hash_columns:
+        return
+
+    with get_db() as db:
+        statement = delete(DBMetaBlob).execution_options(synchronize_session=False)
+        for blob_hash_column in blob_hash_columns:
+            statement = statement.where(~exists().where(blob_hash_column == DBMetaBlob.hash))
+        db.execute(statement)
+        db.commit()
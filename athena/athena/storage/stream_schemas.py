@@ -0,0 +1,34 @@
+"""
+Streaming iteration over stored models, used by the storage functions that return many results (e.g. all submissions).
+
+The IDs of the results are fetched first, then the models are loaded and converted to schemas in chunks of
+STREAM_CHUNK_SIZE, each chunk in its own short session. So memory stays flat even for exercises with many thousand
+submissions, and no session (connection and transaction) stays open while the caller works on the results between
+the chunks, e.g. on CPU-heavy similarity computations of the programming modules.
+"""
+from typing import Any, Callable, Iterator
+
+from sqlalchemy.orm import Query, Session
+
+from athena.database import get_db
+
+# Number of rows loaded from the database at once
+STREAM_CHUNK_SIZE = 500
+
+
+def stream_schemas(build_query: Callable[[Session], Query]) -> Iterator[Any]:
+    """
+    Yield the results of the query built by build_query (of one model class with an `id`), converted to schemas.
+    The query only runs when iterating, build_query is called again for each chunk.
+    Results that are deleted while iterating are skipped.
+    """
+    with get_db() as db:
+        query = build_query(db)
+        model_cls = query.column_descriptions[0]["entity"]
+        ids = [row[0] for row in query.with_entities(model_cls.id)]
+
+    for start in range(0, len(ids), STREAM_CHUNK_SIZE):
+        with get_db() as db:
+            models = build_query(db).filter(model_cls.id.in_(ids[start:start + STREAM_CHUNK_SIZE])).all()
+            schemas = [model.to_schema() for model in models]
+        yield from schemas
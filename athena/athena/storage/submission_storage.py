@@ -1,8 +1,10 @@
-from typing import List, Iterable, Union, Type, Optional
+from typing import Dict, List, Iterable, Union, Type, Optional
 
 from athena.contextvars import get_lms_url
 from athena.database import get_db
 from athena.schemas import Submission
+from .bulk_upsert import bulk_upsert
+from .stream_schemas import stream_schemas
 
 
 def count_stored_submissions(
@@ -24,7 +26,7 @@ def get_stored_submissions(
         lms_url: Optional[str] = None
 ) -> Iterable[Submission]:
     """
-    Returns a list of submissions for the given exercise and submission ids.
+    Returns the submissions for the given exercise and submission ids, streamed from the database in chunks.
     If only_ids is None, returns all submissions for the given exercise.
     """
 
@@ -32,11 +34,14 @@ def get_stored_submissions(
         lms_url = get_lms_url()
 
     db_submission_cls = submission_cls.get_model_class()
-    with get_db() as db:
+
+    def build_query(db):
         query = db.query(db_submission_cls).filter_by(exercise_id=exercise_id, lms_url=lms_url)
         if only_ids is not None:
             query = query.filter(db_submission_cls.id.in_(only_ids))  # type: ignore
-        return (s.to_schema() for s in query.all())
+        return query
+
+    return stream_schemas(build_query)
 
 
 def get_stored_submission_meta(submission: Submission, lms_url: Optional[str] = None) -> Optional[dict]:
@@ -51,17 +56,39 @@ def get_stored_submission_meta(submission: Submission, lms_url: Optional[str] =
                                                           lms_url=lms_url).scalar()
 
 
+def get_stored_submission_metas(
+        submission_cls: Type[Submission], submission_ids: List[int], lms_url: Optional[str] = None
+) -> Dict[int, dict]:
+    """Returns the stored metadata of the given submissions, keyed by submission id, in a single query.
+    Submissions that are not stored yet are missing from the result."""
+
+    if lms_url is None:
+        lms_url = get_lms_url()
+
+    if not submission_ids:
+        return {}
+
+    db_submission_cls = submission_cls.get_model_class()
+    with get_db() as db:
+        query = db.query(db_submission_cls.id, db_submission_cls.meta).filter(  # type: ignore
+            db_submission_cls.id.in_(submission_ids), db_submission_cls.lms_url == lms_url)  # type: ignore
+        return {submission_id: meta or {} for submission_id, meta in query.all()}
+
+
 def store_submissions(submissions: List[Submission], lms_url: Optional[str] = None):
-    """Stores the given submissions, all at once."""
+    """Stores the given submissions, all at once (as a single bulk upsert)."""
 
     if lms_url is None:
         lms_url = get_lms_url()
 
+    submission_models = []
+    for s in submissions:
+        submission_model = s.to_model()
+        submission_model.lms_url = lms_url
+        submission_models.append(submission_model)
+
     with get_db() as db:
-        for s in submissions:
-            submission_model = s.to_model()
-            submission_model.lms_url = lms_url
-            db.merge(submission_model)
+        bulk_upsert(db, submission_models)
         db.commit()
 
 
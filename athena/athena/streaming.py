@@ -0,0 +1,73 @@
+"""
+Streaming responses for endpoints that produce their results in chunks, e.g. feedback providers that are async generators.
+
+The client chooses the format with the Accept header:
+- `application/x-ndjson`: one JSON object per line
+- `text/event-stream`: server-sent events
+
+Every chunk is sent as soon as it is available, followed by the metadata of the request (see `athena.metadata`) at the end.
+
+Example NDJSON response:
+    {"data": [{"title": "Feedback for file A", ...}]}
+    {"data": [{"title": "Feedback for file B", ...}]}
+    {"meta": {}}
+
+The same as server-sent events:
+    event: data
+    data: [{"title": "Feedback for file A", ...}]
+
+    event: data
+    data: [{"title": "Feedback for file B", ...}]
+
+    event: meta
+    data: {}
+
+If an error occurs while streaming, an `{"error": "..."}` line (or `error` event) is sent before the metadata.
+"""
+import json
+from typing import Any, AsyncIterator, Optional
+
+from fastapi import Request
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import StreamingResponse
+
+from athena.logger import logger
+from athena.metadata import emit_timings, get_meta
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+SSE_MEDIA_TYPE = "text/event-stream"
+
+
+def get_streaming_media_type(request: Request) -> Optional[str]:
+    """Get the streaming media type that the client accepts, or None if the client does not want a streaming response."""
+    accept = request.headers.get("accept", "")
+    for media_type in (NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE):
+        if media_type in accept:
+            return media_type
+    return None
+
+
+def _format_event(media_type: str, event: str, value: Any) -> str:
+    if media_type == SSE_MEDIA_TYPE:
+        return f"event: {event}\ndata: {json.dumps(value)}\n\n"
+    return json.dumps({event: value}) + "\n"
+
+
+def stream_with_meta(chunks: AsyncIterator[Any], media_type: str) -> StreamingResponse:
+    """
+    Stream the given chunks to the client in the given media type, followed by the metadata of the request.
+    Endpoints decorated with `@with_meta` can return this response directly.
+    """
+    async def body():
+        try:
+            async for chunk in chunks:
+                yield _format_event(media_type, "data", jsonable_encoder(chunk))
+        except Exception as exc:  # pylint: disable=broad-except
+            # The status code is already sent, so the error has to be part of the stream
+            logger.exception("Error while streaming the response")
+            yield _format_event(media_type, "error", str(exc))
+        emit_timings()
+        yield _format_event(media_type, "meta", jsonable_encoder(get_meta()))
+
+    # Disable buffering in reverse proxies (e.g. nginx), otherwise the chunks would only arrive at the end
+    return StreamingResponse(body(), media_type=media_type, headers={"X-Accel-Buffering": "no"})
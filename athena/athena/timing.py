@@ -0,0 +1,163 @@
+"""
+Lightweight timing of where the time of a request goes, returned in the metadata of the request (see `athena.metadata`).
+
+Wrap a block or decorate a (sync or async) function with `timed` to measure it as a span of the current request:
+    with timed("git_diff"):
+        diff = get_diff(...)
+
+    @timed("build_prompt")
+    def build_prompt(...):
+        ...
+
+Spans are nested by the code they run in and spans with the same name under the same parent are added up, so the tree
+stays small even for thousands of calls. The database, `get_repository*`, `predict_and_parse`, the LLM calls and the
+module functions are timed automatically. Endpoints decorated with `@with_meta` return the tree as `timings`:
+    "timings": {
+        "ms": 40012.3,
+        "spans": {
+            "db": {"ms": 35.1, "count": 12},
+            "module.suggest_feedback": {"ms": 39950.2, "spans": {
+                "get_repository": {"ms": 1203.4, "count": 2, "spans": {"get_repository_zip": {"ms": 800.1, "count": 2}}},
+                "predict_and_parse": {"ms": 38500.8, "count": 5, "spans": {"llm_call": {"ms": 38490.2, "count": 5}}}
+            }}
+        }
+    }
+
+If tracing is enabled (see `athena.tracing`), every call of a span is also recorded as a span of the trace.
+
+Calls that run in parallel (e.g. with `asyncio.gather`) add up as well, so the time of a span can be more than the time
+of its parent. Outside of a request (e.g. in background jobs), `timed` does nothing.
+"""
+import contextvars
+import functools
+import inspect
+import time
+from typing import Any, Dict, Optional
+
+from athena import tracing
+
+
+class Span:
+    """Total time, number of calls and child spans of a named span."""
+    __slots__ = ("seconds", "count", "children")
+
+    def __init__(self):
+        self.seconds = 0.0
+        self.count = 0
+        self.children: Dict[str, "Span"] = {}
+
+    def child(self, name: str) -> "Span":
+        span = self.children.get(name)
+        if span is None:
+            span = self.children.setdefault(name, Span())
+        return span
+
+    def add(self, seconds: float):
+        self.seconds += seconds
+        self.count += 1
+
+    def merge(self, other: "Span"):
+        """Add the child spans of the other span (e.g. from a worker process) to my children."""
+        for name, other_child in other.children.items():
+            child = self.child(name)
+            child.seconds += other_child.seconds
+            child.count += other_child.count
+            child.merge(other_child)
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {"ms": round(self.seconds * 1000, 1)}
+        if self.count > 1:
+            result["count"] = self.count
+        if self.children:
+            result["spans"] = {name: child.to_dict() for name, child in list(self.children.items())}
+        return result
+
+
+# The span that new spans are nested in, None outside of requests
+current_span_context: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+# Start of the current request, see `start_timings`
+_request_start_context: contextvars.ContextVar[float] = contextvars.ContextVar("request_start", default=0.0)
+
+
+def start_timings() -> Span:
+    """Start timing a new request (or a call in a worker process). Returns the root span."""
+    root = Span()
+    current_span_context.set(root)
+    _request_start_context.set(time.perf_counter())
+    return root
+
+
+def get_timings() -> Optional[Dict[str, Any]]:
+    """The timings of the current request so far, or None outside of a request."""
+    root = current_span_context.get()
+    if root is None:
+        return None
+    while True:
+        try:
+            root.seconds = time.perf_counter() - _request_start_context.get()
+            return root.to_dict()
+        except RuntimeError:
+            # A span was added by another thread while converting, just try again
+            continue
+
+
+def add_span_time(name: str, seconds: float):
+    """Add already measured time to the span with the given name in the current span."""
+    parent = current_span_context.get()
+    if parent is not None:
+        parent.child(name).add(seconds)
+
+
+class timed:  # pylint: disable=invalid-name
+    """Time a block (`with timed("name"):`) or every call of a function (`@timed("name")`) as a span."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._span: Optional[Span] = None
+        self._token: Optional[contextvars.Token] = None
+        self._start = 0.0
+        self._trace_span: Optional[tracing.Span] = None
+
+    def __enter__(self) -> "timed":
+        self._trace_span = tracing.start_span(self.name)
+        parent = current_span_context.get()
+        if parent is not None:
+            self._span = parent.child(self.name)
+            self._token = current_span_context.set(self._span)
+            self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._span is not None:
+            self._span.add(time.perf_counter() - self._start)
+            current_span_context.reset(self._token)  # type: ignore
+            self._span = self._token = None
+        if self._trace_span is not None:
+            self._trace_span.end(exc_value)
+            self._trace_span = None
+
+    async def __aenter__(self) -> "timed":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        self.__exit__(exc_type, exc_value, traceback)
+
+    @property
+    def span(self) -> Optional[Span]:
+        """The span while timing, None outside of a request."""
+        return self._span
+
+    def __call__(self, func):
+        name = self.name
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with timed(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with timed(name):
+                return func(*args, **kwargs)
+        return wrapper
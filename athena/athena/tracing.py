@@ -0,0 +1,308 @@
+"""
+Distributed tracing with the W3C trace context (https://www.w3.org/TR/trace-context/), so that one slow request of the
+LMS can be followed from the assessment module manager through the module down to the LLM calls.
+
+The `TracingMiddleware` continues the trace of the `traceparent` header of each request (or starts a new one) with a
+server span. The assessment module manager passes its span on to the modules in the `traceparent` header
+(see `get_traceparent`). Within a module, all spans of `athena.timing` (module functions, `get_repository*`,
+`predict_and_parse`, LLM calls, ...) and all database queries are recorded as child spans.
+
+Spans are only recorded if TRACE_EXPORTER is set (see `athena.env`), otherwise the trace context is only passed on:
+- "otlp": sent as OTLP/HTTP JSON to OTEL_EXPORTER_OTLP_TRACES_ENDPOINT, e.g. a local OpenTelemetry collector or Jaeger
+- "file": appended to TRACE_FILE, one JSON span per line
+Spans are exported in batches by a background thread, so exporting does not slow down requests.
+"""
+import atexit
+import json
+import os
+import re
+import secrets
+import threading
+import time
+from contextvars import ContextVar, Token
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from athena import env
+from athena.logger import logger
+
+# Export at least this often, or as soon as this many spans are waiting
+EXPORT_INTERVAL_SECONDS = 5
+EXPORT_BATCH_SIZE = 512
+
+# OTLP span kinds
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+SPAN_KIND_CLIENT = 3
+
+_TRACEPARENT_PATTERN = re.compile(r"^([0-9a-f]{2})-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+
+@dataclass(frozen=True)
+class TraceContext:
+    trace_id: str
+    span_id: str
+    sampled: bool
+
+
+def parse_traceparent(traceparent: Optional[str]) -> Optional[TraceContext]:
+    """Parse a W3C traceparent header value, returns None if it is missing or invalid."""
+    match = _TRACEPARENT_PATTERN.match((traceparent or "").strip().lower())
+    if match is None:
+        return None
+    version, trace_id, span_id, flags = match.groups()
+    if version == "ff" or trace_id == "0" * 32 or span_id == "0" * 16:
+        return None
+    return TraceContext(trace_id=trace_id, span_id=span_id, sampled=bool(int(flags, 16) & 1))
+
+
+def format_traceparent(context: TraceContext) -> str:
+    return f"00-{context.trace_id}-{context.span_id}-{'01' if context.sampled else '00'}"
+
+
+trace_context_var: ContextVar[Optional[TraceContext]] = ContextVar("trace_context", default=None)
+
+
+def get_trace_context() -> Optional[TraceContext]:
+    """The context of the current span, None outside of a trace."""
+    return trace_context_var.get()
+
+
+def get_traceparent() -> Optional[str]:
+    """The traceparent header value to pass the current trace on to another service, None outside of a trace."""
+    context = trace_context_var.get()
+    return format_traceparent(context) if context is not None else None
+
+
+class _SpanExporter:
+    """Collects finished spans and exports them in batches in a background thread."""
+
+    def __init__(self, export: Callable[[List[Dict[str, Any]]], None]):
+        self._export = export
+        self._spans: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._wake_up = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, span: Dict[str, Any]):
+        with self._lock:
+            self._spans.append(span)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="athena-trace-exporter", daemon=True)
+                self._thread.start()
+            if len(self._spans) >= EXPORT_BATCH_SIZE:
+                self._wake_up.set()
+
+    def _run(self):
+        while True:
+            self._wake_up.wait(EXPORT_INTERVAL_SECONDS)
+            self._wake_up.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            spans, self._spans = self._spans, []
+        if not spans:
+            return
+        try:
+            self._export(spans)
+        except Exception:  # pylint: disable=broad-except
+            # Tracing must never break the module
+            logger.warning("Could not export %d trace spans", len(spans), exc_info=True)
+
+
+_service_name = "athena"
+
+
+def set_service_name(service_name: str):
+    """Set the name of the service (module) in exported spans, unless OTEL_SERVICE_NAME is set."""
+    global _service_name  # pylint: disable=global-statement
+    _service_name = service_name
+
+
+def get_service_name() -> str:
+    return env.TRACE_SERVICE_NAME or _service_name
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def _to_otlp_span(span: Dict[str, Any]) -> Dict[str, Any]:
+    otlp_span = {
+        "traceId": span["traceId"],
+        "spanId": span["spanId"],
+        "name": span["name"],
+        "kind": span["kind"],
+        "startTimeUnixNano": str(span["startTimeUnixNano"]),
+        "endTimeUnixNano": str(span["endTimeUnixNano"]),
+        "attributes": [_otlp_attribute(key, value) for key, value in span["attributes"].items()],
+        "status": {"code": 2, "message": span["error"]} if span["error"] else {"code": 0},
+    }
+    if span["parentSpanId"]:
+        otlp_span["parentSpanId"] = span["parentSpanId"]
+    return otlp_span
+
+
+def _export_otlp(spans: List[Dict[str, Any]]):
+    spans_by_service: Dict[str, List[Dict[str, Any]]] = {}
+    for span in spans:
+        spans_by_service.setdefault(span["service"], []).append(_to_otlp_span(span))
+    response = httpx.post(env.TRACE_OTLP_ENDPOINT, json={"resourceSpans": [
+        {
+            "resource": {"attributes": [_otlp_attribute("service.name", service_name)]},
+            "scopeSpans": [{"scope": {"name": "athena"}, "spans": service_spans}],
+        }
+        for service_name, service_spans in spans_by_service.items()
+    ]}, timeout=10)
+    response.raise_for_status()
+
+
+def _export_file(spans: List[Dict[str, Any]]):
+    os.makedirs(os.path.dirname(os.path.abspath(env.TRACE_FILE)), exist_ok=True)
+    with open(env.TRACE_FILE, "a", encoding="utf-8") as file:
+        file.writelines(json.dumps(span) + "\n" for span in spans)
+
+
+def _create_exporter() -> Optional[_SpanExporter]:
+    if not env.TRACE_EXPORTER:
+        return None
+    exports = {"otlp": _export_otlp, "file": _export_file}
+    if env.TRACE_EXPORTER not in exports:
+        raise ValueError(f"Unknown TRACE_EXPORTER {env.TRACE_EXPORTER}, expected one of {', '.join(exports)}")
+    exporter = _SpanExporter(exports[env.TRACE_EXPORTER])
+    atexit.register(exporter.flush)
+    return exporter
+
+
+_exporter = _create_exporter()
+
+
+def is_recording() -> bool:
+    """Whether spans are recorded, i.e. there is an exporter and a current trace that is sampled."""
+    if _exporter is None:
+        return False
+    context = trace_context_var.get()
+    return context is not None and context.sampled
+
+
+class Span:
+    """A recording span, see `start_span`."""
+    __slots__ = ("name", "kind", "context", "parent_span_id", "start_ns", "attributes", "_token")
+
+    def __init__(self, name: str, kind: int, context: TraceContext, parent_span_id: Optional[str],
+                 attributes: Optional[Dict[str, Any]], token: Optional[Token]):
+        self.name = name
+        self.kind = kind
+        self.context = context
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.attributes = attributes or {}
+        self._token = token
+
+    def end(self, error: Optional[BaseException] = None):
+        """End the span and make its parent the current span again."""
+        if self._token is not None:
+            trace_context_var.reset(self._token)
+            self._token = None
+        _export_span(self.name, self.kind, self.context, self.parent_span_id, self.start_ns, time.time_ns(),
+                     self.attributes, error)
+
+
+def _new_context(parent: Optional[TraceContext]) -> TraceContext:
+    trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+    return TraceContext(trace_id=trace_id, span_id=secrets.token_hex(8), sampled=True)
+
+
+def _export_span(name: str, kind: int, context: TraceContext, parent_span_id: Optional[str], start_ns: int,
+                 end_ns: int, attributes: Dict[str, Any], error: Optional[BaseException]):
+    _exporter.add({  # type: ignore
+        "service": get_service_name(),
+        "traceId": context.trace_id,
+        "spanId": context.span_id,
+        "parentSpanId": parent_span_id,
+        "name": name,
+        "kind": kind,
+        "startTimeUnixNano": start_ns,
+        "endTimeUnixNano": end_ns,
+        "attributes": attributes,
+        "error": f"{type(error).__name__}: {error}" if error is not None else None,
+    })
+
+
+def start_span(name: str, kind: int = SPAN_KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None,
+               new_trace: bool = False) -> Optional[Span]:
+    """
+    Start a span as a child of the current span and make it the current span until it ends.
+    Outside of a trace, a new trace is only started if new_trace is True (e.g. for requests, but not for background
+    jobs). Returns None if spans are not recorded (see `is_recording`), then there is nothing to end.
+    """
+    parent = trace_context_var.get()
+    if not (is_recording() or (_exporter is not None and parent is None and new_trace)):
+        return None
+    context = _new_context(parent)
+    token = trace_context_var.set(context)
+    return Span(name, kind, context, parent.span_id if parent is not None else None, attributes, token)
+
+
+def record_span(name: str, start_ns: int, end_ns: int, kind: int = SPAN_KIND_INTERNAL,
+                attributes: Optional[Dict[str, Any]] = None):
+    """Record an already finished span (e.g. a database query) as a child of the current span."""
+    if not is_recording():
+        return
+    parent = trace_context_var.get()
+    _export_span(name, kind, _new_context(parent), parent.span_id if parent is not None else None, start_ns, end_ns,
+                 attributes or {}, None)
+
+
+def continue_trace(traceparent: Optional[str]):
+    """Make the span of the given traceparent header value (e.g. from another service) the current span."""
+    trace_context_var.set(parse_traceparent(traceparent))
+
+
+class TracingMiddleware:
+    """Continues the trace of the traceparent header of each request with a server span for the request."""
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        continue_trace(Headers(scope=scope).get("traceparent"))
+        span = start_span(f"{scope['method']} {scope['path']}", SPAN_KIND_SERVER,
+                          {"http.request.method": scope["method"], "url.path": scope["path"]}, new_trace=True)
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_with_status(message: Message):
+            if message["type"] == "http.response.start":
+                span.attributes["http.response.status_code"] = message["status"]
+            await send(message)
+
+        error = None
+        try:
+            await self.app(scope, receive, send_with_status)
+        except Exception as exc:
+            error = exc
+            raise
+        finally:
+            # Name the span by the route template like other tracing libraries, e.g. "POST /feedback_suggestions"
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path}"
+                span.attributes["http.route"] = route.path
+            span.end(error)
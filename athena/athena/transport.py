@@ -0,0 +1,216 @@
+"""
+Fast JSON serialization and compression of the HTTP transport between the assessment module manager and the modules,
+e.g. for /submissions requests with tens of MB of JSON.
+
+- JSON: requests are parsed and responses are rendered with orjson if it is installed, otherwise with the standard
+  library (`FastRoute` and `FastJSONResponse`).
+- Responses are compressed with zstd (if zstandard is installed) or gzip, depending on the Accept-Encoding header of
+  the client (`CompressionMiddleware`). Streaming responses (see `athena.streaming`) are not compressed, so that every
+  chunk arrives right away.
+- Requests can be compressed as well (Content-Encoding header). There is no Accept-Encoding header for requests, so
+  the server announces the encodings that it accepts in the Accept-Encoding header of its responses (RFC 7694),
+  and the assessment module manager only compresses requests to modules once it knows them.
+
+orjson and zstandard are dependencies of athena. The standard library fallbacks are only for environments where they
+are missing, e.g. modules whose lock file was not updated yet.
+
+Compression costs more CPU time than it saves on fast networks (zstd pays off below about 400 Mbit/s for large
+submission requests, gzip below about 150 Mbit/s), so the assessment module manager only compresses the traffic to
+the modules if COMPRESS_MODULE_REQUESTS is set, e.g. if the modules run on other hosts.
+"""
+import gzip
+import json
+import zlib
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Coroutine, Optional, Sequence, Tuple
+
+from fastapi import HTTPException, Request, Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# Optional dependencies, the standard library is used without them
+try:
+    import orjson
+except ImportError:
+    orjson = None  # type: ignore
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore
+
+# Supported content encodings, in the order of preference
+SUPPORTED_ENCODINGS: Tuple[str, ...] = ("zstd", "gzip") if zstandard is not None else ("gzip",)
+# Smaller bodies are not worth compressing
+COMPRESSION_MINIMUM_SIZE = 1024
+# Larger bodies are (de)compressed in the threadpool, so that they do not block the event loop
+THREADPOOL_MINIMUM_SIZE = 256 * 1024
+# Fast levels: the bodies are large, but mostly sent within the same network
+GZIP_LEVEL = 1
+ZSTD_LEVEL = 3
+
+
+def json_dumps(value: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def json_loads(data: bytes) -> Any:
+    if orjson is not None:
+        # orjson.JSONDecodeError is a subclass of json.JSONDecodeError
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd" and zstandard is not None:
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=GZIP_LEVEL)
+    raise ValueError(f"Unsupported content encoding {encoding}")
+
+
+def decompress(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd" and zstandard is not None:
+        # Also works for frames without the content size, e.g. from streaming compressors
+        return zstandard.ZstdDecompressor().decompressobj().decompress(data)
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    raise ValueError(f"Unsupported content encoding {encoding}")
+
+
+async def compress_async(data: bytes, encoding: str) -> bytes:
+    if len(data) >= THREADPOOL_MINIMUM_SIZE:
+        return await run_in_threadpool(compress, data, encoding)
+    return compress(data, encoding)
+
+
+async def decompress_async(data: bytes, encoding: str) -> bytes:
+    if len(data) >= THREADPOOL_MINIMUM_SIZE:
+        return await run_in_threadpool(decompress, data, encoding)
+    return decompress(data, encoding)
+
+
+async def compress_stream(chunks: AsyncIterable[bytes], encoding: str) -> AsyncIterator[bytes]:
+    """Compress a body while it is sent, e.g. a request body that is passed through from another request."""
+    if encoding == "zstd" and zstandard is not None:
+        compressor = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compressobj()
+    elif encoding == "gzip":
+        compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    else:
+        raise ValueError(f"Unsupported content encoding {encoding}")
+    async for chunk in chunks:
+        compressed = compressor.compress(chunk)
+        if compressed:
+            yield compressed
+    yield compressor.flush()
+
+
+def parse_encodings(header: Optional[str]) -> Tuple[str, ...]:
+    """The encodings in an Accept-Encoding header (without q=0), e.g. ("zstd", "gzip") for "zstd, gzip;q=0.8"."""
+    encodings = []
+    for item in (header or "").split(","):
+        encoding, *parameters = [part.strip() for part in item.split(";")]
+        if encoding and not any(parameter.replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000")
+                                for parameter in parameters):
+            encodings.append(encoding.lower())
+    return tuple(encodings)
+
+
+def choose_encoding(accepted_encodings: Sequence[str]) -> Optional[str]:
+    """The preferred supported encoding of the given accepted encodings, None if there is none."""
+    for encoding in SUPPORTED_ENCODINGS:
+        if encoding in accepted_encodings:
+            return encoding
+    return None
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson, if it is installed."""
+
+    def render(self, content: Any) -> bytes:
+        return json_dumps(content)
+
+
+class _FastRequest(Request):
+    """Request with a decompressed body (see Content-Encoding) that is parsed with orjson, if it is installed."""
+
+    async def body(self) -> bytes:
+        if not hasattr(self, "_body"):
+            body = await super().body()
+            encoding = self.headers.get("content-encoding", "identity").strip().lower()
+            if encoding != "identity":
+                if encoding not in SUPPORTED_ENCODINGS:
+                    raise HTTPException(status_code=415, detail=f"Unsupported content encoding {encoding}",
+                                        headers={"Accept-Encoding": ", ".join(SUPPORTED_ENCODINGS)})
+                try:
+                    body = await decompress_async(body, encoding)
+                except Exception as exc:
+                    raise HTTPException(status_code=400, detail=f"Invalid {encoding} request body") from exc
+            self._body = body  # pylint: disable=attribute-defined-outside-init
+        return self._body
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = json_loads(await self.body())  # pylint: disable=attribute-defined-outside-init
+        return self._json
+
+
+class FastRoute(APIRoute):
+    """Route that decompresses and parses request bodies with `_FastRequest`, see `app.router.route_class`."""
+
+    def get_route_handler(self) -> Callable[[Request], Coroutine[Any, Any, Response]]:
+        route_handler = super().get_route_handler()
+
+        async def fast_route_handler(request: Request) -> Response:
+            return await route_handler(_FastRequest(request.scope, request.receive))
+        return fast_route_handler
+
+
+class CompressionMiddleware:
+    """
+    Compresses complete responses with the preferred encoding that the client accepts
+    and announces the encodings accepted for requests.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = COMPRESSION_MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = choose_encoding(parse_encodings(Headers(scope=scope).get("accept-encoding")))
+        start_message: Optional[Message] = None
+
+        async def send_compressed(message: Message):
+            nonlocal start_message
+            if message["type"] == "http.response.start":
+                # Wait for the body to decide whether to compress it
+                start_message = message
+                MutableHeaders(scope=start_message)["Accept-Encoding"] = ", ".join(SUPPORTED_ENCODINGS)
+                return
+            if start_message is None:
+                await send(message)
+                return
+
+            headers = MutableHeaders(scope=start_message)
+            body = message.get("body", b"")
+            if (message["type"] == "http.response.body" and not message.get("more_body", False)
+                    and encoding is not None and len(body) >= self.minimum_size and "content-encoding" not in headers):
+                body = await compress_async(body, encoding)
+                headers["Content-Encoding"] = encoding
+                headers["Content-Length"] = str(len(body))
+                headers.add_vary_header("Accept-Encoding")
+                message = {**message, "body": body}
+            # Streaming responses (more_body) are sent as they are
+            await send(start_message)
+            start_message = None
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
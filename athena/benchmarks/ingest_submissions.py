@@ -0,0 +1,64 @@
+"""
+Benchmark of `store_submissions`: ingest 5,000 programming submissions (insert), then store them again (update).
+
+Usage (from the athena directory):
+    python -m benchmarks.ingest_submissions [--submissions 5000] [--database-url sqlite:///...] [--merge]
+
+--merge stores the submissions with one `db.merge()` per row instead, like before the bulk upsert, for comparison.
+Without --database-url, a new SQLite database in a temporary directory is used.
+"""
+import argparse
+import os
+import tempfile
+import time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--submissions", type=int, default=5000)
+    parser.add_argument("--database-url", default=f"sqlite:///{tempfile.mkdtemp(prefix='athena-benchmark-')}/data.sqlite")
+    parser.add_argument("--merge", action="store_true", help="use one db.merge() per row instead of the bulk upsert")
+    args = parser.parse_args()
+
+    # athena.database creates the engine on import
+    os.environ["DATABASE_URL"] = args.database_url
+    # pylint: disable=import-outside-toplevel
+    from athena.contextvars import set_lms_url_context_var
+    from athena.database import create_tables, get_db
+    from athena.migrations import run_migrations
+    from athena.schemas import ProgrammingExercise, ProgrammingSubmission
+    from athena.storage import count_stored_submissions, store_exercise, store_submissions
+
+    create_tables("programming")
+    run_migrations()
+    set_lms_url_context_var("http://benchmark.lms")
+
+    def store_with_merge(submissions):
+        with get_db() as db:
+            for submission in submissions:
+                model = submission.to_model()
+                model.lms_url = "http://benchmark.lms"
+                db.merge(model)
+            db.commit()
+
+    store = store_with_merge if args.merge else store_submissions
+    exercise = ProgrammingExercise(id=1, title="Benchmark", max_points=10, bonus_points=0, programming_language="java",
+                                   solution_repository_uri="http://lms/solution",
+                                   template_repository_uri="http://lms/template",
+                                   tests_repository_uri="http://lms/tests", meta={})
+    store_exercise(exercise)
+    submissions = [
+        ProgrammingSubmission(id=i, exercise_id=1, repository_uri=f"http://lms/repository/{i}", meta={"index": i})
+        for i in range(1, args.submissions + 1)
+    ]
+
+    for label in ("insert", "update"):
+        start = time.perf_counter()
+        store(submissions)
+        duration = time.perf_counter() - start
+        print(f"{label}: {len(submissions)} submissions in {duration:.3f}s ({len(submissions) / duration:,.0f}/s)")
+    assert count_stored_submissions(ProgrammingSubmission, 1) == len(submissions)
+
+
+if __name__ == "__main__":
+    main()
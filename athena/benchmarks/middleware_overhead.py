@@ -0,0 +1,133 @@
+"""
+Micro-benchmark of the per-request overhead of the request context middleware, on the `/` health route and on
+`/feedback_suggestions` of a module with a trivial feedback provider. The requests are sent in-process over ASGI
+(no network), so the numbers are the time the app itself spends per request.
+
+It compares the current pure ASGI `RequestContextMiddleware` ("asgi") with the three `BaseHTTPMiddleware` layers that
+it replaced ("base-http", reproduced below), each in its own process because the middleware stack of the app is
+built on the first request.
+
+Usage (from the athena directory):
+    python -m benchmarks.middleware_overhead [--stack asgi|base-http] [--repeat 3]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List
+
+STACKS = ("asgi", "base-http")
+HEADERS = {
+    "X-Server-URL": "http://benchmark.lms",
+    "X-Repository-Authorization-Secret": "secret",
+    "X-Experiment-ID": "experiment",
+}
+FEEDBACK_SUGGESTIONS_BODY = {
+    "exercise": {"id": 1, "title": "Essay", "type": "text", "maxPoints": 10, "bonusPoints": 0,
+                 "gradingInstructions": "", "problemStatement": "", "exampleSolution": "", "meta": {}},
+    "submission": {"id": 1, "exerciseId": 1, "text": "An essay", "meta": {}},
+}
+
+
+def _use_base_http_middleware(app):
+    """Replace the RequestContextMiddleware of the app with the three BaseHTTPMiddleware layers from before."""
+    # pylint: disable=import-outside-toplevel
+    from starlette.middleware import Middleware
+    from starlette.middleware.base import BaseHTTPMiddleware
+    from athena.contextvars import set_repository_authorization_secret_context_var
+    from athena.experiment import ExperimentEnvironment, experiment_context
+    from athena.metadata import metadata_context
+    from athena.request_context import RequestContextMiddleware
+    from athena.timing import start_timings
+
+    class MetaDataMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            metadata_context.set({})
+            start_timings()
+            return await call_next(request)
+
+    class ExperimentMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            experiment_context.set(ExperimentEnvironment(
+                experiment_id=request.headers.get("X-Experiment-ID"),
+                module_configuration_id=request.headers.get("X-Module-Configuration-ID"),
+                run_id=request.headers.get("X-Run-ID"),
+            ))
+            return await call_next(request)
+
+    class RepositoryAuthorizationMiddleware(BaseHTTPMiddleware):
+        async def dispatch(self, request, call_next):
+            secret = request.headers.get("X-Repository-Authorization-Secret")
+            if secret:
+                set_repository_authorization_secret_context_var(secret)
+            return await call_next(request)
+
+    index = next(i for i, middleware in enumerate(app.user_middleware) if middleware.cls is RequestContextMiddleware)
+    app.user_middleware[index:index + 1] = [
+        Middleware(RepositoryAuthorizationMiddleware), Middleware(ExperimentMiddleware), Middleware(MetaDataMiddleware)
+    ]
+
+
+def run_stack(stack: str, repeat: int):
+    # athena.database creates the engine on import
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='athena-benchmark-')}/data.sqlite"
+    # pylint: disable=import-outside-toplevel
+    import logging
+    import httpx
+    from athena import app, feedback_provider
+    from athena.database import create_tables
+    from athena.migrations import run_migrations
+    from athena.schemas import TextExercise, TextFeedback, TextSubmission
+
+    logging.disable(logging.WARNING)
+    create_tables("text")
+    run_migrations()
+
+    @feedback_provider
+    async def suggest_feedback(exercise: TextExercise, submission: TextSubmission) -> List[TextFeedback]:
+        return [TextFeedback(exercise_id=exercise.id, submission_id=submission.id, title="Good", description="",
+                             credits=1.0, meta={})]
+
+    if stack == "base-http":
+        _use_base_http_middleware(app)
+
+    async def measure(client: httpx.AsyncClient, method: str, path: str, n_requests: int) -> float:
+        body = FEEDBACK_SUGGESTIONS_BODY if method == "POST" else None
+        for _ in range(50):  # warm up
+            await client.request(method, path, json=body, headers=HEADERS)
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            for _ in range(n_requests):
+                response = await client.request(method, path, json=body, headers=HEADERS)
+            best = min(best, (time.perf_counter() - start) / n_requests)
+            assert response.status_code == 200, response.text
+        return best * 1e6
+
+    async def main():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://module") as client:
+            for method, path, n_requests in [("GET", "/", 5000), ("POST", "/feedback_suggestions", 500)]:
+                duration = await measure(client, method, path, n_requests)
+                print(f"{stack:10s} {method:4s} {path:22s} {duration:8.0f} us/request", flush=True)
+
+    asyncio.run(main())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stack", choices=STACKS, help="only measure this middleware stack (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of this many runs")
+    args = parser.parse_args()
+    if args.stack is not None:
+        run_stack(args.stack, args.repeat)
+        return
+    for stack in STACKS:
+        subprocess.run([sys.executable, "-m", "benchmarks.middleware_overhead", "--stack", stack,
+                        "--repeat", str(args.repeat)], check=True)
+
+
+if __name__ == "__main__":
+    main()
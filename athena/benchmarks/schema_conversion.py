@@ -0,0 +1,103 @@
+"""
+Benchmark of the conversion of database models to schemas for every schema type: `Schema.from_trusted_orm` (used by
+`Model.to_schema`) compared with the fully validating `Schema.from_orm`. The rows are stored in a temporary SQLite
+database and read back first, so the models hold the values as the database returns them.
+
+Usage (from the athena directory):
+    python -m benchmarks.schema_conversion [--rows 10000] [--repeat 3]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+# athena.database creates the engine on import
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='athena-benchmark-')}/data.sqlite"
+
+# pylint: disable=wrong-import-position
+from athena import storage
+from athena.contextvars import set_lms_url_context_var
+from athena.database import create_tables, get_db
+from athena.migrations import run_migrations
+from athena.schemas import ExerciseType, ModelingExercise, ModelingFeedback, ModelingSubmission, \
+    ProgrammingExercise, ProgrammingFeedback, ProgrammingSubmission, TextExercise, TextFeedback, TextSubmission
+
+
+def _text(i: int):
+    return (
+        TextExercise(id=i, title="Essay", max_points=10, bonus_points=0, grading_instructions="Be fair",
+                     problem_statement="Write", example_solution="An essay",
+                     grading_criteria=[{"id": 1, "title": "Style",
+                                        "structured_grading_instructions": [{"id": 1, "credits": 1.0}]}],
+                     meta={"a": 1}),
+        TextSubmission(id=i, exercise_id=i, text="x" * 200, language="ENGLISH", meta={"a": 1}),
+        TextFeedback(exercise_id=i, submission_id=i, title="Good", description="Well done", credits=1,
+                     index_start=1, index_end=5, meta={"a": 1}),
+    )
+
+
+def _programming(i: int):
+    return (
+        ProgrammingExercise(id=i, title="Sort", max_points=10, bonus_points=0, programming_language="java",
+                            solution_repository_uri="http://lms/solution", template_repository_uri="http://lms/template",
+                            tests_repository_uri="http://lms/tests", meta={}),
+        ProgrammingSubmission(id=i, exercise_id=i, repository_uri="http://lms/submission", meta={}),
+        ProgrammingFeedback(exercise_id=i, submission_id=i, title="Good", description="Well done", credits=1,
+                            file_path="Sort.java", line_start=1, line_end=3, meta={}),
+    )
+
+
+def _modeling(i: int):
+    return (
+        ModelingExercise(id=i, title="Diagram", max_points=10, bonus_points=0, example_solution="{}", meta={}),
+        ModelingSubmission(id=i, exercise_id=i, model="{}", meta={}),
+        ModelingFeedback(exercise_id=i, submission_id=i, title="Good", description="Well done", credits=1,
+                         element_ids=["a"], reference="r", meta={}),
+    )
+
+
+ROWS_BY_EXERCISE_TYPE = {"text": _text, "programming": _programming, "modeling": _modeling}
+
+
+def _measure(convert, models, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for model in models:
+            convert(model)
+        best = min(best, time.perf_counter() - start)
+    return len(models) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="number of rows of each schema type")
+    parser.add_argument("--repeat", type=int, default=3, help="report the best of this many runs")
+    args = parser.parse_args()
+
+    for exercise_type in ExerciseType:
+        create_tables(exercise_type.value)
+    run_migrations()
+    set_lms_url_context_var("http://benchmark.lms")
+
+    print(f"{'schema':24s} {'from_trusted_orm':>18s} {'from_orm':>18s} {'speedup':>8s}")
+    for offset, make_rows in enumerate(ROWS_BY_EXERCISE_TYPE.values()):
+        # Exercise IDs are unique across the exercise types
+        ids = range(offset * args.rows + 1, (offset + 1) * args.rows + 1)
+        exercises, submissions, feedbacks = zip(*(make_rows(i) for i in ids))
+        storage.store_exercises(list(exercises))
+        storage.store_submissions(list(submissions))
+        storage.store_feedback_suggestions(list(feedbacks))
+
+        for schema_class in (type(exercises[0]), type(submissions[0]), type(feedbacks[0])):
+            model_class = schema_class.get_model_class()
+            with get_db() as db:
+                models = db.query(model_class).all()
+                trusted = _measure(schema_class.from_trusted_orm, models, args.repeat)
+                validated = _measure(schema_class.from_orm, models, args.repeat)
+            print(f"{schema_class.__name__:24s} {trusted:>11,.0f} rows/s {validated:>11,.0f} rows/s "
+                  f"{trusted / validated:>7.1f}x", flush=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,33 @@
+"""
+Test setup: all tests share a fresh SQLite database in a temporary directory.
+`athena.database` creates the engine on import, so DATABASE_URL has to be set before athena is imported.
+"""
+import os
+import tempfile
+import uuid
+
+import pytest
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='athena-tests-')}/data.sqlite"
+
+# pylint: disable=wrong-import-position
+from athena.contextvars import set_lms_url_context_var
+from athena.database import create_tables
+from athena.migrations import run_migrations
+from athena.schemas import ExerciseType
+
+
+@pytest.fixture(scope="session", autouse=True)
+def database():
+    """Create the tables of all exercise types and run the migrations, like `app.start()` does for one type."""
+    for exercise_type in ExerciseType:
+        create_tables(exercise_type.value)
+    run_migrations()
+
+
+@pytest.fixture
+def lms_url() -> str:
+    """A new LMS URL for each test, so that tests do not see the stored data of other tests."""
+    url = f"http://lms-{uuid.uuid4().hex}.example.com"
+    set_lms_url_context_var(url)
+    return url
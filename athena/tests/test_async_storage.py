@@ -0,0 +1,72 @@
+"""
+The async storage variants run the storage functions with `run_in_db_async`: on the async engine if
+ASYNC_DATABASE_URL is set (here: aiosqlite on the test database), otherwise in the threadpool.
+"""
+import asyncio
+import threading
+
+import pytest
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from athena import database
+from athena.contextvars import get_lms_url
+from athena.database import get_db, run_in_db_async
+from athena.schemas import TextExercise, TextSubmission
+from athena.storage import get_stored_submissions_async, store_exercises_async, store_submissions_async
+
+
+@pytest.fixture
+def async_engine(monkeypatch):
+    """The async engine on the test database, like with ASYNC_DATABASE_URL=sqlite+aiosqlite://..."""
+    engine = create_async_engine(str(database.engine.url).replace("sqlite://", "sqlite+aiosqlite://", 1))
+    monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(engine, autocommit=False, autoflush=False))
+    yield engine
+    asyncio.run(engine.dispose())
+
+
+def _exercise() -> TextExercise:
+    return TextExercise(id=1, title="Essay", max_points=10, bonus_points=0, grading_instructions="",
+                        problem_statement="Write", example_solution="", meta={})
+
+
+def _submission(submission_id: int) -> TextSubmission:
+    return TextSubmission(id=submission_id, exercise_id=1, text=f"Essay {submission_id}", language="ENGLISH", meta={})
+
+
+def _session_info():
+    with get_db() as db:
+        return db.get_bind(), get_lms_url(), threading.current_thread()
+
+
+def test_run_in_db_async_runs_on_the_session_of_the_async_engine(async_engine, lms_url):
+    bind, function_lms_url, thread = asyncio.run(run_in_db_async(_session_info))
+
+    assert bind is async_engine.sync_engine
+    assert function_lms_url == lms_url
+    # On the event loop (asyncio.run runs it in this thread), the queries are awaited instead of blocking a thread
+    assert thread is threading.current_thread()
+
+
+def test_run_in_db_async_runs_in_the_threadpool_without_async_engine(lms_url):
+    bind, function_lms_url, thread = asyncio.run(run_in_db_async(_session_info))
+
+    assert bind is database.engine
+    assert function_lms_url == lms_url
+    assert thread is not threading.current_thread()
+
+
+@pytest.mark.parametrize("use_async_engine", [True, False])
+def test_async_storage_functions_store_and_return_lists(request, lms_url, use_async_engine):
+    if use_async_engine:
+        request.getfixturevalue("async_engine")
+
+    async def store_and_get():
+        await store_exercises_async([_exercise()])
+        await store_submissions_async([_submission(i) for i in range(1, 11)])
+        return await get_stored_submissions_async(TextSubmission, 1)
+
+    submissions = asyncio.run(store_and_get())
+
+    assert isinstance(submissions, list)
+    assert sorted(submission.id for submission in submissions) == list(range(1, 11))
+    assert submissions[0].text.startswith("Essay")
@@ -0,0 +1,111 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, select
+from sqlalchemy.orm import registry
+
+from athena.database import engine, get_db
+from athena.schemas import ProgrammingExercise, ProgrammingFeedback, ProgrammingSubmission
+from athena.storage import get_stored_exercises, get_stored_submissions, store_exercises, store_feedback_suggestions, \
+    store_submissions
+from athena.storage.bulk_upsert import _deduplicate_rows, bulk_upsert
+from athena.models import DBFeedbackCacheEntry, DBProgrammingSubmission
+
+
+def _exercise(exercise_id: int, title: str = "Exercise") -> ProgrammingExercise:
+    return ProgrammingExercise(id=exercise_id, title=title, max_points=10, bonus_points=0, programming_language="java",
+                               solution_repository_uri="http://lms/solution", template_repository_uri="http://lms/template",
+                               tests_repository_uri="http://lms/tests", meta={})
+
+
+def _submission(submission_id: int, exercise_id: int = 1, **meta) -> ProgrammingSubmission:
+    return ProgrammingSubmission(id=submission_id, exercise_id=exercise_id,
+                                 repository_uri=f"http://lms/repository/{submission_id}", meta=meta)
+
+
+def test_store_submissions_inserts_and_updates(lms_url):
+    store_exercises([_exercise(1)])
+    store_submissions([_submission(i) for i in range(1, 101)])
+    store_submissions([_submission(50, updated=True), _submission(101)])
+
+    stored = {s.id: s for s in get_stored_submissions(ProgrammingSubmission, 1)}
+    assert sorted(stored) == list(range(1, 102))
+    assert stored[50].meta == {"updated": True}
+    assert stored[49].meta == {}
+
+
+def test_store_exercises_updates_base_and_subclass_table(lms_url):
+    store_exercises([_exercise(1), _exercise(2)])
+    updated = _exercise(1, title="Renamed")
+    updated.programming_language = "python"
+    store_exercises([updated])
+
+    stored = {e.id: e for e in get_stored_exercises(ProgrammingExercise)}
+    assert stored[1].title == "Renamed"
+    assert stored[1].programming_language == "python"
+    assert stored[2].title == "Exercise"
+
+
+def test_store_submissions_with_duplicate_primary_keys_keeps_the_last_one(lms_url):
+    store_submissions([_submission(1, version=1), _submission(2), _submission(1, version=2)])
+
+    stored = {s.id: s for s in get_stored_submissions(ProgrammingSubmission, 1)}
+    assert sorted(stored) == [1, 2]
+    assert stored[1].meta == {"version": 2}
+
+
+def test_deduplicate_rows_keeps_the_last_row_per_primary_key():
+    table = DBProgrammingSubmission.__table__
+    rows = [{"id": 1, "version": 1}, {"id": 2, "version": 1}, {"id": 1, "version": 2}]
+
+    assert _deduplicate_rows(table, rows) == [{"id": 1, "version": 2}, {"id": 2, "version": 1}]
+    assert _deduplicate_rows(table, rows[:2]) == rows[:2]
+
+
+def test_left_out_columns_get_their_default_and_keep_their_value_on_conflict(lms_url):
+    with get_db() as db:
+        bulk_upsert(db, [DBFeedbackCacheEntry(key=f"{lms_url}-1", lms_url=lms_url, exercise_id=1, feedbacks=[]),
+                         DBFeedbackCacheEntry(key=f"{lms_url}-2", lms_url=lms_url, exercise_id=1, feedbacks=[],
+                                              created_at=datetime(2000, 1, 1))])
+        db.commit()
+        created_at = {key: value for key, value in db.query(DBFeedbackCacheEntry.key, DBFeedbackCacheEntry.created_at)
+                      .filter(DBFeedbackCacheEntry.lms_url == lms_url)}
+    # The callable default (datetime.utcnow) applies to the rows without a value
+    assert created_at[f"{lms_url}-1"] > datetime(2000, 1, 1)
+    assert created_at[f"{lms_url}-2"] == datetime(2000, 1, 1)
+
+    with get_db() as db:
+        bulk_upsert(db, [DBFeedbackCacheEntry(key=f"{lms_url}-2", lms_url=lms_url, exercise_id=2, feedbacks=[])])
+        db.commit()
+        entry = db.query(DBFeedbackCacheEntry).filter(DBFeedbackCacheEntry.key == f"{lms_url}-2").one()
+        assert entry.exercise_id == 2
+        assert entry.created_at == datetime(2000, 1, 1)
+
+
+def test_server_defaults_apply_to_left_out_columns():
+    metadata = MetaData()
+    table = Table("bulk_upsert_server_default", metadata, Column("id", Integer, primary_key=True),
+                  Column("status", String, server_default="new"))
+    metadata.create_all(engine)
+    mapper_registry = registry(metadata=metadata)
+
+    class Row:  # pylint: disable=too-few-public-methods
+        def __init__(self, id, status=None):  # pylint: disable=redefined-builtin
+            self.id, self.status = id, status
+
+    mapper_registry.map_imperatively(Row, table)
+    with get_db() as db:
+        bulk_upsert(db, [Row(1), Row(2, "done")])
+        bulk_upsert(db, [Row(2)])
+        db.commit()
+        assert dict(db.execute(select(table.c.id, table.c.status)).all()) == {1: "new", 2: "done"}
+
+
+def test_store_feedback_suggestions_without_native_upserts(lms_url, monkeypatch):
+    # Other dialects fall back to the ORM, which adds the models to the session
+    monkeypatch.setattr(engine.dialect, "name", "other")
+    suggestions = store_feedback_suggestions([
+        ProgrammingFeedback(exercise_id=1, submission_id=1, title="Good", description="", credits=1.0, meta={})
+        for _ in range(2)])
+
+    assert [suggestion.title for suggestion in suggestions] == ["Good", "Good"]
+    assert len({suggestion.id for suggestion in suggestions}) == 2
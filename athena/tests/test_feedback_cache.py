@@ -0,0 +1,113 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import List
+
+import httpx
+
+from athena import app, env, feedback_provider
+from athena.database import get_db
+from athena.models import DBFeedbackCacheEntry
+from athena.schemas import TextExercise, TextFeedback, TextSubmission
+from athena.storage import feedback_cache_storage
+
+provider_calls: List[int] = []
+
+
+@feedback_provider(cache=True)
+def suggest_feedback(exercise: TextExercise, submission: TextSubmission) -> List[TextFeedback]:
+    provider_calls.append(submission.id)
+    return [TextFeedback(exercise_id=exercise.id, submission_id=submission.id, title="Good", description="",
+                         credits=1.0, meta={})]
+
+
+def _request_feedback_suggestions(lms_url: str, headers=None) -> httpx.Response:
+    body = {
+        "exercise": {"id": 1, "title": "Essay", "type": "text", "maxPoints": 10, "bonusPoints": 0,
+                     "gradingInstructions": "", "problemStatement": "", "exampleSolution": "", "meta": {}},
+        "submission": {"id": 7, "exerciseId": 1, "text": "An essay", "meta": {}},
+    }
+
+    async def post():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://module") as client:
+            return await client.post("/feedback_suggestions", json=body,
+                                     headers={"X-Server-URL": lms_url, **(headers or {})})
+    return asyncio.run(post())
+
+
+def test_repeated_requests_are_answered_from_the_cache(lms_url):
+    provider_calls.clear()
+    first = _request_feedback_suggestions(lms_url)
+    second = _request_feedback_suggestions(lms_url)
+
+    assert first.status_code == second.status_code == 200
+    assert provider_calls == [7]
+    assert second.json()["data"] == first.json()["data"]
+    assert second.json()["meta"]["feedback_cache_hit"] is True
+
+
+def test_experiment_requests_bypass_the_cache(lms_url):
+    provider_calls.clear()
+    _request_feedback_suggestions(lms_url)
+    for headers in [{"X-Experiment-ID": "experiment"}, {"X-Run-ID": "run-1"}, {"X-Run-ID": "run-1"}]:
+        response = _request_feedback_suggestions(lms_url, headers)
+        assert response.status_code == 200
+        assert "feedback_cache_hit" not in response.json()["meta"]
+
+    assert provider_calls == [7, 7, 7, 7]
+
+
+def _get_last_used_at(key: str) -> datetime:
+    with get_db() as db:
+        return db.query(DBFeedbackCacheEntry.last_used_at).filter(DBFeedbackCacheEntry.key == key).scalar()
+
+
+def _set_last_used_at(key: str, last_used_at: datetime):
+    with get_db() as db:
+        db.query(DBFeedbackCacheEntry).filter(DBFeedbackCacheEntry.key == key).update(
+            {DBFeedbackCacheEntry.last_used_at: last_used_at})
+        db.commit()
+
+
+def test_cache_hits_only_record_the_last_use_once_it_is_outdated(lms_url):
+    key = f"{lms_url}-entry"
+    feedback_cache_storage.store_cached_feedback_suggestions(1, {key: []})
+    recently = datetime.utcnow() - timedelta(seconds=feedback_cache_storage.LAST_USED_RESOLUTION_SECONDS / 2)
+    _set_last_used_at(key, recently)
+
+    assert key in feedback_cache_storage.get_cached_feedback_suggestions([key])
+    assert _get_last_used_at(key) == recently
+
+    long_ago = datetime.utcnow() - timedelta(seconds=feedback_cache_storage.LAST_USED_RESOLUTION_SECONDS * 2)
+    _set_last_used_at(key, long_ago)
+    assert key in feedback_cache_storage.get_cached_feedback_suggestions([key])
+    assert _get_last_used_at(key) > recently
+
+
+def test_storing_an_entry_again_overwrites_it(lms_url):
+    key = f"{lms_url}-entry"
+    feedback_cache_storage.store_cached_feedback_suggestions(1, {key: []})
+    feedback = TextFeedback(exercise_id=1, submission_id=7, title="Good", description="", credits=1.0, meta={})
+    feedback_cache_storage.store_cached_feedback_suggestions(1, {key: [feedback]})
+
+    assert [entry["title"] for entry in feedback_cache_storage.get_cached_feedback_suggestions([key])[key]] == ["Good"]
+
+
+def test_eviction_deletes_expired_and_least_recently_used_entries(lms_url, monkeypatch):
+    expired_key, least_recently_used_key, kept_key = f"{lms_url}-expired", f"{lms_url}-unused", f"{lms_url}-kept"
+    feedback_cache_storage.store_cached_feedback_suggestions(1, {expired_key: [], least_recently_used_key: [],
+                                                                 kept_key: []})
+    with get_db() as db:
+        db.query(DBFeedbackCacheEntry).filter(DBFeedbackCacheEntry.key == expired_key).update(
+            {DBFeedbackCacheEntry.created_at: datetime(2000, 1, 1)})
+        db.commit()
+        n_valid_entries = db.query(DBFeedbackCacheEntry).filter(
+            DBFeedbackCacheEntry.created_at >= datetime.utcnow() - timedelta(seconds=env.FEEDBACK_CACHE_TTL_SECONDS)
+        ).count()
+    _set_last_used_at(least_recently_used_key, datetime(2000, 1, 1))
+    monkeypatch.setattr(env, "FEEDBACK_CACHE_MAX_ENTRIES", n_valid_entries - 1)
+
+    feedback_cache_storage.evict_cached_feedback_suggestions()
+
+    with get_db() as db:
+        keys = {key for key, in db.query(DBFeedbackCacheEntry.key).filter(DBFeedbackCacheEntry.key.startswith(lms_url))}
+    assert keys == {kept_key}
@@ -0,0 +1,171 @@
+import asyncio
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
+
+from athena import env, jobs
+from athena.contextvars import get_repository_authorization_secret_context_var, \
+    set_repository_authorization_secret_context_var
+from athena.database import engine
+from athena.database import get_db
+from athena.models import DBJob
+from athena.schemas import JobStatus
+
+
+@pytest.fixture(autouse=True)
+def empty_job_queue():
+    """The workers take the oldest job of any LMS, so the tests start with an empty queue."""
+    with get_db() as db:
+        db.query(DBJob).delete()
+        db.commit()
+
+
+def _add_job(lms_url: str, status: JobStatus = JobStatus.queued, claimed_by=None, heartbeat_age_seconds=None,
+             exercise_id: int = 1, repository_authorization_secret=None) -> int:
+    heartbeat_at = None
+    if heartbeat_age_seconds is not None:
+        heartbeat_at = datetime.utcnow() - timedelta(seconds=heartbeat_age_seconds)
+    with get_db() as db:
+        job = DBJob(kind="test", exercise_id=exercise_id, payload={}, lms_url=lms_url, status=status,
+                    claimed_by=claimed_by, heartbeat_at=heartbeat_at,
+                    repository_authorization_secret=repository_authorization_secret)
+        db.add(job)
+        db.commit()
+        return job.id
+
+
+def _get_job(job_id: int) -> DBJob:
+    with get_db() as db:
+        return db.query(DBJob).filter(DBJob.id == job_id).one()
+
+
+def test_only_stale_running_jobs_are_requeued(lms_url):
+    alive = _add_job(lms_url, JobStatus.running, "other-instance", heartbeat_age_seconds=1, exercise_id=1)
+    stale = _add_job(lms_url, JobStatus.running, "other-instance", heartbeat_age_seconds=env.JOB_STALE_SECONDS + 1,
+                     exercise_id=2)
+    without_heartbeat = _add_job(lms_url, JobStatus.running, exercise_id=3)
+
+    jobs._requeue_jobs(stale=True)
+
+    assert _get_job(alive).status == JobStatus.running
+    assert _get_job(alive).claimed_by == "other-instance"
+    assert _get_job(stale).status == JobStatus.queued
+    assert _get_job(stale).claimed_by is None
+    assert _get_job(without_heartbeat).status == JobStatus.queued
+
+
+def test_shutdown_only_requeues_the_jobs_of_this_instance(lms_url):
+    own = _add_job(lms_url, JobStatus.running, jobs._instance_id, heartbeat_age_seconds=1, exercise_id=1)
+    other = _add_job(lms_url, JobStatus.running, "other-instance", heartbeat_age_seconds=1, exercise_id=2)
+
+    jobs._requeue_jobs(stale=False)
+
+    assert _get_job(own).status == JobStatus.queued
+    assert _get_job(other).status == JobStatus.running
+
+
+def test_heartbeat_only_updates_the_jobs_of_this_instance(lms_url):
+    own = _add_job(lms_url, JobStatus.running, jobs._instance_id, heartbeat_age_seconds=30, exercise_id=1)
+    other = _add_job(lms_url, JobStatus.running, "other-instance", heartbeat_age_seconds=30, exercise_id=2)
+
+    jobs._update_heartbeats()
+
+    assert datetime.utcnow() - _get_job(own).heartbeat_at < timedelta(seconds=5)
+    assert datetime.utcnow() - _get_job(other).heartbeat_at > timedelta(seconds=25)
+
+
+def test_result_of_a_job_taken_over_by_another_instance_is_not_recorded(lms_url):
+    job_id = _add_job(lms_url, JobStatus.running, "other-instance", heartbeat_age_seconds=1)
+
+    jobs._finish_job(job_id, 1, None)
+
+    assert _get_job(job_id).status == JobStatus.running
+
+
+def test_job_gets_the_repository_secret_it_was_enqueued_with_after_a_restart(lms_url):
+    secrets = []
+    jobs.register_job_handler("test", lambda: secrets.append(get_repository_authorization_secret_context_var()),
+                              lambda payload: ((), {}))
+
+    async def enqueue():
+        set_repository_authorization_secret_context_var("repository-secret")
+        return await jobs.enqueue_job("test", 1, {})
+    job_id = asyncio.run(enqueue())
+    assert "repository-secret" not in _get_job(job_id).repository_authorization_secret
+
+    # A new context, like another instance or the same one after a restart
+    async def claim_and_run():
+        await jobs._run_job(*jobs._claim_next_job())
+    asyncio.run(claim_and_run())
+
+    assert secrets == ["repository-secret"]
+    assert _get_job(job_id).status == JobStatus.done
+
+
+def test_job_with_undecryptable_repository_secret_fails_without_retry(lms_url):
+    called = []
+    jobs.register_job_handler("test", lambda: called.append(True), lambda payload: ((), {}))
+    job_id = _add_job(lms_url, JobStatus.running, jobs._instance_id, heartbeat_age_seconds=0,
+                      repository_authorization_secret="encrypted with another module secret")
+
+    asyncio.run(jobs._run_job(job_id, "test", lms_url, {}, 1, "encrypted with another module secret"))
+
+    job = _get_job(job_id)
+    assert not called
+    assert job.status == JobStatus.failed
+    assert "repository authorization secret" in job.last_error
+
+
+def test_database_allows_only_one_running_job_per_exercise(lms_url):
+    _add_job(lms_url, JobStatus.running, "other-instance", heartbeat_age_seconds=1)
+    _add_job(lms_url, JobStatus.running, "other-instance", heartbeat_age_seconds=1, exercise_id=2)
+    with pytest.raises(IntegrityError):
+        _add_job(lms_url, JobStatus.running, "another-instance", heartbeat_age_seconds=1)
+
+
+def test_concurrent_claims_start_only_one_job_per_exercise(lms_url):
+    for _ in range(2):
+        _add_job(lms_url)
+    claims = []
+    # Both claims select their job before either of them marks it as running
+    both_selected = threading.Barrier(2, timeout=5)
+
+    def wait_for_other_claim(_conn, _cursor, statement, _parameters, _context, _executemany):
+        if statement.startswith("UPDATE job SET status") and threading.current_thread().name.startswith("claim"):
+            both_selected.wait()
+
+    event.listen(engine, "before_cursor_execute", wait_for_other_claim)
+    try:
+        threads = [threading.Thread(target=lambda: claims.append(jobs._claim_next_job()), name=f"claim-{i}")
+                   for i in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        event.remove(engine, "before_cursor_execute", wait_for_other_claim)
+
+    assert len(claims) == 2
+    assert len([claim for claim in claims if claim is not None]) == 1
+    with get_db() as db:
+        assert db.query(DBJob).filter(DBJob.lms_url == lms_url, DBJob.status == JobStatus.running).count() == 1
+
+
+def test_job_is_run_and_marked_as_done(lms_url):
+    called = []
+    jobs.register_job_handler("test", lambda: called.append(True), lambda payload: ((), {}))
+    job_id = _add_job(lms_url)
+
+    async def claim_and_run():
+        claimed = jobs._claim_next_job()
+        assert claimed is not None and claimed[0] == job_id
+        assert _get_job(job_id).claimed_by == jobs._instance_id
+        await jobs._run_job(*claimed)
+    asyncio.run(claim_and_run())
+
+    assert called == [True]
+    assert _get_job(job_id).status == JobStatus.done
+    assert _get_job(job_id).claimed_by is None
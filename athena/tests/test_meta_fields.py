@@ -0,0 +1,64 @@
+from athena import storage
+from athena.database import get_db
+from athena.models import DBMetaBlob, DBModelingFeedback
+from athena.models.meta_fields import get_blob_hash, promote_meta_fields
+from athena.schemas import ModelingFeedback
+
+# Like in test_storage_indexes.py, before the tables are created (see conftest.py)
+promote_meta_fields(DBModelingFeedback, columns={"kind": str}, blobs=["context"])
+
+
+def _feedback(context: str, feedback_id: int = 1601, kind: str = "class", **meta) -> ModelingFeedback:
+    return ModelingFeedback(id=feedback_id, exercise_id=1601, submission_id=1601, title="Feedback", description="",
+                            credits=1.0, meta={"kind": kind, "context": context, **meta})
+
+
+def _stored_blob_hashes(*values) -> set:
+    hashes = [get_blob_hash(value) for value in values]
+    with get_db() as db:
+        return {blob_hash for blob_hash, in db.query(DBMetaBlob.hash).filter(DBMetaBlob.hash.in_(hashes))}
+
+
+def test_promoted_fields_are_stored_outside_of_the_json_meta(lms_url):
+    context = f"{lms_url} shared " * 100
+    suggestions = storage.store_feedback_suggestions([
+        _feedback(context, feedback_id=None, kind="class", score=1),
+        _feedback(context, feedback_id=None, kind="attribute", score=2),
+    ])
+
+    with get_db() as db:
+        json_metas = [meta for meta, in db.query(DBModelingFeedback.meta).filter(
+            DBModelingFeedback.id.in_([suggestion.id for suggestion in suggestions]))]
+        blob_count = db.query(DBMetaBlob).filter(DBMetaBlob.hash == get_blob_hash(context)).count()
+    assert sorted(json_metas, key=lambda meta: meta["score"]) == [{"score": 1}, {"score": 2}]
+    # Stored once for both suggestions
+    assert blob_count == 1
+
+    stored = storage.get_stored_feedback_suggestions(ModelingFeedback, 1601, 1601)
+    assert sorted((suggestion.meta for suggestion in stored), key=lambda meta: meta["score"]) == [
+        {"kind": "class", "context": context, "score": 1},
+        {"kind": "attribute", "context": context, "score": 2},
+    ]
+    assert storage.get_stored_feedback_metas(ModelingFeedback, [suggestions[1].id]) == {
+        suggestions[1].id: {"kind": "attribute", "context": context, "score": 2}}
+
+
+def test_queries_filter_on_promoted_columns(lms_url):
+    storage.store_feedback_suggestions([_feedback("", feedback_id=None, kind=kind) for kind in ("class", "attribute")])
+
+    [attribute] = storage.get_stored_feedback_suggestions(ModelingFeedback, 1601, 1601, meta={"kind": "attribute"})
+    assert attribute.meta == {"kind": "attribute", "context": ""}
+    assert not list(storage.get_stored_feedback_suggestions(ModelingFeedback, 1601, 1601, meta={"kind": "method"}))
+
+
+def test_unreferenced_blobs_are_deleted(lms_url):
+    old_context, new_context = f"{lms_url} old " * 100, f"{lms_url} new " * 100
+    storage.store_feedback(_feedback(old_context), is_lms_id=True)
+    storage.store_feedback(_feedback(new_context), is_lms_id=True)
+    assert _stored_blob_hashes(old_context, new_context) == {get_blob_hash(old_context), get_blob_hash(new_context)}
+
+    storage.delete_unreferenced_meta_blobs()
+
+    assert _stored_blob_hashes(old_context, new_context) == {get_blob_hash(new_context)}
+    [stored] = storage.get_stored_feedback(ModelingFeedback, 1601, 1601)
+    assert stored.meta == {"kind": "class", "context": new_context}
@@ -0,0 +1,91 @@
+"""The Prometheus text format of `athena.metrics` and the HTTP request metrics of the `MetricsMiddleware`."""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, HTTPException
+
+from athena import metrics
+from athena.metrics import CONTENT_TYPE, Counter, Gauge, Histogram, MetricsMiddleware, generate_metrics, \
+    metrics_endpoint, register_collector
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Only the metrics and collectors of the test are served."""
+    monkeypatch.setattr(metrics, "_metrics", [])
+    monkeypatch.setattr(metrics, "_collectors", [])
+
+
+def test_counters_and_gauges(registry):
+    counter = Counter("athena_test_total", "Test counter", ["kind"])
+    gauge = Gauge("athena_test_in_flight", "Test gauge")
+    counter.inc(kind="a")
+    counter.inc(2.5, kind='b "quoted"\n')
+    gauge.inc()
+    gauge.inc()
+    gauge.dec()
+
+    assert generate_metrics() == (
+        "# HELP athena_test_total Test counter\n"
+        "# TYPE athena_test_total counter\n"
+        'athena_test_total{kind="a"} 1\n'
+        'athena_test_total{kind="b \\"quoted\\"\\n"} 2.5\n'
+        "# HELP athena_test_in_flight Test gauge\n"
+        "# TYPE athena_test_in_flight gauge\n"
+        "athena_test_in_flight 1\n"
+    )
+
+
+def test_histogram_buckets_are_cumulative(registry):
+    histogram = Histogram("athena_test_seconds", "Test histogram", ["route"], buckets=(0.1, 1.0))
+    for value in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(value, route="/a")
+
+    assert generate_metrics().splitlines()[2:] == [
+        'athena_test_seconds_bucket{route="/a",le="0.1"} 2',
+        'athena_test_seconds_bucket{route="/a",le="1"} 3',
+        'athena_test_seconds_bucket{route="/a",le="+Inf"} 4',
+        'athena_test_seconds_count{route="/a"} 4',
+        'athena_test_seconds_sum{route="/a"} 3.65',
+    ]
+
+
+def test_labels_have_to_match(registry):
+    counter = Counter("athena_test_total", "Test counter", ["kind"])
+    with pytest.raises(ValueError):
+        counter.inc(type="a")
+
+
+def test_collectors_update_metrics_before_they_are_served(registry):
+    gauge = Gauge("athena_test_queued", "Test gauge")
+    register_collector(lambda: gauge.set(7))
+
+    response = metrics_endpoint()
+
+    assert response.media_type == CONTENT_TYPE
+    assert response.body.decode().endswith("athena_test_queued 7\n")
+
+
+def test_requests_are_measured_by_route_template():
+    app = FastAPI()
+    app.add_middleware(MetricsMiddleware)
+
+    @app.get("/exercises/{exercise_id}")
+    async def get_exercise(exercise_id: int):
+        if exercise_id == 0:
+            raise HTTPException(status_code=404)
+        return {"id": exercise_id}
+
+    async def requests():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://module") as client:
+            for path in ("/exercises/1", "/exercises/2", "/exercises/0", "/missing"):
+                await client.get(path)
+    asyncio.run(requests())
+
+    output = generate_metrics()
+    route = "athena_http_request_duration_seconds_count{method=\"GET\",route=\"%s\",status=\"%s\"}"
+    assert f"{route % ('/exercises/{exercise_id}', 200)} 2\n" in output
+    assert f"{route % ('/exercises/{exercise_id}', 404)} 1\n" in output
+    assert f"{route % ('unmatched', 404)} 1\n" in output
+    assert 'athena_http_requests_in_flight{method="GET"} 0\n' in output
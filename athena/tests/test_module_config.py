@@ -0,0 +1,66 @@
+"""The module config of the X-Module-Config header is parsed once per header value, each request gets its own copy."""
+import asyncio
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+from athena.module_config import _parse_module_config, get_dynamic_module_config_factory
+
+
+class PromptConfig(BaseModel):
+    system_message: str = "You are a tutor."
+    examples: List[str] = []
+
+
+class Config(BaseModel):
+    max_tokens: int = 100
+    prompt: PromptConfig = PromptConfig()
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    _parse_module_config.cache_clear()
+
+
+get_config = get_dynamic_module_config_factory(Config)
+
+
+def _get(header):
+    return asyncio.run(get_config(module_config=header))
+
+
+def test_configs_are_parsed_once_per_header_value():
+    header = '{"max_tokens": 200, "prompt": {"examples": ["a"]}}'
+
+    configs = [_get(header) for _ in range(3)]
+    _get('{"max_tokens": 300}')
+
+    assert [config.max_tokens for config in configs] == [200, 200, 200]
+    assert _parse_module_config.cache_info().misses == 2
+    assert _parse_module_config.cache_info().hits == 2
+
+
+def test_changes_to_a_config_do_not_leak_into_other_requests():
+    header = '{"prompt": {"examples": ["a"]}}'
+    config = _get(header)
+    config.max_tokens = 1
+    config.prompt.system_message = "Changed"
+    config.prompt.examples.append("b")
+
+    assert _get(header) == Config(prompt=PromptConfig(examples=["a"]))
+    assert _get(None) == Config()
+
+
+@pytest.mark.parametrize("header", ["{invalid", '{"max_tokens": "many"}'])
+def test_invalid_configs_are_rejected_every_time(header):
+    for _ in range(2):
+        with pytest.raises(HTTPException) as exc_info:
+            _get(header)
+        assert exc_info.value.status_code == 400
+    assert _parse_module_config.cache_info().currsize == 0
+
+
+def test_without_config_type_there_is_no_config():
+    assert asyncio.run(get_dynamic_module_config_factory(None)(module_config='{"max_tokens": 1}')) is None
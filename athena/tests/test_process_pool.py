@@ -0,0 +1,63 @@
+"""
+Functions registered for the process pool run in spawned worker processes, which import this module to find them.
+The LMS URL of the request is passed to the worker, its metadata and timings come back with the result.
+"""
+import asyncio
+import os
+
+import pytest
+
+from athena import env, process_pool
+from athena.contextvars import get_lms_url
+from athena.metadata import emit_meta, get_meta, metadata_context
+from athena.process_pool import register_process_function, run_in_process, shutdown_process_pool
+from athena.timing import get_timings, start_timings, timed
+
+
+def count_words(text: str) -> int:
+    emit_meta("worker_lms_url", get_lms_url())
+    with timed("split"):
+        return len(text.split())
+
+
+def worker_pid() -> int:
+    return os.getpid()
+
+
+register_process_function(count_words)
+register_process_function(worker_pid)
+
+
+@pytest.fixture
+def worker_pool(monkeypatch):
+    monkeypatch.setattr(env, "PROCESS_POOL_WORKERS", 1)
+    yield
+    shutdown_process_pool()
+
+
+def _run_in_request(func, *args):
+    """Run the function in the process pool like an endpoint: with the metadata and timings of a request."""
+    async def request():
+        metadata_context.set({})
+        start_timings()
+        result = await run_in_process(func, *args)
+        return result, get_meta(), get_timings()
+    return asyncio.run(request())
+
+
+def test_functions_run_in_spawned_worker_processes(worker_pool):
+    pid, _, _ = _run_in_request(worker_pid)
+
+    assert pid != os.getpid()
+    # spawn instead of fork, see start_process_pool
+    assert process_pool._process_pool._mp_context.get_start_method() == "spawn"  # pylint: disable=protected-access
+    # The worker is kept warm for the next calls
+    assert _run_in_request(worker_pid)[0] == pid
+
+
+def test_lms_url_metadata_and_timings_are_passed_between_request_and_worker(worker_pool, lms_url):
+    result, meta, timings = _run_in_request(count_words, "one two three")
+
+    assert result == 3
+    assert meta == {"worker_lms_url": lms_url}
+    assert "split" in timings["spans"]["process_pool"]["spans"]
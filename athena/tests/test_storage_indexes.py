@@ -0,0 +1,180 @@
+"""
+Every query of the storage functions has to use an index: the EXPLAIN QUERY PLAN of each SELECT, UPDATE and DELETE
+statement that a storage function runs must use an index and must not contain a SCAN of a table.
+The only exceptions are walks along an index for ORDER BY ... LIMIT/OFFSET (e.g. the LRU eviction of the feedback
+cache), which read the rows in index order and stop after the limit, and the scans in ALLOWED_SCANS.
+New storage functions have to be added to STORAGE_CALLS, see `test_all_storage_functions_are_covered`.
+"""
+import inspect
+from typing import Any, Callable, Dict, List, Tuple
+
+import pytest
+from sqlalchemy import event, text
+
+from athena import storage
+from athena.contextvars import set_lms_url_context_var
+from athena.database import engine
+from athena.models import DBModelingFeedback
+from athena.models.meta_fields import promote_meta_fields
+from athena.schemas import ModelingExercise, ModelingFeedback, ModelingSubmission, StructuredGradingCriterion
+from athena.storage import feedback_cache_storage, structured_grading_criterion_storage
+
+# Before the tables are created (see conftest.py), like modules do on import
+promote_meta_fields(DBModelingFeedback, columns={"kind": str}, blobs=["context"])
+
+LMS_URL = "http://indexes.lms"
+N_EXERCISES = 50
+N_SUBMISSIONS = 2000
+FIRST_EXERCISE_ID = 5001
+
+
+def _exercise(exercise_id: int) -> ModelingExercise:
+    return ModelingExercise(id=exercise_id, title="Diagram", max_points=10, bonus_points=0, example_solution="",
+                            meta={})
+
+
+def _submission(submission_id: int) -> ModelingSubmission:
+    return ModelingSubmission(id=submission_id, exercise_id=FIRST_EXERCISE_ID + submission_id % N_EXERCISES,
+                              model="{}", meta={})
+
+
+def _feedback(submission_id: int, feedback_id=None) -> ModelingFeedback:
+    return ModelingFeedback(id=feedback_id, exercise_id=FIRST_EXERCISE_ID + submission_id % N_EXERCISES,
+                            submission_id=submission_id, title="Feedback", description="", credits=1.0,
+                            meta={"kind": "class", "context": f"{submission_id}" * 100})
+
+
+EXERCISE = _exercise(FIRST_EXERCISE_ID)
+SUBMISSION = _submission(N_EXERCISES)
+CACHE_KEY = "0" * 64
+
+# Calls of all storage functions by function name, with arguments that match the stored data
+STORAGE_CALLS: Dict[str, List[Callable[[], Any]]] = {
+    "get_stored_exercises": [
+        lambda: list(storage.get_stored_exercises(ModelingExercise, only_ids=[FIRST_EXERCISE_ID])),
+    ],
+    "get_stored_exercise_meta": [lambda: storage.get_stored_exercise_meta(EXERCISE)],
+    "store_exercises": [lambda: storage.store_exercises([EXERCISE])],
+    "store_exercise": [lambda: storage.store_exercise(EXERCISE)],
+    "count_stored_submissions": [lambda: storage.count_stored_submissions(ModelingSubmission, FIRST_EXERCISE_ID)],
+    "get_stored_submissions": [
+        lambda: list(storage.get_stored_submissions(ModelingSubmission, FIRST_EXERCISE_ID)),
+        lambda: list(storage.get_stored_submissions(ModelingSubmission, FIRST_EXERCISE_ID, only_ids=[50, 100])),
+    ],
+    "get_stored_submission_meta": [lambda: storage.get_stored_submission_meta(SUBMISSION)],
+    "get_stored_submission_metas": [lambda: storage.get_stored_submission_metas(ModelingSubmission, [50, 100])],
+    "store_submissions": [lambda: storage.store_submissions([SUBMISSION])],
+    "store_submission": [lambda: storage.store_submission(SUBMISSION)],
+    "get_stored_feedback": [
+        lambda: list(storage.get_stored_feedback(ModelingFeedback, FIRST_EXERCISE_ID, None)),
+        lambda: list(storage.get_stored_feedback(ModelingFeedback, FIRST_EXERCISE_ID, 50)),
+        lambda: list(storage.get_stored_feedback(ModelingFeedback, FIRST_EXERCISE_ID, 50, meta={"kind": "class"})),
+    ],
+    "get_stored_feedback_meta": [lambda: storage.get_stored_feedback_meta(_feedback(50, 1))],
+    "get_stored_feedback_metas": [lambda: storage.get_stored_feedback_metas(ModelingFeedback, [1, 2])],
+    "store_feedback": [lambda: storage.store_feedback(_feedback(50, 100_050), is_lms_id=True)],
+    "store_feedbacks": [
+        lambda: storage.store_feedbacks([_feedback(50, 100_050), _feedback(100, 100_100)], is_lms_id=True),
+        lambda: storage.store_feedbacks([_feedback(50)]),
+    ],
+    "get_stored_feedback_suggestions": [
+        lambda: list(storage.get_stored_feedback_suggestions(ModelingFeedback, FIRST_EXERCISE_ID, 50)),
+        lambda: list(storage.get_stored_feedback_suggestions(ModelingFeedback, FIRST_EXERCISE_ID, 50,
+                                                             meta={"kind": "class"})),
+    ],
+    "store_feedback_suggestions": [lambda: storage.store_feedback_suggestions([_feedback(50), _feedback(100)])],
+    "store_feedback_suggestion": [lambda: storage.store_feedback_suggestion(_feedback(50))],
+    "delete_unreferenced_meta_blobs": [storage.delete_unreferenced_meta_blobs],
+    "get_feedback_cache_key": [lambda: feedback_cache_storage.get_feedback_cache_key(EXERCISE, SUBMISSION)],
+    "get_cached_feedback_suggestions": [
+        lambda: feedback_cache_storage.get_cached_feedback_suggestions([CACHE_KEY]),
+    ],
+    "store_cached_feedback_suggestions": [
+        lambda: feedback_cache_storage.store_cached_feedback_suggestions(FIRST_EXERCISE_ID, {CACHE_KEY: []}),
+    ],
+    "evict_cached_feedback_suggestions": [feedback_cache_storage.evict_cached_feedback_suggestions],
+    "get_structured_grading_criterion": [
+        lambda: structured_grading_criterion_storage.get_structured_grading_criterion(FIRST_EXERCISE_ID),
+    ],
+    "store_structured_grading_criterion": [
+        lambda: structured_grading_criterion_storage.store_structured_grading_criterion(
+            FIRST_EXERCISE_ID, "hash", StructuredGradingCriterion(criteria=[])),
+    ],
+}
+
+# Scans that storage functions need by design, e.g. periodic clean-ups that check every row of a table
+ALLOWED_SCANS = {"delete_unreferenced_meta_blobs": {"SCAN meta_blob"}}
+
+# Helpers that are used by the storage functions above, they do not run queries on their own
+NOT_STORAGE_FUNCTIONS = {"bulk_upsert", "bulk_insert", "stream_schemas"}
+# Storage functions that run no SELECT, UPDATE or DELETE statements (only computations or INSERT ... ON CONFLICT)
+QUERYLESS_FUNCTIONS = {"get_feedback_cache_key", "store_cached_feedback_suggestions", "store_exercises", "store_exercise", "store_submissions",
+                       "store_submission", "store_structured_grading_criterion"}
+
+
+@pytest.fixture(scope="module")
+def stored_data():
+    """Enough stored data that the query planner prefers indexes, with statistics for the planner."""
+    set_lms_url_context_var(LMS_URL)
+    storage.store_exercises([_exercise(FIRST_EXERCISE_ID + i) for i in range(N_EXERCISES)])
+    storage.store_submissions([_submission(i) for i in range(1, N_SUBMISSIONS + 1)])
+    storage.store_feedbacks([_feedback(i, 100_000 + i) for i in range(1, N_SUBMISSIONS + 1)], is_lms_id=True)
+    storage.store_feedback_suggestions([_feedback(i) for i in range(1, N_SUBMISSIONS + 1)])
+    feedback_cache_storage.store_cached_feedback_suggestions(
+        FIRST_EXERCISE_ID, {f"{i:064x}": [] for i in range(1, N_SUBMISSIONS + 1)})
+    with engine.begin() as connection:
+        connection.execute(text("ANALYZE"))
+
+
+def _capture_statements(call: Callable[[], Any]) -> List[Tuple[str, Any]]:
+    statements = []
+
+    def capture(_conn, _cursor, statement, parameters, _context, executemany):
+        if not executemany and statement.lstrip().split(None, 1)[0].upper() in ("SELECT", "UPDATE", "DELETE"):
+            statements.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        call()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    return statements
+
+
+def _is_ordered_index_walk(step: str, statement: str) -> bool:
+    normalized_statement = " ".join(statement.upper().split())
+    return ("USING INDEX" in step or "USING COVERING INDEX" in step) and " ORDER BY " in normalized_statement \
+        and (" LIMIT " in normalized_statement or " OFFSET " in normalized_statement)
+
+
+def _query_plan(statement: str, parameters: Any) -> List[str]:
+    with engine.connect() as connection:
+        return [row[-1] for row in connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {statement}", parameters).all()]
+
+
+@pytest.mark.parametrize("name, index, call", [
+    pytest.param(name, index, call, id=f"{name}-{index}")
+    for name, calls in STORAGE_CALLS.items() for index, call in enumerate(calls)
+])
+def test_storage_function_queries_use_indexes(stored_data, name, index, call):
+    set_lms_url_context_var(LMS_URL)
+    statements = _capture_statements(call)
+    assert statements or name in QUERYLESS_FUNCTIONS, f"{name} (call {index}) ran no queries"
+    for statement, parameters in statements:
+        plan = _query_plan(statement, parameters)
+        scans = [step for step in plan if step.startswith("SCAN") and not _is_ordered_index_walk(step, statement)
+                 and step not in ALLOWED_SCANS.get(name, ())]
+        assert not scans, f"{name} (call {index}) scans a table: {' '.join(statement.split())}\n" + "\n".join(plan)
+        if statement.lstrip().upper().startswith("SELECT") or " WHERE " in statement.upper():
+            assert any("INDEX" in step or "PRIMARY KEY" in step for step in plan), \
+                f"{name} (call {index}) uses no index: {' '.join(statement.split())}\n" + "\n".join(plan)
+
+
+def test_all_storage_functions_are_covered():
+    modules = [storage, feedback_cache_storage, structured_grading_criterion_storage]
+    storage_functions = {
+        name for module in modules for name, value in vars(module).items()
+        if inspect.isfunction(value) and value.__module__.startswith("athena.storage") and not name.startswith("_")
+        and not name.endswith("_async")
+    }
+    assert storage_functions - NOT_STORAGE_FUNCTIONS == set(STORAGE_CALLS)
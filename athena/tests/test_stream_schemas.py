@@ -0,0 +1,25 @@
+import importlib
+
+from athena import storage
+from athena.database import engine
+from athena.schemas import TextExercise, TextSubmission
+
+# The module, not the function of the same name that athena.storage exports
+stream_schemas = importlib.import_module("athena.storage.stream_schemas")
+
+
+def test_stream_loads_chunks_without_keeping_a_session_open(lms_url, monkeypatch):
+    monkeypatch.setattr(stream_schemas, "STREAM_CHUNK_SIZE", 2)
+    storage.store_exercise(TextExercise(id=1301, title="Essay", max_points=10, bonus_points=0,
+                                        grading_instructions="", problem_statement="", example_solution="", meta={}))
+    storage.store_submissions([TextSubmission(id=1300 + i, exercise_id=1301, text=f"Essay {i}", meta={})
+                               for i in range(5)])
+
+    submission_ids = []
+    for submission in storage.get_stored_submissions(TextSubmission, 1301):
+        # The caller can work on the results (e.g. on slow computations) without holding a connection
+        assert engine.pool.checkedout() == 0
+        submission_ids.append(submission.id)
+
+    assert sorted(submission_ids) == [1300, 1301, 1302, 1303, 1304]
+
@@ -0,0 +1,78 @@
+"""Streamed responses (see `athena.streaming`): one chunk per NDJSON line or server-sent event, the metadata at the end."""
+import asyncio
+import json
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+
+from athena.metadata import emit_meta, with_meta
+from athena.request_context import RequestContextMiddleware
+from athena.streaming import NDJSON_MEDIA_TYPE, SSE_MEDIA_TYPE, get_streaming_media_type, stream_with_meta
+
+
+@pytest.fixture
+def app() -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(RequestContextMiddleware)
+
+    async def chunks(fail: bool):
+        for i in range(2):
+            emit_meta("chunks", i + 1)
+            yield [{"title": f"Feedback {i}"}]
+        if fail:
+            raise ValueError("LLM unavailable")
+
+    @app.get("/feedback")
+    @with_meta
+    async def feedback(request: Request, fail: bool = False):
+        return stream_with_meta(chunks(fail), get_streaming_media_type(request) or NDJSON_MEDIA_TYPE)
+
+    return app
+
+
+def _get(app: FastAPI, accept: str, **params) -> httpx.Response:
+    async def get():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://module") as client:
+            return await client.get("/feedback", headers={"Accept": accept}, params=params)
+    return asyncio.run(get())
+
+
+def test_ndjson_has_one_line_per_chunk_and_the_meta_last(app):
+    response = _get(app, NDJSON_MEDIA_TYPE)
+
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    assert response.headers["x-accel-buffering"] == "no"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines[:2] == [{"data": [{"title": "Feedback 0"}]}, {"data": [{"title": "Feedback 1"}]}]
+    assert list(lines[2]) == ["meta"]
+    assert lines[2]["meta"]["chunks"] == 2
+    assert "timings" in lines[2]["meta"]
+
+
+def test_server_sent_events_have_one_event_per_chunk_and_the_meta_last(app):
+    response = _get(app, f"{SSE_MEDIA_TYPE}, */*")
+
+    assert response.headers["content-type"].startswith(SSE_MEDIA_TYPE)
+    events = [event.split("\n") for event in response.text.split("\n\n") if event]
+    assert [event[0] for event in events] == ["event: data", "event: data", "event: meta"]
+    assert json.loads(events[1][1][len("data: "):]) == [{"title": "Feedback 1"}]
+    assert json.loads(events[2][1][len("data: "):])["chunks"] == 2
+
+
+def test_errors_while_streaming_are_sent_before_the_meta(app):
+    response = _get(app, NDJSON_MEDIA_TYPE, fail="true")
+
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [list(line) for line in lines] == [["data"], ["data"], ["error"], ["meta"]]
+    assert lines[2]["error"] == "LLM unavailable"
+
+
+def test_streaming_media_type_comes_from_the_accept_header():
+    def media_type(accept: str):
+        return get_streaming_media_type(Request({"type": "http", "headers": [(b"accept", accept.encode())]}))
+
+    assert media_type(NDJSON_MEDIA_TYPE) == NDJSON_MEDIA_TYPE
+    assert media_type(f"{SSE_MEDIA_TYPE};q=0.9") == SSE_MEDIA_TYPE
+    assert media_type("application/json") is None
@@ -0,0 +1,79 @@
+"""The timing tree of a request (see `athena.timing`): nested spans, added up by name under the same parent."""
+import asyncio
+import contextvars
+
+from sqlalchemy import text
+
+from athena.database import get_db
+from athena.timing import Span, current_span_context, get_timings, start_timings, timed
+
+
+@timed("count")
+def count(n: int) -> int:
+    return n
+
+
+@timed("fetch")
+async def fetch() -> str:
+    await asyncio.sleep(0)
+    with timed("parse"):
+        return "fetched"
+
+
+def _span_names(timings: dict) -> dict:
+    """The tree of span names with their call counts."""
+    return {name: (span.get("count", 1), _span_names(span)) for name, span in timings.get("spans", {}).items()}
+
+
+def test_spans_are_nested_and_added_up_by_name():
+    async def request():
+        start_timings()
+        with timed("build_prompt"):
+            for i in range(1000):
+                count(i)
+        assert await fetch() == "fetched"
+        await fetch()
+        return get_timings()
+
+    timings = asyncio.run(request())
+
+    assert _span_names(timings) == {
+        "build_prompt": (1, {"count": (1000, {})}),
+        "fetch": (2, {"parse": (2, {})}),
+    }
+    assert timings["ms"] >= timings["spans"]["build_prompt"]["ms"]
+
+
+def test_database_queries_are_timed_in_the_current_span():
+    async def request():
+        start_timings()
+        with timed("load"):
+            with get_db() as db:
+                db.execute(text("SELECT 1"))
+                db.execute(text("SELECT 2"))
+        return get_timings()
+
+    timings = asyncio.run(request())
+
+    assert _span_names(timings) == {"load": (1, {"db": (2, {})})}
+
+
+def test_timed_does_nothing_outside_of_a_request():
+    def background_job():
+        with timed("job") as timer:
+            assert timer.span is None
+        return count(1), current_span_context.get(), get_timings()
+
+    # An empty context like in a background job, without start_timings
+    assert contextvars.Context().run(background_job) == (1, None, None)
+
+
+def test_spans_of_worker_processes_are_merged():
+    root, worker = Span(), Span()
+    root.child("process_pool").add(2.0)
+    worker.child("split").add(0.5)
+    worker.child("split").add(0.5)
+
+    root.child("process_pool").merge(worker)
+
+    assert root.to_dict()["spans"]["process_pool"] == {"ms": 2000.0, "spans": {"split": {"ms": 1000.0, "count": 2}}}
@@ -0,0 +1,102 @@
+"""W3C trace context (see `athena.tracing`): parsing traceparent headers and continuing the trace of a request."""
+import asyncio
+from typing import List
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from athena import tracing
+from athena.timing import timed
+from athena.tracing import SPAN_KIND_SERVER, TraceContext, TracingMiddleware, format_traceparent, get_traceparent, \
+    parse_traceparent
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_SPAN_ID = "00f067aa0ba902b7"
+
+
+@pytest.mark.parametrize("traceparent, expected", [
+    (f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01", TraceContext(TRACE_ID, PARENT_SPAN_ID, sampled=True)),
+    (f" 00-{TRACE_ID.upper()}-{PARENT_SPAN_ID}-00 ", TraceContext(TRACE_ID, PARENT_SPAN_ID, sampled=False)),
+    # Future versions with the same fields, the sampled flag is the lowest bit
+    (f"01-{TRACE_ID}-{PARENT_SPAN_ID}-03", TraceContext(TRACE_ID, PARENT_SPAN_ID, sampled=True)),
+    (f"ff-{TRACE_ID}-{PARENT_SPAN_ID}-01", None),
+    (f"00-{'0' * 32}-{PARENT_SPAN_ID}-01", None),
+    (f"00-{TRACE_ID}-{'0' * 16}-01", None),
+    (f"00-{TRACE_ID[:-1]}-{PARENT_SPAN_ID}-01", None),
+    (f"00-{TRACE_ID}-{PARENT_SPAN_ID}", None),
+    ("", None),
+    (None, None),
+])
+def test_parse_traceparent(traceparent, expected):
+    assert parse_traceparent(traceparent) == expected
+
+
+def test_format_traceparent_round_trips():
+    traceparent = f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"
+    assert format_traceparent(parse_traceparent(traceparent)) == traceparent  # type: ignore
+
+
+@pytest.fixture
+def exported_spans(monkeypatch) -> List[dict]:
+    """The spans exported while the test runs, like with TRACE_EXPORTER set."""
+    spans: List[dict] = []
+    exporter = tracing._SpanExporter(spans.extend)  # pylint: disable=protected-access
+    monkeypatch.setattr(tracing, "_exporter", exporter)
+    yield spans
+    exporter.flush()
+
+
+def _request(traceparent=None) -> dict:
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+
+    @app.get("/exercises/{exercise_id}")
+    async def get_exercise(exercise_id: int):
+        with timed("load"):
+            return {"traceparent": get_traceparent()}
+
+    async def request():
+        headers = {"traceparent": traceparent} if traceparent else {}
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://module") as client:
+            return (await client.get("/exercises/1", headers=headers)).json()
+    return asyncio.run(request())
+
+
+def test_requests_continue_the_trace_of_the_traceparent_header(exported_spans):
+    response = _request(f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01")
+    tracing._exporter.flush()  # pylint: disable=protected-access
+
+    load, server = exported_spans
+    assert server["traceId"] == load["traceId"] == TRACE_ID
+    assert server["parentSpanId"] == PARENT_SPAN_ID
+    assert server["name"] == "GET /exercises/{exercise_id}"
+    assert server["kind"] == SPAN_KIND_SERVER
+    assert server["attributes"]["http.response.status_code"] == 200
+    assert load["name"] == "load"
+    assert load["parentSpanId"] == server["spanId"]
+    # Requests to other services continue the trace from the current span
+    assert response["traceparent"] == f"00-{TRACE_ID}-{load['spanId']}-01"
+
+
+def test_requests_without_traceparent_start_a_new_trace(exported_spans):
+    _request()
+    tracing._exporter.flush()  # pylint: disable=protected-access
+
+    assert [span["parentSpanId"] for span in exported_spans if span["kind"] == SPAN_KIND_SERVER] == [None]
+    assert len({span["traceId"] for span in exported_spans}) == 1
+
+
+def test_unsampled_traces_are_passed_on_but_not_recorded(exported_spans):
+    traceparent = f"00-{TRACE_ID}-{PARENT_SPAN_ID}-00"
+
+    assert _request(traceparent)["traceparent"] == traceparent
+    tracing._exporter.flush()  # pylint: disable=protected-access
+    assert not exported_spans
+
+
+def test_without_exporter_the_trace_context_is_only_passed_on(monkeypatch):
+    monkeypatch.setattr(tracing, "_exporter", None)
+    traceparent = f"00-{TRACE_ID}-{PARENT_SPAN_ID}-01"
+
+    assert _request(traceparent)["traceparent"] == traceparent
@@ -0,0 +1,58 @@
+"""
+`Schema.from_trusted_orm` skips the validation of some fields, so for every schema type it has to give the same result
+as `Schema.from_orm` for models that were stored and read back from the database.
+"""
+import pytest
+
+from athena import storage
+from athena.database import get_db
+from athena.schemas import ModelingExercise, ModelingFeedback, ModelingSubmission, ProgrammingExercise, \
+    ProgrammingFeedback, ProgrammingSubmission, TextExercise, TextFeedback, TextSubmission
+
+EXERCISES = {
+    "text": TextExercise(id=9001, title="Essay", max_points=10, bonus_points=0, grading_instructions="Be fair",
+                         problem_statement="Write", example_solution="An essay",
+                         grading_criteria=[{"id": 1, "title": "Style",
+                                            "structured_grading_instructions": [{"id": 1, "credits": 1.0}]}],
+                         meta={"a": 1}),
+    "programming": ProgrammingExercise(id=9002, title="Sort", max_points=10, bonus_points=2,
+                                       programming_language="java", solution_repository_uri="http://lms/solution",
+                                       template_repository_uri="http://lms/template",
+                                       tests_repository_uri="http://lms/tests", meta={}),
+    "modeling": ModelingExercise(id=9003, title="Diagram", max_points=10, bonus_points=0, example_solution="{}",
+                                 meta={}),
+}
+SUBMISSIONS = {
+    "text": TextSubmission(id=9001, exercise_id=9001, text="An essay", language="ENGLISH", meta={"a": 1}),
+    "programming": ProgrammingSubmission(id=9002, exercise_id=9002, repository_uri="http://lms/submission", meta={}),
+    "modeling": ModelingSubmission(id=9003, exercise_id=9003, model="{}", meta={}),
+}
+FEEDBACKS = {
+    "text": TextFeedback(id=9001, exercise_id=9001, submission_id=9001, title="Good", description="", credits=1,
+                         index_start=1, index_end=5, meta={"a": 1}),
+    "programming": ProgrammingFeedback(id=9002, exercise_id=9002, submission_id=9002, title="Good", description="",
+                                       credits=1, file_path="Sort.java", line_start=1, line_end=3, meta={}),
+    "modeling": ModelingFeedback(id=9003, exercise_id=9003, submission_id=9003, title="Good", description="",
+                                 credits=1, element_ids=["a"], reference="r", meta={}),
+}
+
+
+@pytest.mark.parametrize("exercise_type", ["text", "programming", "modeling"])
+def test_from_trusted_orm_matches_from_orm(lms_url, exercise_type):
+    storage.store_exercise(EXERCISES[exercise_type])
+    storage.store_submission(SUBMISSIONS[exercise_type])
+    feedback = storage.store_feedback(FEEDBACKS[exercise_type])
+
+    for schema in (EXERCISES[exercise_type], SUBMISSIONS[exercise_type], feedback):
+        schema_class = type(schema)
+        model_class = schema_class.get_model_class()
+        with get_db() as db:
+            model = db.query(model_class).filter(model_class.id == schema.id).one()
+            trusted = schema_class.from_trusted_orm(model)
+            validated = schema_class.from_orm(model)
+
+        for name in schema_class.__fields__:
+            trusted_value, validated_value = getattr(trusted, name), getattr(validated, name)
+            assert trusted_value == validated_value, f"{schema_class.__name__}.{name}"
+            assert type(trusted_value) is type(validated_value), f"{schema_class.__name__}.{name}"
+        assert trusted == schema
@@ -1,13 +1,44 @@
 import os
+import time
+from typing import Any, Dict, Tuple
+from uuid import UUID
 
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain_core.outputs import  LLMResult
 from langchain_core.messages.ai import UsageMetadata
 
 from athena import emit_meta, get_meta
+from athena.metrics import llm_requests_total, llm_request_duration_seconds, llm_tokens_total
 
 
 class UsageHandler(BaseCallbackHandler):
+    def __init__(self):
+        super().__init__()
+        # Start time and model of the running LLM requests by run ID, for the metrics (see athena.metrics)
+        self._running: Dict[UUID, Tuple[float, str]] = {}
+
+    def _start(self, run_id: UUID, kwargs: Dict[str, Any]):
+        invocation_params = kwargs.get("invocation_params") or {}
+        model_name = invocation_params.get("model_name") or invocation_params.get("model") or "unknown"
+        self._running[run_id] = (time.perf_counter(), model_name)
+
+    def _finish(self, run_id: UUID, outcome: str) -> str:
+        """Record the finished request in the metrics and return its model name."""
+        start, model_name = self._running.pop(run_id, (None, "unknown"))
+        llm_requests_total.inc(model=model_name, outcome=outcome)
+        if start is not None:
+            llm_request_duration_seconds.observe(time.perf_counter() - start, model=model_name)
+        return model_name
+
+    def on_llm_start(self, serialized: Dict[str, Any], prompts, *, run_id: UUID, **kwargs) -> None:
+        self._start(run_id, kwargs)
+
+    def on_chat_model_start(self, serialized: Dict[str, Any], messages, *, run_id: UUID, **kwargs) -> None:
+        self._start(run_id, kwargs)
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._finish(run_id, "error")
+
     def on_llm_end(self, response: LLMResult, **kwargs) -> None:
         cost_per_million_input_tokens = float(os.environ.get("LLM_DEFAULT_MODEL_COST_PER_MILLION_INPUT_TOKEN", 0.0))
         cost_per_million_output_tokens = float(os.environ.get("LLM_DEFAULT_MODEL_COST_PER_MILLION_OUTPUT_TOKEN", 0.0))
@@ -16,6 +47,7 @@ class UsageHandler(BaseCallbackHandler):
         
         total_usage = meta.get("totalUsage", {"numInputTokens": 0, "numOutputTokens": 0, "numTotalTokens": 0, "cost": 0 })
         llm_calls = meta.get("llmRequests", [])
+        metrics_model_name = self._finish(kwargs["run_id"], "success") if "run_id" in kwargs else "unknown"
 
         for generations in response.generations:
             for generation in generations:
@@ -30,6 +62,9 @@ class UsageHandler(BaseCallbackHandler):
                 total_usage["cost"] += int(generation_usage["input_tokens"]) * cost_per_million_output_tokens / 1_000_000
                 total_usage["cost"] += int(generation_usage["output_tokens"]) * cost_per_million_output_tokens / 1_000_000
 
+                llm_tokens_total.inc(int(generation_usage["input_tokens"]), model=metrics_model_name, type="input")
+                llm_tokens_total.inc(int(generation_usage["output_tokens"]), model=metrics_model_name, type="output")
+
                 llm_calls.append({
                     "model": model_name,
                     "costPerMillionInputToken": cost_per_million_input_tokens,
@@ -9,7 +9,7 @@ from langchain.prompts import (
     HumanMessagePromptTemplate,
 )
 from langchain.output_parsers import PydanticOutputParser
-from athena import emit_meta
+from athena import emit_meta, timed
 
 T = TypeVar("T", bound=BaseModel)
 
@@ -26,6 +26,7 @@ def num_tokens_from_prompt(chat_prompt: ChatPromptTemplate, prompt_input: dict)
     return num_tokens_from_string(chat_prompt.format(**prompt_input))
 
 
+@timed("check_prompt_length")
 def check_prompt_length_and_omit_features_if_necessary(prompt: ChatPromptTemplate, 
                                                        prompt_input: dict, 
                                                        max_input_tokens: int, 
@@ -3,7 +3,8 @@ from langchain_core.language_models import BaseLanguageModel
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.pydantic_v1 import BaseModel, ValidationError
 from langchain_core.runnables import RunnableSequence
-from athena import get_experiment_environment
+from athena import get_experiment_environment, timed
+from athena.tracing import get_trace_context
 from langchain_community.chat_models import ChatOllama # type: ignore
 from langchain.output_parsers import PydanticOutputParser
 
@@ -12,6 +13,7 @@ T = TypeVar("T", bound=BaseModel)
 def isOllama(model: BaseLanguageModel) -> bool:
     return isinstance(model, ChatOllama)
 
+@timed("predict_and_parse")
 async def predict_and_parse(
         model: BaseLanguageModel, 
         chat_prompt: ChatPromptTemplate, 
@@ -41,12 +43,17 @@ async def predict_and_parse(
         tags.append(f"module-configuration-{experiment.module_configuration_id}")
     if experiment.run_id is not None:
         tags.append(f"run-{experiment.run_id}")
+    trace_context = get_trace_context()
+    if trace_context is not None:
+        # Find the LangSmith runs of a trace (see athena.tracing)
+        tags.append(f"trace-{trace_context.trace_id}")
 
     if isOllama(model):
         try:
             outputParser = PydanticOutputParser(pydantic_object = pydantic_object)
             chain = chat_prompt | model
-            llm_output = await chain.ainvoke(prompt_input, config={"tags": tags})
+            with timed("llm_call"):
+                llm_output = await chain.ainvoke(prompt_input, config={"tags": tags})
             try:
                 result = outputParser.parse(llm_output.content)
                 return result
@@ -60,7 +67,8 @@ async def predict_and_parse(
         chain = chat_prompt | structured_output_llm
         
         try:
-            result = await chain.ainvoke(prompt_input, config={"tags": tags})
+            with timed("llm_call"):
+                result = await chain.ainvoke(prompt_input, config={"tags": tags})
             
             if isinstance(result, pydantic_object):
                 return result
@@ -77,7 +85,8 @@ async def predict_and_parse(
             structured_output_llm
         )
         try:
-            return await chain.ainvoke(prompt_input, config={"tags": tags})
+            with timed("llm_call"):
+                return await chain.ainvoke(prompt_input, config={"tags": tags})
         except ValidationError as e:
             raise ValueError(f"Could not parse output: {e}") from e
         
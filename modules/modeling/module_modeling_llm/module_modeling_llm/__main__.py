@@ -1,3 +1,4 @@
+import os
 from typing import List
 
 import nltk
@@ -31,7 +32,8 @@ def process_incoming_feedback(exercise: Exercise, submission: Submission, feedba
                 submission.id, exercise.id)
 
 
-@feedback_provider
+@feedback_provider(cache=os.environ.get("CACHE_FEEDBACK_SUGGESTIONS", "0") == "1",
+                   precompute=os.environ.get("PRECOMPUTE_FEEDBACK_SUGGESTIONS", "0") == "1")
 async def suggest_feedback(exercise: Exercise, submission: Submission, is_graded: bool, module_config: Configuration) -> List[Feedback]:
     logger.info("suggest_feedback: Suggestions for submission %d of exercise %d were requested", submission.id,
                 exercise.id)
@@ -2,6 +2,7 @@
 Entry point for the module_programming_apted module.
 """
 import random
+from collections import Counter
 from typing import List, Any, cast
 from pydantic import BaseModel, Field
 from module_programming_apted.convert_code_to_ast.get_feedback_methods import get_feedback_method
@@ -9,12 +10,17 @@ from module_programming_apted.feedback_suggestions.feedback_suggestions import c
 from athena import (app, config_schema_provider, submissions_consumer, submission_selector, feedback_consumer,
                     feedback_provider, evaluation_provider, emit_meta)
 from athena.logger import logger
-from athena.storage import store_exercise, store_submissions, store_feedback, store_feedback_suggestions
+from athena.storage import store_exercise, store_submissions, store_feedbacks, store_feedback_suggestions
 from athena.programming import (Exercise, Submission, Feedback, get_stored_feedback_suggestions,
-                                count_stored_submissions, get_stored_submissions)
+                                count_stored_submissions, get_stored_submissions, promote_feedback_meta_fields)
 from module_programming_apted.remove_overlapping import filter_overlapping_suggestions
 from module_programming_apted.remove_suspicious import filter_suspicious
 
+promote_feedback_meta_fields(
+    columns={"method_name": str, "original_feedback_id": int, "n_feedback_suggestions": int},
+    blobs=["method_code", "original_method_code", "method_ast"],
+)
+
 
 @config_schema_provider
 class Configuration(BaseModel):
@@ -63,7 +69,7 @@ def select_submission(exercise: Exercise, submissions: List[Submission]) -> Subm
     return submissions[0]
 
 
-@feedback_consumer
+@feedback_consumer(executor="process")
 def process_incoming_feedback(exercise: Exercise, submission: Submission, feedbacks: List[Feedback]):
     logger.info("process_feedback: Received %d feedbacks for submission %d of exercise %d", len(feedbacks),
                 submission.id, exercise.id)
@@ -94,28 +100,25 @@ def process_incoming_feedback(exercise: Exercise, submission: Submission, feedba
         feedbacks_with_method.append(feedback)
     feedbacks = feedbacks_with_method
 
-    # find all submissions for this exercise
-    exercise_submissions = cast(List[Submission], list(get_stored_submissions(exercise.id)))
+    # find all submissions for this exercise (streamed from the database instead of loading all at once)
+    exercise_submissions = get_stored_submissions(exercise.id)
 
     # create feedback suggestions
     logger.info("Creating feedback suggestions for %d feedbacks", len(feedbacks))
     feedback_suggestions = create_feedback_suggestions(exercise_submissions, feedbacks, programming_language)
 
     # additionally, store metadata about how impactful each feedback was, i.e. how many suggestions were given based on it
+    n_feedback_suggestions = Counter(suggestion.meta["original_feedback_id"] for suggestion in feedback_suggestions)
     for feedback in feedbacks:
-        # count how many suggestions were given based on this feedback
-        feedback.meta["n_feedback_suggestions"] = len(
-            [f for f in feedback_suggestions if f.meta["original_feedback_id"] == feedback.id])
-        # store the information on the suggestions as well for quicker access later
-        for suggestion in feedback_suggestions:
-            if suggestion.meta["original_feedback_id"] == feedback.id:
-                suggestion.meta["n_feedback_suggestions"] = feedback.meta["n_feedback_suggestions"]
+        feedback.meta["n_feedback_suggestions"] = n_feedback_suggestions[feedback.id]
+    # store the information on the suggestions as well for quicker access later
+    for suggestion in feedback_suggestions:
+        suggestion.meta["n_feedback_suggestions"] = n_feedback_suggestions[suggestion.meta["original_feedback_id"]]
 
     # save to database
     # type: ignore
     store_feedback_suggestions(feedback_suggestions)
-    for feedback in feedbacks:
-        store_feedback(feedback)
+    store_feedbacks(feedbacks)
 
     logger.debug("Feedbacks processed")
 
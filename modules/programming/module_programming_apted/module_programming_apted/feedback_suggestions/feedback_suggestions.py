@@ -58,7 +58,7 @@ def group_feedbacks_by_file_path(feedbacks: List[Feedback]) -> Dict[str, List[Fe
 
 
 def create_comparisons_with_suggestions(
-        submissions: List[Submission],
+        submissions: Iterable[Submission],
         feedbacks: List[Feedback],
         programming_language: str,
 ) -> Iterable[CodeComparisonWithCorrespondingSuggestions]:
@@ -96,7 +96,7 @@ def create_comparisons_with_suggestions(
 
 
 def create_feedback_suggestions(
-        submissions: List[Submission],
+        submissions: Iterable[Submission],
         feedbacks: List[Feedback],
         programming_language: str,
 ) -> List[Feedback]:
@@ -1,4 +1,5 @@
-from typing import List
+import os
+from typing import AsyncGenerator, List
 
 import tiktoken
 
@@ -37,15 +38,19 @@ def process_incoming_feedback(exercise: Exercise, submission: Submission, feedba
     logger.info("process_feedback: Received %d feedbacks for submission %d of exercise %d.", len(feedbacks), submission.id, exercise.id)
 
 
-@feedback_provider
-async def suggest_feedback(exercise: Exercise, submission: Submission, is_graded: bool, module_config: Configuration) -> List[Feedback]:
+@feedback_provider(cache=os.environ.get("CACHE_FEEDBACK_SUGGESTIONS", "0") == "1",
+                   precompute=os.environ.get("PRECOMPUTE_FEEDBACK_SUGGESTIONS", "0") == "1")
+async def suggest_feedback(exercise: Exercise, submission: Submission, is_graded: bool, module_config: Configuration) -> AsyncGenerator[List[Feedback], None]:
     logger.info("suggest_feedback: %s suggestions for submission %d of exercise %d were requested",
                 "Graded" if is_graded else "Non-graded", submission.id, exercise.id)
     if is_graded:
-        return await generate_graded_suggestions_by_file(exercise, submission, module_config.graded_approach,
-                                                         module_config.debug)
-    return await generate_non_graded_suggestions_by_file(exercise, submission, module_config.non_graded_approach,
-                                                             module_config.debug)
+        # Stream the feedback of each file as soon as it is ready
+        async for feedbacks in generate_graded_suggestions_by_file(exercise, submission, module_config.graded_approach,
+                                                                   module_config.debug):
+            yield feedbacks
+    else:
+        yield await generate_non_graded_suggestions_by_file(exercise, submission, module_config.non_graded_approach,
+                                                            module_config.debug)
 
 
 
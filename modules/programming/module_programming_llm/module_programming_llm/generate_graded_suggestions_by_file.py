@@ -1,4 +1,4 @@
-from typing import List, Optional, Sequence
+from typing import AsyncGenerator, List, Optional, Sequence
 import os
 import asyncio
 from pydantic import BaseModel, Field
@@ -63,7 +63,8 @@ async def generate_suggestions_by_file(
     submission: Submission,
     config: GradedBasicApproachConfig,
     debug: bool,
-) -> List[Feedback]:
+) -> AsyncGenerator[List[Feedback], None]:
+    """Yield the graded feedback suggestions for each changed file, as soon as the LLM call for the file returns."""
     model = config.model.get_model()  # type: ignore[attr-defined]
 
     chat_prompt = get_chat_prompt_with_formatting_instructions(
@@ -260,38 +261,21 @@ async def generate_suggestions_by_file(
             filtered_prompt_inputs.append(prompt_inputs.pop(0))
         prompt_inputs = filtered_prompt_inputs
 
-    # noinspection PyTypeChecker
-    results: List[Optional[AssessmentModel]] = await asyncio.gather(
-        *[
-            predict_and_parse(
-                model=model,
-                chat_prompt=chat_prompt,
-                prompt_input=prompt_input,
-                pydantic_object=AssessmentModel,
-                use_function_calling=True,
-                tags=[
-                    f"exercise-{exercise.id}",
-                    f"submission-{submission.id}",
-                    f"file-{prompt_input['file_path']}",
-                    "generate-suggestions-by-file",
-                ],
-            )
-            for prompt_input in prompt_inputs
-        ]
-    )
-
-    if debug:
-        emit_meta(
-            "generate_suggestions",
-            [
-                {
-                    "file_path": prompt_input["file_path"],
-                    "prompt": chat_prompt.format(**prompt_input),
-                    "result": result.dict() if result is not None else None,
-                }
-                for prompt_input, result in zip(prompt_inputs, results)
+    async def predict_for_file(prompt_input: dict):
+        result: Optional[AssessmentModel] = await predict_and_parse(
+            model=model,
+            chat_prompt=chat_prompt,
+            prompt_input=prompt_input,
+            pydantic_object=AssessmentModel,
+            use_function_calling=True,
+            tags=[
+                f"exercise-{exercise.id}",
+                f"submission-{submission.id}",
+                f"file-{prompt_input['file_path']}",
+                "generate-suggestions-by-file",
             ],
         )
+        return prompt_input, result
 
     grading_instruction_ids = set(
         grading_instruction.id
@@ -299,11 +283,25 @@ async def generate_suggestions_by_file(
         for grading_instruction in criterion.structured_grading_instructions
     )
 
-    feedbacks: List[Feedback] = []
-    for prompt_input, result in zip(prompt_inputs, results):
-        file_path = prompt_input["file_path"]
+    debug_results = []
+    # Yield the feedback of each file as soon as it is ready instead of waiting for the slowest file
+    for next_result in asyncio.as_completed(
+        [predict_for_file(prompt_input) for prompt_input in prompt_inputs]
+    ):
+        prompt_input, result = await next_result
+        if debug:
+            debug_results.append(
+                {
+                    "file_path": prompt_input["file_path"],
+                    "prompt": chat_prompt.format(**prompt_input),
+                    "result": result.dict() if result is not None else None,
+                }
+            )
         if result is None:
             continue
+
+        file_path = prompt_input["file_path"]
+        feedbacks: List[Feedback] = []
         for feedback in result.feedbacks:
             grading_instruction_id = (
                 feedback.grading_instruction_id
@@ -325,5 +323,7 @@ async def generate_suggestions_by_file(
                     meta={},
                 )
             )
+        yield feedbacks
 
-    return feedbacks
+    if debug:
+        emit_meta("generate_suggestions", debug_results)
@@ -8,7 +8,7 @@ from git import Remote
 from git.repo import Repo
 from langchain.document_loaders import GitLoader
 
-from athena import GradingCriterion
+from athena import GradingCriterion, timed
 
 def load_files_from_repo(repo: Repo, file_filter: Optional[Callable[[str], bool]] = None) -> Dict[str, str]:
     return {
@@ -105,6 +105,7 @@ def temporary_remote(remote_name: str, repo: Repo, remote_url: str) -> Iterator[
 
 
 # pylint: disable=too-many-positional-arguments
+@timed("git_diff")
 def get_diff(src_repo: Repo, 
              dst_repo: Repo, 
              src_prefix: str = "a",
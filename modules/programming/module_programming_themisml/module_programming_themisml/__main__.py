@@ -1,17 +1,24 @@
 """
 Entry point for the module_programming_themisml module.
 """
+from collections import Counter
 from typing import List, cast
 
 from athena import app, submissions_consumer, submission_selector, feedback_consumer, feedback_provider
-from athena.programming import Exercise, Submission, Feedback, get_stored_feedback_suggestions, get_stored_submissions, count_stored_submissions
+from athena.programming import Exercise, Submission, Feedback, get_stored_feedback_suggestions, get_stored_submissions, count_stored_submissions, \
+    promote_feedback_meta_fields
 from athena.logger import logger
-from athena.storage import store_feedback
+from athena.storage import store_feedbacks
 from athena.storage.feedback_storage import store_feedback_suggestions
 
 from module_programming_themisml.extract_methods import get_feedback_method
 from module_programming_themisml.feedback_suggestions import create_feedback_suggestions, filter_overlapping_suggestions, filter_suspicious
 
+promote_feedback_meta_fields(
+    columns={"method_name": str, "original_feedback_id": int, "n_feedback_suggestions": int},
+    blobs=["method_code", "original_method_code"],
+)
+
 
 @submissions_consumer
 def receive_submissions(exercise: Exercise, submissions: List[Submission]):
@@ -56,26 +63,24 @@ def process_incoming_feedback(exercise: Exercise, submission: Submission, feedba
         feedbacks_with_method.append(feedback)
     feedbacks = feedbacks_with_method
 
-    # find all submissions for this exercise
-    exercise_submissions = cast(List[Submission], list(get_stored_submissions(exercise.id)))
+    # find all submissions for this exercise (streamed from the database instead of loading all at once)
+    exercise_submissions = get_stored_submissions(exercise.id)
 
     # create feedback suggestions
     logger.info("Creating feedback suggestions for %d feedbacks", len(feedbacks))
     feedback_suggestions = create_feedback_suggestions(exercise_submissions, feedbacks)
 
     # additionally, store metadata about how impactful each feedback was, i.e. how many suggestions were given based on it
+    n_feedback_suggestions = Counter(suggestion.meta["original_feedback_id"] for suggestion in feedback_suggestions)
     for feedback in feedbacks:
-        # count how many suggestions were given based on this feedback
-        feedback.meta["n_feedback_suggestions"] = len([f for f in feedback_suggestions if f.meta["original_feedback_id"] == feedback.id])
-        # store the information on the suggestions as well for quicker access later
-        for suggestion in feedback_suggestions:
-            if suggestion.meta["original_feedback_id"] == feedback.id:
-                suggestion.meta["n_feedback_suggestions"] = feedback.meta["n_feedback_suggestions"]
+        feedback.meta["n_feedback_suggestions"] = n_feedback_suggestions[feedback.id]
+    # store the information on the suggestions as well for quicker access later
+    for suggestion in feedback_suggestions:
+        suggestion.meta["n_feedback_suggestions"] = n_feedback_suggestions[suggestion.meta["original_feedback_id"]]
 
     # save to database
     store_feedback_suggestions(feedback_suggestions)  # type: ignore
-    for feedback in feedbacks:
-        store_feedback(feedback)
+    store_feedbacks(feedbacks)
 
     logger.debug("Feedbacks processed")
 
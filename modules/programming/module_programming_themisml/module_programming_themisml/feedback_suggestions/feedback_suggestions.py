@@ -51,7 +51,7 @@ def group_feedbacks_by_file_path(feedbacks: List[Feedback]) -> Dict[str, List[Fe
 
 
 def create_comparisons_with_suggestions(
-    submissions: List[Submission],
+    submissions: Iterable[Submission],
     feedbacks: List[Feedback],
 ) -> Iterable[CodeComparisonWithCorrespondingSuggestions]:
     """Creates code comparisons and corresponding feedback suggestions as a generator."""
@@ -86,7 +86,7 @@ def create_comparisons_with_suggestions(
 
 
 def create_feedback_suggestions(
-    submissions: List[Submission],
+    submissions: Iterable[Submission],
     feedbacks: List[Feedback],
 ) -> List[Feedback]:
     """
@@ -27,7 +27,8 @@ def select_submission(exercise: Exercise, submissions: List[Submission]) -> Subm
 def process_incoming_feedback(exercise: Exercise, submission: Submission, feedbacks: List[Feedback]):
     logger.info("process_feedback: Received %d feedbacks for submission %d of exercise %d.", len(feedbacks), submission.id, exercise.id)
 
-@feedback_provider
+@feedback_provider(cache=os.environ.get("CACHE_FEEDBACK_SUGGESTIONS", "0") == "1",
+                   precompute=os.environ.get("PRECOMPUTE_FEEDBACK_SUGGESTIONS", "0") == "1")
 async def suggest_feedback(exercise: Exercise, submission: Submission, is_graded: bool, module_config: Configuration) -> List[Feedback]:
     logger.info("suggest_feedback: %s suggestions for submission %d of exercise %d were requested, with approach: %s",
                 "Graded" if is_graded else "Non-graded", submission.id, exercise.id, module_config.approach.__class__.__name__)